@@ -0,0 +1,385 @@
+"""
+Admission control for the expensive read endpoints.
+
+Under a burst, the unbounded list endpoints (/hotel_list/,
+/generics_hotel_list/, /reservations/, /available_hotels/, /search/) keep
+SQLite busy and every request slows down with them, bookings included.
+AdmissionMiddleware gives each endpoint named in ``ADMISSION_LIMITS``:
+
+- a concurrency limit: requests in flight at once, counting streamed
+  responses until their last chunk is sent or they are closed,
+- a token bucket: ``rate`` requests per second on average, with bursts of
+  up to ``burst``.
+
+A GET or HEAD over budget is answered at once, without touching the
+database: 429 when the bucket is empty, 503 when the endpoint is at its
+concurrency limit, both with a ``Retry-After`` header. Writes (bookings,
+imports) and endpoints without a limit are always admitted, so they keep
+their latency while the list endpoints shed load. Admitted and shed
+requests are counted in /metrics (``hotelapi_admission_total``).
+
+Budgets live in a store picked by ``ADMISSION_STORE``:
+
+- ``memory`` (default): per process. With N worker processes the database
+  sees up to N times the limits.
+- ``file``: a small memory-mapped file at ``ADMISSION_STORE_PATH``, shared
+  by the worker processes of one host and updated under an exclusive
+  flock. Each process counts its requests in flight in its own slot, so
+  the slots of a worker that died mid-request are reclaimed rather than
+  lost.
+
+The Django cache is not offered as a store: it has no compare-and-set, so
+concurrent workers would lose each other's updates to a bucket.
+"""
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache, partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+
+from .fastjson import JsonResponse
+from .metrics import registry
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+ADMITTED = 'admitted'
+SHED_RATE = 'shed_rate'
+SHED_CONCURRENCY = 'shed_concurrency'
+
+LIMITED_METHODS = ('GET', 'HEAD')
+# Seconds a client turned away for concurrency is asked to wait: requests
+# in flight usually finish well within it.
+CONCURRENCY_RETRY_AFTER = 1
+# Paths whose URL match each middleware instance remembers: resolving costs
+# more than the rest of the middleware.
+RESOLVE_CACHE_SIZE = 4096
+# Worker processes that can share a file store.
+WORKER_SLOTS = 64
+
+# The store file: a layout signature, then per endpoint the bucket (tokens
+# left, last refill as a Unix time) and a (pid, requests in flight) slot per
+# worker process.
+HEADER = struct.Struct('=Q')
+BUCKET = struct.Struct('=dd')
+SLOT = struct.Struct('=ii')
+RECORD_SIZE = BUCKET.size + SLOT.size * WORKER_SLOTS
+
+
+class Limit(namedtuple('Limit', 'concurrency rate burst')):
+    """Budget of one endpoint. ``None`` leaves that dimension unlimited."""
+
+    @classmethod
+    def from_setting(cls, value):
+        rate = value.get('rate')
+        return cls(value.get('concurrency'), rate, value.get('burst', rate))
+
+
+def get_limits():
+    return {
+        name: Limit.from_setting(value)
+        for name, value in getattr(settings, 'ADMISSION_LIMITS', {}).items()
+    }
+
+
+def refill(limit, tokens, updated, now):
+    """Tokens in the bucket at ``now``; a bucket never used starts full."""
+    if not updated:
+        return limit.burst
+    # Clamped, in case the wall clock stepped back.
+    return min(limit.burst, tokens + max(now - updated, 0.0) * limit.rate)
+
+
+def rate_retry_after(limit, tokens):
+    return (1 - tokens) / limit.rate
+
+
+class MemoryStore:
+    """Budgets of this process."""
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.lock = threading.Lock()
+        # name -> [tokens, updated, in flight]
+        self.state = {name: [0.0, 0.0, 0] for name in limits}
+
+    def acquire(self, name):
+        """(outcome, seconds to wait before retrying) for one request."""
+        limit = self.limits[name]
+        now = time.time()
+        with self.lock:
+            state = self.state[name]
+            if limit.rate is not None:
+                state[0] = refill(limit, state[0], state[1], now)
+                state[1] = now
+                if state[0] < 1:
+                    return SHED_RATE, rate_retry_after(limit, state[0])
+            if limit.concurrency is not None and state[2] >= limit.concurrency:
+                return SHED_CONCURRENCY, CONCURRENCY_RETRY_AFTER
+            if limit.rate is not None:
+                state[0] -= 1
+            state[2] += 1
+        return ADMITTED, 0
+
+    def release(self, name):
+        with self.lock:
+            self.state[name][2] -= 1
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class FileStore:
+    """Budgets shared by the worker processes of one host through ``path``."""
+
+    def __init__(self, path, limits):
+        if fcntl is None:
+            raise ImproperlyConfigured("ADMISSION_STORE = 'file' needs fcntl, which this platform lacks.")
+        self.path = path
+        self.limits = limits
+        self.offsets = {name: HEADER.size + i * RECORD_SIZE for i, name in enumerate(sorted(limits))}
+        self.size = HEADER.size + RECORD_SIZE * len(limits)
+        self.signature = zlib.crc32(f'{WORKER_SLOTS}:{",".join(sorted(limits))}'.encode())
+        self.thread_lock = threading.Lock()
+        self.pid = None
+        self.fd = self.map = None
+
+    def _open(self):
+        # Each process opens the file itself: flock locks belong to an open
+        # file description, which a forked worker would share with its parent.
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < self.size:
+                os.ftruncate(fd, self.size)
+            buffer = mmap.mmap(fd, self.size)
+            if HEADER.unpack_from(buffer)[0] != self.signature:
+                # New file, or written for other endpoints: start over.
+                buffer[:] = bytes(self.size)
+                HEADER.pack_into(buffer, 0, self.signature)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self.fd, self.map, self.pid = fd, buffer, os.getpid()
+
+    @contextmanager
+    def _locked(self):
+        # flock doesn't exclude the threads of one process from each other.
+        with self.thread_lock:
+            if self.pid != os.getpid():
+                self._open()
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield self.map
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def _slots(self, buffer, name):
+        offset = self.offsets[name] + BUCKET.size
+        return [(offset + i * SLOT.size, *SLOT.unpack_from(buffer, offset + i * SLOT.size))
+                for i in range(WORKER_SLOTS)]
+
+    def _reap(self, buffer, slots, pid):
+        """Zero the slots of dead processes; the live slots are returned."""
+        live = []
+        for slot in slots:
+            offset, slot_pid, in_flight = slot
+            if in_flight and slot_pid != pid and not _alive(slot_pid):
+                SLOT.pack_into(buffer, offset, 0, 0)
+                slot = (offset, 0, 0)
+            live.append(slot)
+        return live
+
+    def acquire(self, name):
+        limit = self.limits[name]
+        pid = os.getpid()
+        now = time.time()
+        with self._locked() as buffer:
+            offset = self.offsets[name]
+            tokens, updated = BUCKET.unpack_from(buffer, offset)
+            if limit.rate is not None:
+                tokens = refill(limit, tokens, updated, now)
+                BUCKET.pack_into(buffer, offset, tokens, now)
+                if tokens < 1:
+                    return SHED_RATE, rate_retry_after(limit, tokens)
+
+            slots = self._slots(buffer, name)
+            own = next((slot for slot in slots if slot[1] == pid), None)
+            if own is None or (limit.concurrency is not None
+                               and sum(slot[2] for slot in slots) >= limit.concurrency):
+                # Only on this slow path: checking a pid is a system call.
+                slots = self._reap(buffer, slots, pid)
+                own = own or next((slot for slot in slots if not slot[2]), None)
+            if own is None or (limit.concurrency is not None
+                               and sum(slot[2] for slot in slots) >= limit.concurrency):
+                return SHED_CONCURRENCY, CONCURRENCY_RETRY_AFTER
+
+            if limit.rate is not None:
+                BUCKET.pack_into(buffer, offset, tokens - 1, now)
+            SLOT.pack_into(buffer, own[0], pid, own[2] + 1)
+        return ADMITTED, 0
+
+    def release(self, name):
+        pid = os.getpid()
+        with self._locked() as buffer:
+            for offset, slot_pid, in_flight in self._slots(buffer, name):
+                if slot_pid == pid and in_flight:
+                    SLOT.pack_into(buffer, offset, pid, in_flight - 1)
+                    return
+
+
+def get_store(limits):
+    store = getattr(settings, 'ADMISSION_STORE', 'memory')
+    if store == 'memory':
+        return MemoryStore(limits)
+    if store == 'file':
+        return FileStore(os.fspath(settings.ADMISSION_STORE_PATH), limits)
+    raise ImproperlyConfigured(f"ADMISSION_STORE must be 'memory' or 'file', not {store!r}.")
+
+
+class ReleasingContent:
+    """
+    Streamed content that frees its slot after the last chunk is sent, or
+    when the response is closed unread: the server calls the response's
+    close(), which closes its content.
+    """
+
+    def __init__(self, content, release):
+        self.content = content
+        self._release = release
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self._release()
+
+    def __iter__(self):
+        try:
+            yield from self.content
+        finally:
+            self.release()
+
+    def close(self):
+        self.release()
+
+
+class AsyncReleasingContent(ReleasingContent):
+    # Not iterable, so the response takes it for async content.
+    __iter__ = None
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self.content:
+                yield chunk
+        finally:
+            self.release()
+
+
+def shed_response(outcome, retry_after):
+    if outcome == SHED_RATE:
+        response = JsonResponse({'error': 'Too many requests, please retry later.'}, status=429)
+    else:
+        response = JsonResponse({'error': 'Server busy, please retry later.'}, status=503)
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+class AdmissionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        limits = get_limits()
+        if not getattr(settings, 'ADMISSION_CONTROL', True) or not limits:
+            raise MiddlewareNotUsed
+        self.store = get_store(limits)
+        self.resolve = lru_cache(maxsize=RESOLVE_CACHE_SIZE)(self._resolve)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        name = self.limited_view(request)
+        if name is None:
+            return self.get_response(request)
+        shed = self.admit(name)
+        if shed is not None:
+            return shed
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            self.store.release(name)
+            raise
+        return self.finish(name, response)
+
+    async def __acall__(self, request):
+        name = self.limited_view(request)
+        if name is None:
+            return await self.get_response(request)
+        shed = self.admit(name)
+        if shed is not None:
+            return shed
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            self.store.release(name)
+            raise
+        return self.finish(name, response)
+
+    def _resolve(self, path, urlconf):
+        """The URL match of ``path`` when its endpoint has a limit."""
+        try:
+            match = resolve(path, urlconf)
+        except Resolver404:
+            return None
+        return match if match.url_name in self.store.limits else None
+
+    def limited_view(self, request):
+        """URL name of the request when its endpoint has a limit."""
+        if request.method not in LIMITED_METHODS:
+            return None
+        match = self.resolve(request.path_info, getattr(request, 'urlconf', None))
+        if match is None:
+            return None
+        # The handler sets it again; until then, metrics of shed requests
+        # are filed under the view.
+        request.resolver_match = match
+        return match.url_name
+
+    def admit(self, name):
+        """None when the request may go ahead, else the response to send."""
+        outcome, retry_after = self.store.acquire(name)
+        registry.record_admission(name, outcome)
+        if outcome == ADMITTED:
+            return None
+        return shed_response(outcome, retry_after)
+
+    def finish(self, name, response):
+        if response.streaming:
+            # Still reading rows while the body is sent: release when it is.
+            content_class = AsyncReleasingContent if response.is_async else ReleasingContent
+            response.streaming_content = content_class(response.streaming_content, partial(self.store.release, name))
+        else:
+            self.store.release(name)
+        return response
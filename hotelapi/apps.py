@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class HotelapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hotelapi'
+
+    def ready(self):
+        from . import signals  # noqa: F401
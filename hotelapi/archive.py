@@ -0,0 +1,91 @@
+"""
+Archival of past reservations.
+
+``manage.py archive_reservations --before DATE`` moves the reservations
+that checked out before DATE, with their guest links, from Reservation to
+ArchivedReservation. Each batch is copied and deleted in its own short
+transaction, walking reservation_checkout_idx, so bookings are never held
+up for long and the live tables, with their indexes, only grow with
+current bookings.
+
+Archiving is not cancelling: the rooms (inventory.py), the rollups
+(rollups.py) and the guests stay as they are, so rows are deleted without
+the Reservation signals. Archived reservations drop out of /search/.
+
+/reservations/ and /reservations/<confirmation_number> only include
+archived reservations when asked to with ``?include_archived=true``.
+"""
+from datetime import date
+
+from django.db import router, transaction
+from rest_framework.exceptions import ValidationError
+
+from . import cache
+from .models import ArchivedReservation, Reservation
+
+ARCHIVE_BATCH_SIZE = 500
+INCLUDE_ARCHIVED_PARAM = 'include_archived'
+# The columns of Reservation copied as they are.
+ARCHIVED_COLUMNS = ('id', 'confirmation_number', 'hotel_id', 'hotel_name', 'checkin', 'checkout')
+
+
+def parse_include_archived(request):
+    """Whether ``?include_archived=`` asks for archived reservations too."""
+    value = request.GET.get(INCLUDE_ARCHIVED_PARAM)
+    if value is None:
+        return False
+    if value.lower() in ('true', '1'):
+        return True
+    if value.lower() in ('false', '0'):
+        return False
+    raise ValidationError({INCLUDE_ARCHIVED_PARAM: ['Must be true or false.']})
+
+
+def archive_batch(before, batch_size, using):
+    """
+    Move up to ``batch_size`` reservations that checked out before
+    ``before``, oldest first, in one transaction. Returns the number of
+    reservations and guest links moved.
+    """
+    Through = Reservation.guests.through
+    ArchivedThrough = ArchivedReservation.guests.through
+    with transaction.atomic(using=using):
+        rows = list(
+            Reservation.objects.using(using).filter(checkout__lt=before)
+            .order_by('checkout', 'id').values_list(*ARCHIVED_COLUMNS)[:batch_size]
+        )
+        if not rows:
+            return 0, 0
+        ids = [row[0] for row in rows]
+        links = list(Through.objects.using(using).filter(reservation_id__in=ids).values_list('reservation_id', 'guest_id'))
+
+        ArchivedReservation.objects.using(using).bulk_create(
+            [ArchivedReservation(**dict(zip(ARCHIVED_COLUMNS, row))) for row in rows])
+        ArchivedThrough.objects.using(using).bulk_create(
+            [ArchivedThrough(archivedreservation_id=reservation_id, guest_id=guest_id)
+             for reservation_id, guest_id in links])
+        # Straight DELETEs, without signals: see the module docstring.
+        Through.objects.using(using).filter(reservation_id__in=ids)._raw_delete(using)
+        Reservation.objects.using(using).filter(id__in=ids)._raw_delete(using)
+
+        # The rooms stay taken, so the availability index is still right.
+        cache.bump_version_on_commit(cache.RESERVATIONS)
+    return len(rows), len(links)
+
+
+def archive_reservations(before, batch_size=ARCHIVE_BATCH_SIZE, using=None):
+    """
+    Archive every reservation that checked out before ``before``, which
+    can't be after today, ``batch_size`` at a time.
+    """
+    if before > date.today():
+        raise ValueError('Reservations that have not checked out yet cannot be archived.')
+    using = using or router.db_for_write(Reservation)
+    totals = {'reservations': 0, 'guest_links': 0, 'batches': 0}
+    while True:
+        reservations, links = archive_batch(before, batch_size, using)
+        if not reservations:
+            return totals
+        totals['reservations'] += reservations
+        totals['guest_links'] += links
+        totals['batches'] += 1
@@ -0,0 +1,153 @@
+"""
+Native async variants of the read endpoints.
+
+testproj/urls.py routes to these instead of views.py when ``ASYNC_VIEWS`` is
+enabled, which testproj/asgi.py does by default, so under ASGI the same URLs
+are served without going through a thread-sensitive sync adapter. GET and
+HEAD use Django's async ORM; any other method is handed to the sync view,
+so writes behave exactly as under WSGI.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+
+from . import views
+from .archive import parse_include_archived
+from .availability import aavailable_hotel_rows, response_max_age
+from .cache import HOTELS, RESERVATIONS, cached_response
+from .fastjson import JsonResponse
+from .negotiation import negotiated_response
+from .filters import filter_hotels
+from .models import ArchivedReservation, Hotel, Reservation
+from .pagination import HotelPagination
+from .serializers import HotelReadSerializer, parse_fields
+from .streaming import async_streaming_response
+
+
+def async_read_view(sync_view):
+    """
+    Serve GET/HEAD with the decorated coroutine and delegate everything else
+    to ``sync_view``.
+    """
+    def decorator(view_func):
+        delegate = sync_to_async(sync_view)
+
+        # Like @api_view; the sync view does its own CSRF checks if needed.
+        @csrf_exempt
+        @wraps(view_func)
+        async def view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await delegate(request, *args, **kwargs)
+            try:
+                return await view_func(request, *args, **kwargs)
+            except ValidationError as e:
+                return JsonResponse(e.detail, status=status.HTTP_400_BAD_REQUEST, safe=False)
+
+        return view
+
+    return decorator
+
+
+async def _list_hotels(request):
+    hotels, ordering = filter_hotels(request, Hotel.objects.all())
+    read_serializer = HotelReadSerializer.from_request(request)
+
+    stream = async_streaming_response(request, read_serializer.get_rows(hotels), read_serializer.to_representation)
+    if stream is not None:
+        return stream
+
+    paginator = HotelPagination(ordering=ordering)
+    rows = read_serializer.get_rows(hotels, named=True, extra=paginator.key_fields)
+    page = await paginator.apaginate_queryset(rows, request)
+    if page is not None:
+        data = read_serializer.to_representation_many(page)
+        return negotiated_response(request, paginator.get_paginated_data(data))
+
+    rows = [row async for row in read_serializer.get_rows(hotels)]
+    return negotiated_response(request, read_serializer.to_representation_many(rows), safe=False)
+
+
+@async_read_view(views.Hotels_list)
+@cached_response(HOTELS)
+async def Hotels_list(request):
+    return await _list_hotels(request)
+
+
+@async_read_view(views.Hotels_detail)
+@cached_response(HOTELS)
+async def Hotels_detail(request, id):
+    read_serializer = HotelReadSerializer.from_request(request)
+    try:
+        hotel = await read_serializer.get_rows(Hotel.objects.all()).aget(id=id)
+    except Hotel.DoesNotExist:
+        return JsonResponse({'error': 'Hotel not found'}, status=status.HTTP_404_NOT_FOUND)
+    return JsonResponse(read_serializer.to_representation(hotel))
+
+
+@async_read_view(views.get_generics_list.as_view())
+@cached_response(HOTELS)
+async def get_generics_list(request):
+    return await _list_hotels(request)
+
+
+@async_read_view(views.available_hotels)
+@cached_response(HOTELS, RESERVATIONS, max_age=response_max_age)
+async def available_hotels(request):
+    stay, error = views.parse_stay(request)
+    if error:
+        return JsonResponse({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+    checkin_date, checkout_date = stay
+
+    read_serializer = HotelReadSerializer.from_request(request)
+    rows = await aavailable_hotel_rows(read_serializer, checkin_date, checkout_date)
+    return JsonResponse(read_serializer.to_representation_many(rows), safe=False)
+
+
+@async_read_view(views.reservation_list)
+async def reservation_list(request):
+    fields = parse_fields(request, views.RESERVATION_FIELDS)
+    to_dict = views.reservation_serializer(fields)
+    querysets, paginator = views.reservation_querysets(request, fields)
+
+    stream = async_streaming_response(request, querysets, to_dict)
+    if stream is not None:
+        return stream
+
+    page = await paginator.apaginate_querysets(querysets, request)
+    if page is not None:
+        result = [to_dict(reservation) for reservation in page]
+        return negotiated_response(request, paginator.get_paginated_data(result))
+
+    result = [to_dict(reservation) for queryset in querysets async for reservation in queryset]
+    return negotiated_response(request, result, safe=False)
+
+
+async def _aget_reservation(confirmation_number, fields, include_archived):
+    """Async variant of views.get_reservation()."""
+    try:
+        return await views.reservation_queryset(fields).aget(confirmation_number=confirmation_number)
+    except Reservation.DoesNotExist:
+        if not include_archived:
+            raise
+    try:
+        archived = views.reservation_queryset(fields, queryset=ArchivedReservation.objects.all())
+        return await archived.aget(confirmation_number=confirmation_number)
+    except ArchivedReservation.DoesNotExist:
+        raise Reservation.DoesNotExist
+
+
+@async_read_view(views.reservation_detail)
+async def reservation_detail(request, confirmation_number):
+    fields = parse_fields(request, views.RESERVATION_FIELDS)
+    include_archived = parse_include_archived(request)
+    confirmation_number = views.parse_confirmation_number(confirmation_number)
+    try:
+        if confirmation_number is None:
+            raise Reservation.DoesNotExist
+        reservation = await _aget_reservation(confirmation_number, fields, include_archived)
+    except Reservation.DoesNotExist:
+        return JsonResponse({'error': 'Reservation not found'}, status=status.HTTP_404_NOT_FOUND)
+    return JsonResponse(views.reservation_to_dict(reservation, fields))
@@ -0,0 +1,273 @@
+"""
+Availability engine for ``available_hotels``.
+
+A hotel is available for a stay [checkin, checkout) when it is flagged
+available, its ``available_until`` covers the checkout date, and every
+night of the stay has a room left in its inventory (see inventory.py); a
+night without a HotelInventory row has never been booked and has all its
+rooms. That is the condition a booking is accepted on, so a listed hotel
+can be booked. Two interchangeable backends answer it:
+
+* ``index``: an in-process map of the rooms left per hotel and night, with
+  each hotel's full nights in an interval index, built lazily from the
+  inventory and kept up to date on reservation writes (after commit). It
+  is rebuilt every ``AVAILABILITY_INDEX_TTL`` seconds to pick up writes
+  made by other worker processes.
+* ``database``: a single ``NOT EXISTS`` query for a full night, backed by
+  the unique (hotel, night) index on HotelInventory.
+
+Select one with the ``AVAILABILITY_BACKEND`` setting.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .inventory import get_default_capacity, stay_nights
+from .models import Hotel, HotelInventory
+
+DEFAULT_BACKEND = 'index'
+DEFAULT_INDEX_TTL = 60
+BUILD_CHUNK_SIZE = 5000
+ONE_DAY = timedelta(days=1)
+
+
+class IntervalIndex:
+    """
+    Half-open [start, end) intervals sorted by start, with a running maximum
+    of end values so an overlap check is a single binary search.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.max_ends = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _refresh_max_ends(self, position):
+        del self.max_ends[position:]
+        running = self.max_ends[-1] if self.max_ends else None
+        for end in self.ends[position:]:
+            running = end if running is None or end > running else running
+            self.max_ends.append(running)
+
+    def add(self, start, end):
+        position = bisect_right(self.starts, start)
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+        self._refresh_max_ends(position)
+
+    def remove(self, start, end):
+        position = bisect_left(self.starts, start)
+        while position < len(self.starts) and self.starts[position] == start:
+            if self.ends[position] == end:
+                del self.starts[position]
+                del self.ends[position]
+                self._refresh_max_ends(position)
+                return True
+            position += 1
+        return False
+
+    def overlaps(self, start, end):
+        # Only intervals starting before `end` can overlap; of those, one
+        # overlaps iff the latest end among them is after `start`.
+        position = bisect_left(self.starts, end)
+        return position > 0 and self.max_ends[position - 1] > start
+
+
+class HotelNights:
+    """Rooms left and capacity per night of one hotel, and its full nights as [night, next day) intervals."""
+
+    def __init__(self):
+        self.remaining = {}
+        self.capacity = {}
+        self.full = IntervalIndex()
+
+    def set(self, night, remaining, before):
+        # Never above capacity, as release_rooms() keeps it in the database.
+        remaining = min(remaining, self.capacity[night])
+        self.remaining[night] = remaining
+        if before >= 1 > remaining:
+            self.full.add(night, night + ONE_DAY)
+        elif remaining >= 1 > before:
+            self.full.remove(night, night + ONE_DAY)
+
+    def is_free(self, checkin, checkout):
+        return not self.full.overlaps(checkin, checkout)
+
+
+class AvailabilityIndex:
+    """Per-process map of hotel id -> HotelNights, mirroring HotelInventory."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hotels = None
+        self._built_at = 0.0
+
+    def reset(self):
+        with self._lock:
+            self._hotels = None
+
+    def get_hotels(self):
+        """Return the hotel id -> HotelNights map, (re)building it if needed."""
+        hotels = self._hotels
+        ttl = getattr(settings, 'AVAILABILITY_INDEX_TTL', DEFAULT_INDEX_TTL)
+        if hotels is not None and time.monotonic() - self._built_at < ttl:
+            return hotels
+        with self._lock:
+            if self._hotels is hotels:
+                self._hotels = self._build()
+                self._built_at = time.monotonic()
+            return self._hotels
+
+    def _build(self):
+        hotels = {}
+        rows = HotelInventory.objects.values_list('hotel_id', 'night', 'capacity', 'remaining').order_by('night')
+        for hotel_id, night, capacity, remaining in rows.iterator(chunk_size=BUILD_CHUNK_SIZE):
+            nights = hotels.get(hotel_id)
+            if nights is None:
+                nights = hotels[hotel_id] = HotelNights()
+            nights.capacity[night] = capacity
+            nights.remaining[night] = remaining
+            if remaining < 1:
+                # Rows arrive sorted by night, so appending keeps the order.
+                full = nights.full
+                full.starts.append(night)
+                full.ends.append(night + ONE_DAY)
+                full.max_ends.append(night + ONE_DAY)
+        return hotels
+
+    def add(self, hotel_id, checkin, checkout):
+        """Take a room for each night of a committed booking, as reserve_rooms() did."""
+        with self._lock:
+            if self._hotels is None:
+                return
+            nights = self._hotels.get(hotel_id)
+            if nights is None:
+                nights = self._hotels[hotel_id] = HotelNights()
+            capacity = get_default_capacity()
+            for night in stay_nights(checkin, checkout):
+                nights.capacity.setdefault(night, capacity)
+                before = nights.remaining.get(night, capacity)
+                nights.set(night, before - 1, before)
+
+    def remove(self, hotel_id, checkin, checkout):
+        """Give back the rooms of a cancelled stay, as release_rooms() did."""
+        with self._lock:
+            if self._hotels is None:
+                return
+            nights = self._hotels.get(hotel_id)
+            if nights is None:
+                return
+            for night in stay_nights(checkin, checkout):
+                # Nights without a row are left alone, as in the database.
+                if night in nights.remaining:
+                    before = nights.remaining[night]
+                    nights.set(night, before + 1, before)
+
+    def is_available(self, hotel_id, checkin, checkout):
+        return _is_free(self.get_hotels(), hotel_id, checkin, checkout)
+
+
+def _is_free(hotels, hotel_id, checkin, checkout):
+    nights = hotels.get(hotel_id)
+    return nights is None or nights.is_free(checkin, checkout)
+
+
+availability_index = AvailabilityIndex()
+
+
+def get_backend():
+    return getattr(settings, 'AVAILABILITY_BACKEND', DEFAULT_BACKEND)
+
+
+def response_max_age():
+    """
+    Seconds a cached response may be kept: no longer than the index lags
+    behind the writes of other worker processes, whose version bumps the
+    response cache sees at once.
+    """
+    if get_backend() == 'index':
+        return getattr(settings, 'AVAILABILITY_INDEX_TTL', DEFAULT_INDEX_TTL)
+    return None
+
+
+def candidate_hotels(checkout):
+    """Hotels that are open for booking through ``checkout``."""
+    # IN (1) rather than available=True, which compiles to WHERE "available"
+    # and can't use hotel_available_until_idx.
+    return Hotel.objects.filter(available__in=[True], available_until__gte=checkout).order_by('id')
+
+
+def full_nights(checkin, checkout):
+    """Inventory rows of the stay's nights with no room left."""
+    return HotelInventory.objects.filter(night__gte=checkin, night__lt=checkout, remaining__lt=1)
+
+
+def available_hotels_queryset(checkin, checkout):
+    """Database backend: hotels with a room left on every night of the stay."""
+    full = full_nights(checkin, checkout).filter(hotel=OuterRef('pk'))
+    return candidate_hotels(checkout).exclude(Exists(full))
+
+
+def _index_rows(read_serializer, checkout):
+    """
+    Candidate rows for the index backend, and the position of the hotel id
+    in them.
+    """
+    # The hotel id is fetched even when it isn't serialized; the read
+    # serializer only zips over its own fields so it never shows up.
+    columns = read_serializer.get_columns(extra=('id',))
+    return read_serializer.get_rows(candidate_hotels(checkout), extra=('id',)), columns.index('id')
+
+
+def _check_backend(backend):
+    backend = backend or get_backend()
+    if backend not in ('index', 'database'):
+        raise ValueError(f'Unknown availability backend: {backend!r}')
+    return backend
+
+
+def available_hotel_rows(read_serializer, checkin, checkout, backend=None):
+    """
+    Return ``read_serializer`` rows for the hotels available for the stay
+    [checkin, checkout), using the configured backend.
+    """
+    if _check_backend(backend) == 'database':
+        return list(read_serializer.get_rows(available_hotels_queryset(checkin, checkout)))
+
+    rows, key = _index_rows(read_serializer, checkout)
+    hotels = availability_index.get_hotels()
+    return [row for row in rows if _is_free(hotels, row[key], checkin, checkout)]
+
+
+async def aavailable_hotel_rows(read_serializer, checkin, checkout, backend=None):
+    """Async variant of available_hotel_rows()."""
+    if _check_backend(backend) == 'database':
+        return [row async for row in read_serializer.get_rows(available_hotels_queryset(checkin, checkout))]
+
+    rows, key = _index_rows(read_serializer, checkout)
+    # Building the index reads the whole inventory; keep that off the event loop.
+    hotels = await sync_to_async(availability_index.get_hotels)()
+    return [row async for row in rows if _is_free(hotels, row[key], checkin, checkout)]
+
+
+def record_reservations(reservations):
+    """
+    Take the rooms of newly created reservations in the index once they are
+    committed. Only for reservations whose rooms reserve_rooms() claimed.
+    """
+    stays = [(r.hotel_id, r.checkin, r.checkout) for r in reservations if r.hotel_id is not None]
+
+    def add_stays():
+        for stay in stays:
+            availability_index.add(*stay)
+
+    transaction.on_commit(add_stays, robust=True)
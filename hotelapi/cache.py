@@ -0,0 +1,256 @@
+"""
+Versioned response cache for the hotel read endpoints.
+
+Cached responses are keyed by view, URL arguments, normalized query string
+and the current version of every data scope the view depends on. Writes
+bump the version of their scope (see signals.py), which makes every older
+entry unreachable without having to find and delete it.
+
+Versions live in the ``versions`` cache (the default cache when that alias
+isn't configured), which must be shared by every worker process: a worker
+that can't see another's bump keeps serving its older entries. Settings
+default it to local memory for a single process and to a file based cache
+when WEB_CONCURRENCY says there are more, and keep the responses
+themselves in the faster per-process default cache; their keys carry the
+shared versions, so they go stale together. Hit/miss counters live in the default cache, so
+they are per process unless it is shared too.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from .streaming import STREAM_QUERY_PARAM
+
+HOTELS = 'hotels'
+RESERVATIONS = 'reservations'
+
+DEFAULT_TIMEOUT = 60 * 60
+KEY_PREFIX = 'hotelapi'
+VERSIONS_ALIAS = 'versions'
+
+# Names of the views wrapped by cached_response(), for cache_stats().
+cached_views = []
+
+
+def _version_key(scope):
+    return f'{KEY_PREFIX}:version:{scope}'
+
+
+def _stat_key(view_name, outcome):
+    return f'{KEY_PREFIX}:stats:{view_name}:{outcome}'
+
+
+def _versions_cache():
+    # Looked up on every call: override_settings(CACHES=...) may drop the alias.
+    return caches[VERSIONS_ALIAS] if VERSIONS_ALIAS in settings.CACHES else cache
+
+
+def get_versions(scopes):
+    versions_cache = _versions_cache()
+    keys = [_version_key(scope) for scope in scopes]
+    versions = versions_cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Start from the clock rather than 1 so a version that was
+            # evicted can't come back and match entries cached before it.
+            versions_cache.add(key, time.time_ns())
+            versions[key] = versions_cache.get(key)
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(scopes):
+    versions_cache = _versions_cache()
+    keys = [_version_key(scope) for scope in scopes]
+    versions = await versions_cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await versions_cache.aadd(key, time.time_ns())
+            versions[key] = await versions_cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(scope):
+    versions_cache = _versions_cache()
+    key = _version_key(scope)
+    try:
+        versions_cache.incr(key)
+    except ValueError:
+        versions_cache.add(key, time.time_ns())
+
+
+def bump_version_on_commit(scope):
+    # Bumping before commit would let a concurrent reader cache the old
+    # data under the new version.
+    transaction.on_commit(lambda: bump_version(scope), robust=True)
+
+
+# Counters are best effort: a count may be lost if the key is evicted
+# between the calls, and backends that store nothing (DummyCache) never
+# count at all.
+
+def _count(view_name, outcome):
+    key = _stat_key(view_name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1):
+            # Another worker created it first.
+            try:
+                cache.incr(key)
+            except ValueError:
+                pass
+
+
+async def _acount(view_name, outcome):
+    key = _stat_key(view_name, outcome)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        if not await cache.aadd(key, 1):
+            try:
+                await cache.aincr(key)
+            except ValueError:
+                pass
+
+
+def cache_stats():
+    outcomes = ('hit', 'miss', 'not_modified')
+    keys = [_stat_key(name, outcome) for name in cached_views for outcome in outcomes]
+    counts = cache.get_many(keys)
+    stats = {}
+    for name in cached_views:
+        view_stats = {outcome: counts.get(_stat_key(name, outcome), 0) for outcome in outcomes}
+        lookups = view_stats['hit'] + view_stats['miss']
+        view_stats['hit_rate'] = view_stats['hit'] / lookups if lookups else None
+        stats[name] = view_stats
+    return stats
+
+
+def _make_etag(content):
+    return '"%s"' % hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def _etag_matches(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # Weak comparison: compression (see compression.py) sends W/"...".
+    return etag in (tag.strip().removeprefix('W/') for tag in if_none_match.split(','))
+
+
+def _cache_key(view_name, request, args, kwargs, versions):
+    query = sorted(request.GET.lists())
+    parts = repr((view_name, args, sorted(kwargs.items()), query,
+                  request.META.get('HTTP_ACCEPT', ''), versions))
+    return f'{KEY_PREFIX}:response:{hashlib.sha256(parts.encode()).hexdigest()}'
+
+
+def _timeout(max_age):
+    timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+    limit = max_age() if max_age else None
+    return timeout if limit is None else min(timeout, limit)
+
+
+def _is_cacheable(request):
+    return request.method in ('GET', 'HEAD') and STREAM_QUERY_PARAM not in request.GET
+
+
+def _make_entry(response):
+    """Return the (content, content type, ETag) to cache, or None."""
+    if response.status_code != 200 or response.streaming:
+        return None
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    return (response.content, response['Content-Type'], _make_etag(response.content))
+
+
+def _finish_response(request, response, entry):
+    """Add the ETag, downgrading to a 304 when the client already has it."""
+    not_modified = _etag_matches(request, entry[2])
+    if not_modified:
+        response = HttpResponseNotModified()
+    response['ETag'] = entry[2]
+    patch_vary_headers(response, ['Accept'])
+    return response, not_modified
+
+
+def cached_response(*scopes, max_age=None):
+    """
+    Cache successful GET/HEAD responses of a view until one of ``scopes``
+    changes, and answer matching ``If-None-Match`` requests with a 304.
+
+    ``max_age`` returns the most seconds an entry may be kept, or None, for
+    views that answer from data which can lag behind the versions.
+
+    Apply it outside ``@api_view`` (or to ``as_view()``) so it sees the
+    final, rendered response. Async views get an async wrapper that uses the
+    cache's async API.
+    """
+    def decorator(view_func):
+        # as_view() and @api_view functions carry the original name on view_class.
+        view_name = getattr(getattr(view_func, 'view_class', None), '__name__', view_func.__name__)
+        if view_name not in cached_views:
+            cached_views.append(view_name)
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if not _is_cacheable(request):
+                    return await view_func(request, *args, **kwargs)
+
+                key = _cache_key(view_name, request, args, kwargs, await aget_versions(scopes))
+                entry = await cache.aget(key)
+                if entry is None:
+                    response = await view_func(request, *args, **kwargs)
+                    entry = _make_entry(response)
+                    if entry is None:
+                        return response
+                    await cache.aset(key, entry, _timeout(max_age))
+                    await _acount(view_name, 'miss')
+                else:
+                    await _acount(view_name, 'hit')
+                    response = HttpResponse(entry[0], content_type=entry[1])
+
+                response, not_modified = _finish_response(request, response, entry)
+                if not_modified:
+                    await _acount(view_name, 'not_modified')
+                return response
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _is_cacheable(request):
+                return view_func(request, *args, **kwargs)
+
+            key = _cache_key(view_name, request, args, kwargs, get_versions(scopes))
+            entry = cache.get(key)
+            if entry is None:
+                response = view_func(request, *args, **kwargs)
+                entry = _make_entry(response)
+                if entry is None:
+                    return response
+                cache.set(key, entry, _timeout(max_age))
+                _count(view_name, 'miss')
+            else:
+                _count(view_name, 'hit')
+                response = HttpResponse(entry[0], content_type=entry[1])
+
+            response, not_modified = _finish_response(request, response, entry)
+            if not_modified:
+                _count(view_name, 'not_modified')
+            return response
+
+        return wrapper
+
+    return decorator
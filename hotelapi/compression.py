@@ -0,0 +1,169 @@
+"""
+gzip and brotli compression of responses, negotiated with Accept-Encoding.
+
+Brotli is used when the client accepts it and the ``brotli`` package is
+installed, gzip otherwise. Bodies smaller than ``COMPRESSION_MIN_SIZE``
+bytes are sent as they are, since compressing them costs more time than
+it saves on the wire. Streamed responses (``?stream=``) are compressed
+chunk by chunk and flushed after each one, so clients can start decoding
+before the last row is sent.
+
+Bodies of cached responses carry a content-hash ETag (see cache.py);
+their compressed form is kept in a small per-process LRU keyed by that
+ETag, so a popular page is compressed once rather than on every hit.
+"""
+import threading
+import zlib
+from collections import OrderedDict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .negotiation import header_qualities
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+# Brotli's default (11) is meant for static files; 4-5 compresses dynamic
+# bodies better than gzip at a similar speed.
+DEFAULT_BROTLI_QUALITY = 5
+# Compressed bodies remembered per process, by ETag.
+COMPRESSED_CACHE_SIZE = 128
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/msgpack', 'text/')
+
+
+class GzipCompressor:
+    encoding = 'gzip'
+
+    def __init__(self, level):
+        # wbits 31: a gzip header and trailer around the deflate stream.
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        """Compress a chunk and flush it, so it can be decoded on arrival."""
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b''):
+        return self.compressor.compress(data) + self.compressor.flush()
+
+
+class BrotliCompressor:
+    encoding = 'br'
+
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self, data=b''):
+        return self.compressor.process(data) + self.compressor.finish()
+
+
+def accepted_encodings(header):
+    """The codings of an Accept-Encoding header the client will take."""
+    qualities = header_qualities(header)
+    wildcard = qualities.get('*', 0.0)
+    return {coding for coding in ('br', 'gzip') if qualities.get(coding, wildcard) > 0}
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'RESPONSE_COMPRESSION', True)
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE)
+        self.gzip_level = getattr(settings, 'GZIP_LEVEL', DEFAULT_GZIP_LEVEL)
+        self.brotli_quality = getattr(settings, 'BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY)
+        self.compressed = OrderedDict()
+        self.lock = threading.Lock()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def new_compressor(self, request):
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if 'br' in accepted and brotli is not None:
+            return BrotliCompressor(self.brotli_quality)
+        if 'gzip' in accepted:
+            return GzipCompressor(self.gzip_level)
+        return None
+
+    def process_response(self, request, response):
+        if (not self.enabled or response.has_header('Content-Encoding')
+                or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        # From here on the body depends on Accept-Encoding.
+        patch_vary_headers(response, ['Accept-Encoding'])
+        compressor = self.new_compressor(request)
+        if compressor is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self._acompress_stream(response.streaming_content, compressor)
+            else:
+                response.streaming_content = self._compress_stream(response.streaming_content, compressor)
+            del response['Content-Length']
+        else:
+            content = self._compress(response, compressor)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        etag = response.get('ETag')
+        if etag and not etag.startswith('W/'):
+            # The compressed bytes differ from what the strong ETag names.
+            response['ETag'] = f'W/{etag}'
+        response['Content-Encoding'] = compressor.encoding
+        return response
+
+    def _compress(self, response, compressor):
+        etag = response.get('ETag')
+        if not etag:
+            return compressor.finish(response.content)
+        key = (etag, len(response.content), compressor.encoding)
+        with self.lock:
+            content = self.compressed.get(key)
+            if content is not None:
+                self.compressed.move_to_end(key)
+                return content
+        content = compressor.finish(response.content)
+        with self.lock:
+            self.compressed[key] = content
+            if len(self.compressed) > COMPRESSED_CACHE_SIZE:
+                self.compressed.popitem(last=False)
+        return content
+
+    @staticmethod
+    def _compress_stream(chunks, compressor):
+        for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+
+    @staticmethod
+    async def _acompress_stream(chunks, compressor):
+        async for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
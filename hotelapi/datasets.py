@@ -0,0 +1,125 @@
+"""
+Synthetic hotel and reservation datasets for benchmarks and scale tests.
+
+Rows are written with bulk inserts straight into the tables, bypassing the
+API's validation, so millions of rows can be loaded in minutes. Everything
+is derived from a seeded random.Random, so the same arguments always
+produce the same data.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from . import cache
+from .availability import availability_index
+from .inventory import rebuild_inventory
+from .models import Hotel, Reservation
+from .rollups import rebuild_rollups
+from .services import intern_guests
+
+HOTEL_PREFIXES = ['Grand', 'Harbour', 'Royal', 'Park', 'City', 'Lakeside', 'Garden', 'Central', 'Ocean', 'Alpine']
+HOTEL_PLACES = ['Halifax', 'Toronto', 'Montreal', 'Vancouver', 'Calgary', 'Ottawa', 'Quebec', 'Victoria', 'Regina', 'Moncton']
+FIRST_NAMES = ['Anuja', 'John', 'Jane', 'Maria', 'Wei', 'Fatima', 'Liam', 'Olivia', 'Noah', 'Emma', 'Arjun', 'Sofia']
+LAST_NAMES = ['Smith', 'Gamage', 'Tremblay', 'Nguyen', 'Singh', 'Martin', 'Roy', 'Brown', 'Lee', 'Wilson', 'Khan']
+GENDERS = ['Female', 'Male', 'Other']
+# Share of reservations with 1, 2, 3, ... guests.
+GUEST_COUNT_WEIGHTS = [35, 40, 10, 10, 3, 2]
+
+
+def hotel_name(rng, hotel_id):
+    return f'{rng.choice(HOTEL_PREFIXES)} {rng.choice(HOTEL_PLACES)} {hotel_id}'
+
+
+def make_hotels(count, rng, start_id=1, today=None):
+    today = today or date.today()
+    return [
+        Hotel(
+            id=hotel_id,
+            name=hotel_name(rng, hotel_id),
+            rating=Decimal(rng.randint(10, 50)) / 10,
+            price=rng.randint(60, 600),
+            available_until=today + timedelta(days=rng.randint(-30, 400)),
+            # Mostly bookable, with some closed and some not yet reviewed.
+            available=rng.choices([True, False, None], weights=[85, 10, 5])[0],
+        )
+        for hotel_id in range(start_id, start_id + count)
+    ]
+
+
+def make_stay(rng, today=None):
+    """
+    A checkin skewed towards the coming weeks with a short, mostly 1-4
+    night stay.
+    """
+    today = today or date.today()
+    checkin = today + timedelta(days=int(rng.triangular(-60, 365, 14)))
+    nights = 1 + min(int(rng.expovariate(1 / 2.5)), 20)
+    return checkin, checkin + timedelta(days=nights)
+
+
+def make_guest_list(rng):
+    count = rng.choices(range(1, len(GUEST_COUNT_WEIGHTS) + 1), weights=GUEST_COUNT_WEIGHTS)[0]
+    return [
+        {'guest_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', 'gender': rng.choice(GENDERS)}
+        for _ in range(count)
+    ]
+
+
+def seed_hotels(count, seed=0, start_id=1, batch_size=5000):
+    """Insert ``count`` hotels with ids starting at ``start_id``."""
+    rng = random.Random(seed)
+    for offset in range(0, count, batch_size):
+        hotels = make_hotels(min(batch_size, count - offset), rng, start_id=start_id + offset)
+        with transaction.atomic():
+            Hotel.objects.bulk_create(hotels)
+    return list(range(start_id, start_id + count))
+
+
+def seed_reservations(count, hotels, seed=0, batch_size=2000):
+    """
+    Insert ``count`` reservations, with their guests, spread over
+    ``hotels`` (a list of (id, name) pairs).
+    """
+    rng = random.Random(seed)
+    Through = Reservation.guests.through
+    for offset in range(0, count, batch_size):
+        reservations = []
+        guest_lists = []
+        for _ in range(min(batch_size, count - offset)):
+            hotel_id, name = rng.choice(hotels)
+            checkin, checkout = make_stay(rng)
+            reservations.append(Reservation(hotel_id=hotel_id, hotel_name=name, checkin=checkin, checkout=checkout))
+            guest_lists.append([(guest['guest_name'], guest['gender']) for guest in make_guest_list(rng)])
+
+        with transaction.atomic():
+            Reservation.objects.bulk_create(reservations)
+            guest_ids = intern_guests(identity for guests in guest_lists for identity in guests)
+            Through.objects.bulk_create([
+                Through(reservation_id=reservation.pk, guest_id=guest_id)
+                for reservation, guests in zip(reservations, guest_lists)
+                for guest_id in dict.fromkeys(guest_ids[identity] for identity in guests)
+            ])
+
+
+def seed(hotels, reservations, seed=0, start_id=1):
+    """
+    Seed a full dataset and return the (id, name) of every hotel. With
+    ``start_id``, grow an existing one: the new reservations are spread
+    over the old hotels as well.
+    """
+    seed_hotels(hotels, seed=seed, start_id=start_id)
+    hotel_rows = list(Hotel.objects.order_by('id').values_list('id', 'name'))
+    if reservations and hotel_rows:
+        seed_reservations(reservations, hotel_rows, seed=seed + 1)
+        # Bulk inserts skip reserve_rooms().
+        rebuild_inventory()
+    # And the rollups.
+    rebuild_rollups()
+
+    # Bulk inserts don't send signals; drop anything derived from the old data.
+    cache.bump_version(cache.HOTELS)
+    cache.bump_version(cache.RESERVATIONS)
+    availability_index.reset()
+    return hotel_rows
@@ -0,0 +1,46 @@
+"""
+Parsing of the dates clients send, in request bodies and query strings.
+
+Both YYYY-MM-DD and MM/DD/YYYY are accepted everywhere. A few distinct
+dates (the coming weeks' checkins and checkouts) make up most requests, so
+results are memoized.
+"""
+import re
+from datetime import date
+from functools import lru_cache
+
+ISO_FORMAT_HINT = 'YYYY-MM-DD'
+US_FORMAT_HINT = 'MM/DD/YYYY'
+# Distinct date strings remembered; a few years of days.
+PARSE_CACHE_SIZE = 2048
+
+_iso_re = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})', re.ASCII)
+_us_re = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})', re.ASCII)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_date(value):
+    """
+    Parse YYYY-MM-DD or MM/DD/YYYY; single digit months and days are
+    accepted too. Raises ValueError for anything else.
+    """
+    # Fast path for the zero padded ISO dates nearly every client sends.
+    if len(value) == 10 and value[4] == '-' and value[7] == '-' and value.isascii():
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+    match = _iso_re.fullmatch(value)
+    if match:
+        year, month, day = match.groups()
+    else:
+        match = _us_re.fullmatch(value)
+        if not match:
+            raise ValueError(f'Invalid date: {value!r}')
+        month, day, year = match.groups()
+    return date(int(year), int(month), int(day))
+
+
+def format_hint(value):
+    """The format ``value`` looks like it was meant to be in, for error messages."""
+    return US_FORMAT_HINT if '/' in value else ISO_FORMAT_HINT
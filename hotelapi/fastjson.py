@@ -0,0 +1,123 @@
+"""
+JSON encoding and decoding for requests and responses.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise; ``JSON_BACKEND`` (``auto``, ``orjson`` or ``stdlib``) picks one
+explicitly. Both produce compact UTF-8 and the same text for the values
+the API returns: types orjson doesn't handle the way Django does
+(Decimal, datetimes, lazy strings) are passed to the usual Django or DRF
+encoder, so switching backends changes speed, not output.
+
+Views use JsonResponse and FastJSONParser from here in place of Django's
+and DRF's; FastJSONRenderer is DRF's default renderer (see settings).
+"""
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder as DRFJSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoders = {}
+
+
+def _default_for(encoder):
+    """The ``default`` hook of ``encoder``, for values JSON has no type for."""
+    try:
+        return _encoders[encoder]
+    except KeyError:
+        default = _encoders[encoder] = encoder().default
+        return default
+
+
+class StdlibBackend:
+    name = 'stdlib'
+
+    @staticmethod
+    def dumps(obj, encoder=DjangoJSONEncoder):
+        return json.dumps(obj, cls=encoder, separators=(',', ':'), ensure_ascii=False).encode()
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+
+class OrjsonBackend:
+    name = 'orjson'
+    # Datetimes go through the Django encoder, which has its own format.
+    options = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+    @classmethod
+    def dumps(cls, obj, encoder=DjangoJSONEncoder):
+        return orjson.dumps(obj, default=_default_for(encoder), option=cls.options)
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+
+BACKENDS = {'stdlib': StdlibBackend}
+if orjson is not None:
+    BACKENDS['orjson'] = OrjsonBackend
+
+
+def get_backend():
+    """The configured backend, or the fastest one installed."""
+    name = getattr(settings, 'JSON_BACKEND', 'auto')
+    if name == 'auto':
+        return BACKENDS.get('orjson', StdlibBackend)
+    return BACKENDS.get(name, StdlibBackend)
+
+
+def dumps(obj, encoder=DjangoJSONEncoder):
+    """Encode ``obj`` to UTF-8 bytes."""
+    return get_backend().dumps(obj, encoder)
+
+
+def loads(data):
+    """Decode JSON from bytes or str. Raises ValueError if it is malformed."""
+    return get_backend().loads(data)
+
+
+class JsonResponse(HttpResponse):
+    """django.http.JsonResponse, encoded with dumps()."""
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+class FastJSONParser(JSONParser):
+    """DRF's JSONParser, decoding with loads()."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        data = stream.read() if stream is not None else b''
+        try:
+            if encoding.lower().replace('-', '') != 'utf8':
+                data = data.decode(encoding)
+            return loads(data)
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """DRF's JSONRenderer, encoding with dumps() unless indentation was asked for."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data, DRFJSONEncoder)
@@ -0,0 +1,47 @@
+import uuid
+
+from django.db import models
+
+
+class CompactUUIDField(models.UUIDField):
+    """
+    A UUIDField stored as 16 raw bytes on SQLite and MySQL, instead of the
+    32 hex characters UUIDField uses where there is no native uuid type.
+    Other databases keep UUIDField's column type.
+
+    Values read back are uuid.UUID instances; assignments and lookups
+    accept UUIDs or their string forms, with or without dashes. Byte order
+    matches the hex string, so ordering and range lookups are unchanged.
+    """
+
+    def get_internal_type(self):
+        # Keeps the backends' UUIDField converters, which expect strings,
+        # away from the bytes.
+        return 'CompactUUIDField'
+
+    @staticmethod
+    def _stores_bytes(connection):
+        return connection.vendor in ('sqlite', 'mysql')
+
+    def db_type(self, connection):
+        if connection.vendor == 'sqlite':
+            return 'blob'
+        if connection.vendor == 'mysql':
+            return 'binary(16)'
+        return connection.data_types['UUIDField']
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not self._stores_bytes(connection):
+            return super().get_db_prep_value(value, connection, prepared)
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            value = self.to_python(value)
+        return value.bytes
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, (bytes, memoryview)):
+            return uuid.UUID(bytes=bytes(value))
+        if isinstance(value, str):
+            return uuid.UUID(value)
+        return value
@@ -0,0 +1,179 @@
+"""
+Filtering and sorting for the hotel and reservation list endpoints.
+
+Every filter is pushed down into SQL and every one of them, like every sort
+key, can be answered from an index on Hotel (see Hotel.Meta.indexes):
+
+    ?min_price=&max_price=                  hotel_price_idx
+    ?min_rating=                            hotel_rating_idx
+    ?name_prefix=                           index on name (case-sensitive)
+    ?available=true|false|null              hotel_available_until_idx
+    ?min_available_until=&max_available_until=
+                                            hotel_available_until_idx when
+                                            combined with ?available,
+                                            hotel_until_idx otherwise
+    ?sort=[-]id|price|rating|name|available_until
+
+Without ?sort, unfiltered lists are sorted by id and filtered ones by the
+column of their first filter (in the order of FILTER_SORT_KEYS). With
+ORDER BY id, SQLite would rather walk the table in rowid order than seek
+the filter's index and sort the matches, and it can't tell from its
+statistics which is cheaper for a range.
+
+The reservation list takes lookups rather than a choice of sort; each
+filtered list is ordered by the index that answers it (see
+Reservation.Meta.indexes):
+
+    ?hotel_id=                              reservation_hotel_stay_idx
+    ?min_checkin=&max_checkin=              reservation_hotel_stay_idx with
+                                            ?hotel_id, reservation_stay_idx
+                                            otherwise
+    ?min_checkout=&max_checkout=            reservation_checkout_idx unless
+                                            combined with the above
+    ?guest_name=                            guest_name_idx (exact match)
+"""
+from rest_framework.exceptions import ValidationError
+
+from .serializers import HotelFilterSerializer, ReservationFilterSerializer
+
+FILTER_PARAMS = tuple(HotelFilterSerializer._declared_fields)
+DEFAULT_SORT = 'id'
+# Default sort key for filtered lists: the first filter present wins.
+FILTER_SORT_KEYS = (
+    ('name_prefix', 'name'),
+    ('min_price', 'price'),
+    ('max_price', 'price'),
+    ('min_rating', 'rating'),
+    ('available', 'available_until'),
+    ('min_available_until', 'available_until'),
+    ('max_available_until', 'available_until'),
+)
+
+
+def prefix_upper_bound(prefix):
+    """
+    The smallest string greater than every string starting with ``prefix``,
+    or None if there is none.
+
+    ``name >= prefix AND name < upper_bound`` is a range the name index can
+    seek to, unlike LIKE 'prefix%', which SQLite only optimizes under
+    case_sensitive_like and never with Django's ESCAPE clause.
+    """
+    while prefix:
+        last = ord(prefix[-1])
+        if last < 0x10FFFF:
+            return prefix[:-1] + chr(last + 1)
+        prefix = prefix[:-1]
+    return None
+
+
+def get_hotel_ordering(sort):
+    # A unique tiebreaker in the same direction keeps the order stable for
+    # keyset pagination and lets SQLite walk the index (whose entries end
+    # with the rowid) instead of sorting.
+    if sort.lstrip('-') == 'id':
+        return (sort,)
+    return (sort, '-id' if sort.startswith('-') else 'id')
+
+
+def get_default_sort(params):
+    for param, sort in FILTER_SORT_KEYS:
+        if param in params:
+            return sort
+    return DEFAULT_SORT
+
+
+def filter_hotels(request, queryset):
+    """
+    Apply the filter and sort query parameters to ``queryset``.
+
+    Returns (queryset, ordering); ``ordering`` is what keyset pagination
+    should use. Raises ValidationError for invalid parameters.
+    """
+    if not any(param in request.GET for param in FILTER_PARAMS):
+        ordering = get_hotel_ordering(DEFAULT_SORT)
+        return queryset.order_by(*ordering), ordering
+
+    # A plain dict: with a QueryDict, BooleanField would read a missing
+    # ?available as False, like an unchecked HTML checkbox.
+    serializer = HotelFilterSerializer(data=request.GET.dict())
+    if not serializer.is_valid():
+        raise ValidationError(serializer.errors)
+    params = serializer.validated_data
+
+    if 'min_price' in params:
+        queryset = queryset.filter(price__gte=params['min_price'])
+    if 'max_price' in params:
+        queryset = queryset.filter(price__lte=params['max_price'])
+    if 'min_rating' in params:
+        queryset = queryset.filter(rating__gte=params['min_rating'])
+    if params.get('name_prefix'):
+        prefix = params['name_prefix']
+        queryset = queryset.filter(name__gte=prefix)
+        upper_bound = prefix_upper_bound(prefix)
+        if upper_bound is not None:
+            queryset = queryset.filter(name__lt=upper_bound)
+    if 'available' in params:
+        if params['available'] is None:
+            queryset = queryset.filter(available__isnull=True)
+        else:
+            # available=True compiles to WHERE "available", which SQLite
+            # can't seek an index with; IN (1) it can.
+            queryset = queryset.filter(available__in=[params['available']])
+    if 'min_available_until' in params:
+        queryset = queryset.filter(available_until__gte=params['min_available_until'])
+    if 'max_available_until' in params:
+        queryset = queryset.filter(available_until__lte=params['max_available_until'])
+
+    ordering = get_hotel_ordering(params.get('sort') or get_default_sort(params))
+    return queryset.order_by(*ordering), ordering
+
+
+RESERVATION_FILTER_PARAMS = tuple(ReservationFilterSerializer._declared_fields)
+# Orderings that walk reservation_hotel_stay_idx / reservation_stay_idx and
+# reservation_checkout_idx without a sort step.
+RESERVATION_STAY_ORDERING = ('checkin', 'checkout', 'id')
+RESERVATION_CHECKOUT_ORDERING = ('checkout', 'id')
+
+
+def filter_reservations(request, queryset):
+    """
+    Apply the lookup query parameters to ``queryset``, of Reservation or
+    ArchivedReservation.
+
+    Returns (queryset, ordering); ``ordering`` is None when no filter is
+    given, in which case the queryset and the pagination order are left
+    alone. Raises ValidationError for invalid parameters.
+    """
+    if not any(param in request.GET for param in RESERVATION_FILTER_PARAMS):
+        return queryset, None
+
+    serializer = ReservationFilterSerializer(data=request.GET.dict())
+    if not serializer.is_valid():
+        raise ValidationError(serializer.errors)
+    params = serializer.validated_data
+
+    if 'hotel_id' in params:
+        queryset = queryset.filter(hotel_id=params['hotel_id'])
+    if 'min_checkin' in params:
+        queryset = queryset.filter(checkin__gte=params['min_checkin'])
+    if 'max_checkin' in params:
+        queryset = queryset.filter(checkin__lte=params['max_checkin'])
+    if 'min_checkout' in params:
+        queryset = queryset.filter(checkout__gte=params['min_checkout'])
+    if 'max_checkout' in params:
+        queryset = queryset.filter(checkout__lte=params['max_checkout'])
+    if 'guest_name' in params:
+        # A subquery rather than a join on guests, which would repeat a
+        # reservation for every guest of that name on it.
+        guests = queryset.model._meta.get_field('guests')
+        matching = guests.remote_field.through.objects.filter(guest__guest_name=params['guest_name'])
+        queryset = queryset.filter(id__in=matching.values(guests.m2m_field_name()))
+
+    if params.keys() & {'hotel_id', 'min_checkin', 'max_checkin'}:
+        ordering = RESERVATION_STAY_ORDERING
+    elif params.keys() & {'min_checkout', 'max_checkout'}:
+        ordering = RESERVATION_CHECKOUT_ORDERING
+    else:
+        ordering = ('id',)
+    return queryset.order_by(*ordering), ordering
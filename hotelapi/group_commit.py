@@ -0,0 +1,194 @@
+"""
+Group commit for single reservation writes.
+
+By default POST /reservation/ commits every reservation in its own
+transaction, and on SQLite each commit queues for the single write lock and
+syncs the WAL. With ``RESERVATION_COMMIT_MODE`` set to one of the group
+modes, the request is still validated and given its confirmation number in
+the request thread, but the row is handed to one writer thread per process.
+The writer commits everything that has queued up in a single transaction,
+as soon as ``GROUP_COMMIT_MAX_ITEMS`` reservations are waiting or
+``GROUP_COMMIT_MAX_DELAY_MS`` after the first of them arrived.
+
+* ``direct``: one transaction per request (the default).
+* ``group``: the response waits until the batch is committed, so a 201
+  still means the reservation is saved. Each booking can take up to the
+  delay longer; in exchange the commit cost is shared by the batch.
+* ``group-async``: the response is a 202 as soon as the reservation is
+  queued. Reservations still queued when the process dies are lost, and a
+  failed commit, including one rejected for lack of rooms, is only logged.
+
+The delay is the throughput-vs-latency knob: a longer one gathers larger
+batches under load, and costs an idle server up to that much latency per
+booking. ``manage.py bench --commit-mode`` compares the modes.
+
+Under ASGI, sync views run one at a time in a single thread, so requests
+can't wait on a batch together; use ``group-async`` there.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, connections, transaction
+
+from .inventory import InventoryExhausted
+from .services import create_reservations
+
+logger = logging.getLogger(__name__)
+
+COMMIT_MODES = ('direct', 'group', 'group-async')
+DEFAULT_COMMIT_MODE = 'direct'
+# Seconds a request in ``group`` mode waits for its batch to commit.
+COMMIT_WAIT_TIMEOUT = 30
+
+_STOP = object()
+
+
+def get_commit_mode():
+    mode = getattr(settings, 'RESERVATION_COMMIT_MODE', DEFAULT_COMMIT_MODE)
+    if mode not in COMMIT_MODES:
+        raise ImproperlyConfigured(
+            f"RESERVATION_COMMIT_MODE must be one of {', '.join(map(repr, COMMIT_MODES))}, not {mode!r}."
+        )
+    return mode
+
+
+class GroupCommitWriter:
+    """
+    Commits queued reservations in batches from a background thread, which
+    is started by the first submit().
+    """
+
+    def __init__(self, max_items=100, max_delay=0.005):
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self.queue = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.transactions = 0
+        self.committed = 0
+
+    def submit(self, item):
+        """
+        Queue validated ``ReservationInputSerializer`` data. Returns the
+        confirmation number and a Future for the saved Reservation.
+        """
+        item = dict(item, confirmation_number=str(uuid.uuid4()))
+        future = Future()
+        self._ensure_started()
+        self.queue.put((item, future))
+        return item['confirmation_number'], future
+
+    def stats(self):
+        return {
+            'transactions': self.transactions,
+            'reservations': self.committed,
+            'queued': self.queue.qsize(),
+        }
+
+    def close(self):
+        """Commit everything queued and stop the writer thread."""
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.queue.put(_STOP)
+            thread.join()
+
+    def _ensure_started(self):
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name='reservation-group-commit', daemon=True)
+                    self.thread.start()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            entry = self.queue.get()
+            if entry is _STOP:
+                break
+            batch = [entry]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_items:
+                # Past the deadline, still take whatever is already queued.
+                timeout = deadline - time.monotonic()
+                try:
+                    entry = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+            self._flush(batch)
+        connections.close_all()
+
+    def _flush(self, batch):
+        # What the request cycle does for request threads.
+        close_old_connections()
+        try:
+            self._commit(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch[0], e)
+                return
+            # One bad reservation rolls back the whole batch; commit the
+            # others on their own.
+            for entry in batch:
+                try:
+                    self._commit([entry])
+                except Exception as e:
+                    self._fail(entry, e)
+
+    def _commit(self, batch):
+        with transaction.atomic():
+            reservations = create_reservations([item for item, _ in batch])
+        self.transactions += 1
+        self.committed += len(batch)
+        for (_, future), reservation in zip(batch, reservations):
+            future.set_result(reservation)
+
+    def _fail(self, entry, error):
+        item, future = entry
+        if isinstance(error, InventoryExhausted):
+            # Expected under load; in group mode the client gets a 409.
+            logger.info('Reservation %s rejected: %s', item['confirmation_number'], error)
+        else:
+            logger.error('Group commit of reservation %s failed', item['confirmation_number'], exc_info=error)
+        future.set_exception(error)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = GroupCommitWriter(
+                max_items=getattr(settings, 'GROUP_COMMIT_MAX_ITEMS', 100),
+                max_delay=getattr(settings, 'GROUP_COMMIT_MAX_DELAY_MS', 5) / 1000,
+            )
+            # Daemon threads are killed at exit; commit what is queued first.
+            atexit.register(_writer.close)
+        return _writer
+
+
+def reset_writer():
+    """
+    Commit what is queued and stop the writer; the next reservation starts
+    a new one with the current settings.
+    """
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        atexit.unregister(writer.close)
+        writer.close()
@@ -0,0 +1,155 @@
+"""
+Streaming hotel import for the catalogue feed (see ``manage.py import_hotels``).
+
+Rows are read one at a time from CSV or JSON Lines, validated and upserted
+in batches, so memory use depends on the batch size and not on the size of
+the input. The catalogue buckets of /stats/ are recomputed once, after the
+last batch, rather than updated batch by batch.
+"""
+import csv
+
+from django.db import DatabaseError, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import SkipField, empty
+from rest_framework.validators import UniqueValidator
+
+from . import fastjson
+from .models import Hotel
+from .rollups import refresh_catalogue
+from .serializers import HotelSerializer
+from .services import upsert_hotels
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+
+class HotelRowValidator:
+    """
+    Validates raw rows with the fields of ``HotelSerializer``, so the rules
+    and error messages are the same as for ``POST /hotel_list/``.
+
+    The fields are built once instead of once per row, and the unique check
+    on ``id`` is left out: it costs a query per row, and an existing id is
+    an update here rather than an error.
+    """
+    serializer_class = HotelSerializer
+
+    def __init__(self):
+        self.fields = []
+        for name, field in self.serializer_class().fields.items():
+            if field.read_only:
+                continue
+            field.validators = [
+                validator for validator in field.validators if not isinstance(validator, UniqueValidator)
+            ]
+            self.fields.append((name, field))
+
+    def validate(self, row):
+        """Return (validated_data, errors); errors is empty when the row is valid."""
+        if not isinstance(row, dict):
+            return None, {'non_field_errors': [
+                f'Invalid data. Expected a dictionary, but got {type(row).__name__}.'
+            ]}
+        data = {}
+        errors = {}
+        for name, field in self.fields:
+            try:
+                data[name] = field.run_validation(row.get(name, empty))
+            except ValidationError as e:
+                errors[name] = e.detail
+            except SkipField:
+                pass
+        return data, errors
+
+
+def read_csv(stream):
+    """Yield (line_number, row) for a CSV file with a header row."""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl(stream):
+    """
+    Yield (line_number, row) for a JSON Lines file. Lines that aren't valid
+    JSON are yielded as strings and rejected by the validator.
+    """
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, fastjson.loads(line)
+        except ValueError:
+            yield line_number, line
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+def _save_batch(batch, on_error):
+    """
+    Upsert ``batch``, a dict of id -> (line_number, Hotel). Returns the
+    number of hotels saved.
+    """
+    try:
+        with transaction.atomic():
+            upsert_hotels([hotel for _, hotel in batch.values()], catalogue=False)
+        return len(batch)
+    except DatabaseError:
+        pass
+
+    # Find the offending rows: retry one at a time, each in its own
+    # transaction, and report the ones that still fail.
+    saved = 0
+    for line_number, hotel in batch.values():
+        try:
+            with transaction.atomic():
+                upsert_hotels([hotel], catalogue=False)
+            saved += 1
+        except DatabaseError as e:
+            on_error(line_number, {'non_field_errors': [str(e)]})
+    return saved
+
+
+def import_hotels(rows, batch_size=IMPORT_BATCH_SIZE, dry_run=False, on_error=None):
+    """
+    Validate and upsert ``rows``, an iterable of (line_number, row).
+
+    Invalid rows are passed to ``on_error(line_number, errors)`` and skipped;
+    the rest of the input is still imported. When an id appears more than
+    once in a batch the last row wins and the others count as duplicates.
+    Returns a dict of counts.
+    """
+    validator = HotelRowValidator()
+    counts = {'rows': 0, 'imported': 0, 'duplicates': 0, 'failed': 0}
+
+    def report(line_number, errors):
+        counts['failed'] += 1
+        if on_error is not None:
+            on_error(line_number, errors)
+
+    def flush(batch):
+        counts['imported'] += len(batch) if dry_run else _save_batch(batch, report)
+
+    batch = {}
+    for line_number, row in rows:
+        counts['rows'] += 1
+        data, errors = validator.validate(row)
+        if errors:
+            report(line_number, errors)
+            continue
+        if data['id'] in batch:
+            counts['duplicates'] += 1
+        batch[data['id']] = (line_number, Hotel(**data))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = {}
+    if batch:
+        flush(batch)
+    if counts['imported'] and not dry_run:
+        refresh_catalogue()
+    return counts
@@ -0,0 +1,150 @@
+"""
+Per-hotel, per-night room inventory.
+
+Each HotelInventory row holds a hotel's capacity for one night and the
+rooms still free. Booking a stay claims a room for each of its nights with
+a conditional update in the reservation's own transaction:
+
+    UPDATE hotelapi_hotelinventory SET remaining = remaining - 1
+    WHERE hotel_id = %s AND night IN (...) AND remaining >= 1
+
+If fewer rows change than the stay has nights, one of them is full: the
+transaction is rolled back and the booking rejected with InventoryExhausted.
+Only bookings of the same hotel-nights touch the same rows, so on databases
+with row locks they are the only ones that wait on each other. On SQLite,
+writers take turns anyway, and the condition is what stops two bookings
+from both taking the last room.
+
+Rows are created on the first booking of a night, with
+``INVENTORY_DEFAULT_CAPACITY`` rooms; update ``capacity`` and ``remaining``
+together to change it. Writes that bypass services.create_reservations,
+such as datasets.seed_reservations or changing the dates of a reservation,
+must be followed by rebuild_inventory() (``manage.py rebuild_inventory``).
+
+``available_hotels`` answers from the same rows (see availability.py): a
+hotel is listed for a stay exactly when a booking of it would be accepted.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Least
+
+from .models import HotelInventory, Reservation
+
+DEFAULT_CAPACITY = 10
+REBUILD_BATCH_SIZE = 5000
+
+
+class InventoryExhausted(Exception):
+    """Some night of a stay has no rooms left."""
+
+
+def get_default_capacity():
+    return getattr(settings, 'INVENTORY_DEFAULT_CAPACITY', DEFAULT_CAPACITY)
+
+
+def stay_nights(checkin, checkout):
+    return [checkin + timedelta(days=offset) for offset in range((checkout - checkin).days)]
+
+
+def rooms_needed(stays):
+    """Rooms per (hotel_id, night) for an iterable of (hotel_id, checkin, checkout)."""
+    needed = Counter()
+    for hotel_id, checkin, checkout in stays:
+        if hotel_id is None:
+            continue
+        for night in stay_nights(checkin, checkout):
+            needed[hotel_id, night] += 1
+    return needed
+
+
+def _by_count(needed):
+    """
+    Yield (count, condition, rows) so that every hotel-night needing
+    ``count`` rooms is changed by one update; usually there is only one.
+    """
+    groups = {}
+    for (hotel_id, night), count in needed.items():
+        groups.setdefault(count, {}).setdefault(hotel_id, []).append(night)
+    for count, nights_by_hotel in groups.items():
+        condition = Q()
+        for hotel_id, nights in nights_by_hotel.items():
+            condition |= Q(hotel_id=hotel_id, night__in=nights)
+        yield count, condition, sum(len(nights) for nights in nights_by_hotel.values())
+
+
+def reserve_rooms(stays):
+    """
+    Claim a room for every night of ``stays`` or raise InventoryExhausted.
+
+    Must be called inside a transaction, which the caller lets roll back
+    on failure.
+    """
+    needed = rooms_needed(stays)
+    if not needed:
+        return
+    capacity = get_default_capacity()
+    HotelInventory.objects.bulk_create(
+        [HotelInventory(hotel_id=hotel_id, night=night, capacity=capacity, remaining=capacity)
+         for hotel_id, night in needed],
+        ignore_conflicts=True,
+    )
+    for count, condition, rows in _by_count(needed):
+        updated = (
+            HotelInventory.objects.filter(condition, remaining__gte=count)
+            .update(remaining=F('remaining') - count)
+        )
+        if updated != rows:
+            raise InventoryExhausted('No rooms left for some night of the stay.')
+
+
+def release_rooms(stays):
+    """
+    Give back the rooms of cancelled ``stays``, never beyond capacity:
+    reservations saved without reserve_rooms() never took theirs.
+    """
+    for count, condition, _ in _by_count(rooms_needed(stays)):
+        HotelInventory.objects.filter(condition, remaining__lt=F('capacity')).update(
+            remaining=Least(F('remaining') + count, F('capacity')))
+
+
+def rebuild_inventory(apps=None, using=None):
+    """
+    Recompute ``remaining`` for every hotel-night from the reservations,
+    keeping the capacity of existing rows. Nights already booked beyond
+    capacity are left with no rooms and counted as overbooked.
+
+    ``apps`` is the app registry of a migration, when called from one.
+    """
+    reservation_model = apps.get_model('hotelapi', 'Reservation') if apps else Reservation
+    inventory_model = apps.get_model('hotelapi', 'HotelInventory') if apps else HotelInventory
+    using = using or router.db_for_write(inventory_model)
+
+    with transaction.atomic(using=using):
+        inventory = inventory_model.objects.using(using)
+        capacities = {
+            (hotel_id, night): capacity
+            for hotel_id, night, capacity in inventory.values_list('hotel_id', 'night', 'capacity').iterator()
+        }
+        stays = (
+            reservation_model.objects.using(using).filter(hotel__isnull=False)
+            .values_list('hotel_id', 'checkin', 'checkout')
+        )
+        needed = rooms_needed(stays.iterator(chunk_size=REBUILD_BATCH_SIZE))
+
+        default_capacity = get_default_capacity()
+        rows = []
+        overbooked = 0
+        for hotel_id, night in capacities.keys() | needed.keys():
+            capacity = capacities.get((hotel_id, night), default_capacity)
+            remaining = capacity - needed[hotel_id, night]
+            if remaining < 0:
+                overbooked += 1
+                remaining = 0
+            rows.append(inventory_model(hotel_id=hotel_id, night=night, capacity=capacity, remaining=remaining))
+        inventory.all().delete()
+        inventory.bulk_create(rows, batch_size=REBUILD_BATCH_SIZE)
+    return {'nights': len(rows), 'overbooked': overbooked}
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotelapi.archive import ARCHIVE_BATCH_SIZE, archive_reservations
+from hotelapi.dates import parse_date
+
+
+class Command(BaseCommand):
+    help = 'Move reservations that checked out before a date, with their guests, to the archive tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True, help='Archive stays with a checkout before this date (YYYY-MM-DD).')
+        parser.add_argument(
+            '--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+            help=f'Reservations moved per transaction (default {ARCHIVE_BATCH_SIZE}).',
+        )
+        parser.add_argument('--database', help='Database alias (default: where reservations are written).')
+
+    def handle(self, *args, **options):
+        try:
+            before = parse_date(options['before'])
+        except ValueError:
+            raise CommandError('--before must be a date (YYYY-MM-DD or MM/DD/YYYY).')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        started = time.perf_counter()
+        try:
+            result = archive_reservations(before, batch_size=options['batch_size'], using=options['database'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f"Archived {result['reservations']} reservations and {result['guest_links']} guest links "
+            f"in {result['batches']} batches in {time.perf_counter() - started:.1f}s."
+        )
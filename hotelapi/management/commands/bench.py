@@ -0,0 +1,347 @@
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import date, timedelta
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment,
+)
+from django.urls import URLPattern, get_resolver, reverse
+
+from hotelapi import datasets, fastjson, group_commit
+from hotelapi.models import Reservation
+
+METRICS_MIDDLEWARE = 'hotelapi.metrics.MetricsMiddleware'
+
+
+def _peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux.
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Scenarios:
+    """
+    Builds a request (method, path, JSON body) for each named URL, drawing
+    ids and dates from the seeded dataset so repeated runs are comparable.
+    """
+
+    def __init__(self, hotels, page_size):
+        self.hotels = hotels
+        self.page_size = page_size
+        self._confirmation_numbers = None
+
+    @property
+    def confirmation_numbers(self):
+        # Read on first use: POST scenarios add reservations as they run.
+        if self._confirmation_numbers is None:
+            self._confirmation_numbers = list(
+                Reservation.objects.order_by('id').values_list('confirmation_number', flat=True)[:1000]
+            )
+        return self._confirmation_numbers
+
+    def _reservation(self, rng):
+        hotel_id, _ = rng.choice(self.hotels)
+        checkin, checkout = datasets.make_stay(rng, today=date.today() + timedelta(days=400))
+        return {
+            'hotel_id': hotel_id,
+            'checkin': checkin.isoformat(),
+            'checkout': checkout.isoformat(),
+            'guests_list': datasets.make_guest_list(rng),
+        }
+
+    def hotelList(self, rng):
+        return 'GET', f"{reverse('hotelList')}?limit={self.page_size}", None
+
+    def hotelDetail(self, rng):
+        return 'GET', reverse('hotelDetail', args=[rng.choice(self.hotels)[0]]), None
+
+    def genericsList(self, rng):
+        return 'GET', f"{reverse('genericsList')}?limit={self.page_size}", None
+
+    def reservationConfirmation(self, rng):
+        return 'POST', reverse('reservationConfirmation'), self._reservation(rng)
+
+    def bulkReservationConfirmation(self, rng):
+        return 'POST', reverse('bulkReservationConfirmation'), [self._reservation(rng) for _ in range(20)]
+
+    def availableHotels(self, rng):
+        checkin, checkout = datasets.make_stay(rng)
+        return 'GET', f"{reverse('availableHotels')}?checkin={checkin}&checkout={checkout}", None
+
+    def reservationList(self, rng):
+        return 'GET', f"{reverse('reservationList')}?limit={self.page_size}", None
+
+    def reservationDetail(self, rng):
+        # A made-up number measures the 404 path on an empty dataset.
+        confirmation_number = rng.choice(self.confirmation_numbers or [str(uuid.UUID(int=rng.getrandbits(128)))])
+        return 'GET', reverse('reservationDetail', args=[confirmation_number]), None
+
+    def search(self, rng):
+        words = rng.choice([datasets.FIRST_NAMES, datasets.LAST_NAMES, datasets.HOTEL_PLACES])
+        return 'GET', f"{reverse('search')}?q={rng.choice(words)[:rng.randint(2, 5)]}", None
+
+    def build(self, name, rng):
+        method = getattr(self, name, None)
+        if method is not None:
+            return method(rng)
+        # Endpoints without a dedicated scenario: plain GET.
+        return 'GET', reverse(name), None
+
+
+@contextmanager
+def bench_databases(existing_db=False):
+    """
+    Run the block against throwaway SQLite files, created and migrated on
+    entry and deleted on exit, or against the configured databases with
+    ``existing_db``.
+    """
+    old_config = None
+    tmpdir = None
+    try:
+        # Lets the test client through ALLOWED_HOSTS; already done when
+        # the command runs inside the test suite.
+        setup_test_environment()
+        own_environment = True
+    except RuntimeError:
+        own_environment = False
+    try:
+        if not existing_db:
+            # A file, not :memory:, so concurrent clients contend on the
+            # database the way real workers would.
+            tmpdir = tempfile.TemporaryDirectory(prefix='hotelapi-bench-')
+            for alias in connections:
+                test_settings = settings.DATABASES[alias].setdefault('TEST', {})
+                if settings.DATABASES[alias]['ENGINE'].endswith('sqlite3') and not test_settings.get('MIRROR'):
+                    test_settings['NAME'] = os.path.join(tmpdir.name, f'{alias}.sqlite3')
+            old_config = setup_databases(verbosity=0, interactive=False)
+        yield
+    finally:
+        # The writer thread holds a connection to the throwaway database.
+        group_commit.reset_writer()
+        if old_config is not None:
+            teardown_databases(old_config, verbosity=0)
+        if tmpdir is not None:
+            tmpdir.cleanup()
+        if own_environment:
+            teardown_test_environment()
+
+
+def api_url_names():
+    """Names of the URLs in ROOT_URLCONF, excluding included apps such as admin."""
+    names = []
+    for pattern in get_resolver().url_patterns:
+        if isinstance(pattern, URLPattern) and pattern.name:
+            names.append(pattern.name)
+    return names
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic dataset into a throwaway database and measure every '
+        'API endpoint in-process: latency percentiles, requests/sec, query '
+        'counts and peak RSS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hotels', type=int, default=10000, help='Hotels to seed (default 10000).')
+        parser.add_argument('--reservations', type=int, default=20000, help='Reservations to seed (default 20000).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the dataset and requests.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint (default 200).')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent client threads (default 4).')
+        parser.add_argument('--page-size', type=int, default=100, help='limit= used for the list endpoints.')
+        parser.add_argument('--endpoints', nargs='+', metavar='URL_NAME', help='Only run these URL names.')
+        parser.add_argument('--no-cache', action='store_true', help='Disable the response cache.')
+        parser.add_argument(
+            '--no-metrics', action='store_true',
+            help='Remove the metrics middleware, to measure its overhead.',
+        )
+        parser.add_argument(
+            '--admission', action='store_true',
+            help='Keep admission control on; by default it is off so every request is served.',
+        )
+        parser.add_argument(
+            '--commit-mode', choices=group_commit.COMMIT_MODES,
+            help='RESERVATION_COMMIT_MODE to run with (default: the configured one).',
+        )
+        parser.add_argument(
+            '--json-backend', choices=['auto', *fastjson.BACKENDS],
+            help='JSON_BACKEND to run with (default: the configured one).',
+        )
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+        parser.add_argument(
+            '--existing-db', action='store_true',
+            help='Seed into the configured database instead of creating a throwaway one.',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be at least 1.')
+
+        names = api_url_names()
+        if options['endpoints']:
+            unknown = set(options['endpoints']) - set(names)
+            if unknown:
+                raise CommandError(f"Unknown URL names: {', '.join(sorted(unknown))}")
+            names = [name for name in names if name in options['endpoints']]
+
+        overrides = {}
+        if options['no_cache']:
+            overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        if options['no_metrics']:
+            overrides['MIDDLEWARE'] = [name for name in settings.MIDDLEWARE if name != METRICS_MIDDLEWARE]
+        if not options['admission']:
+            overrides['ADMISSION_CONTROL'] = False
+        if options['commit_mode']:
+            overrides['RESERVATION_COMMIT_MODE'] = options['commit_mode']
+        if options['json_backend']:
+            overrides['JSON_BACKEND'] = options['json_backend']
+        with bench_databases(options['existing_db']), override_settings(**overrides):
+            report = self.run(names, options)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+    def run(self, names, options):
+        started = time.perf_counter()
+        hotels = datasets.seed(options['hotels'], options['reservations'], seed=options['seed'])
+        seed_seconds = time.perf_counter() - started
+        self.stdout.write(
+            f"Seeded {options['hotels']} hotels and {options['reservations']} reservations in {seed_seconds:.1f}s"
+        )
+        if not hotels:
+            raise CommandError('--hotels must be at least 1.')
+
+        scenarios = Scenarios(hotels, options['page_size'])
+        report = {
+            'meta': {
+                'django': django.get_version(),
+                'python': sys.version.split()[0],
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'hotels': options['hotels'],
+                'reservations': options['reservations'],
+                'seed': options['seed'],
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'page_size': options['page_size'],
+                'response_cache': not options['no_cache'],
+                'metrics_middleware': METRICS_MIDDLEWARE in settings.MIDDLEWARE,
+                'admission_control': settings.ADMISSION_CONTROL,
+                'commit_mode': group_commit.get_commit_mode(),
+                'json_backend': fastjson.get_backend().name,
+                'seed_seconds': round(seed_seconds, 3),
+            },
+            'endpoints': {},
+        }
+
+        header = f"{'endpoint':<30}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'errors':>8}"
+        self.stdout.write(header)
+        for name in names:
+            result = self.bench_endpoint(name, scenarios, options)
+            report['endpoints'][name] = result
+            latency = result['latency_ms']
+            self.stdout.write(
+                f"{name:<30}{result['requests_per_second']:>10.1f}{latency['p50']:>10.2f}"
+                f"{latency['p95']:>10.2f}{latency['p99']:>10.2f}{result['queries']['mean']:>9.1f}"
+                f"{result['errors']:>8}"
+            )
+        if group_commit.get_commit_mode() != 'direct':
+            writer = group_commit.get_writer()
+            writer.close()
+            report['group_commit'] = writer.stats()
+            self.stdout.write(
+                "Group commit: {reservations} reservations in {transactions} transactions".format(**writer.stats())
+            )
+        report['meta']['peak_rss_kb'] = _peak_rss_kb()
+        return report
+
+    def bench_endpoint(self, name, scenarios, options):
+        rng = random.Random(f"{options['seed']}-{name}")
+        plan = [scenarios.build(name, rng) for _ in range(options['requests'])]
+        local = threading.local()
+
+        def send(request):
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client(raise_request_exception=False)
+            method, path, body = request
+            queries = []
+
+            def count_query(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with ExitStack() as stack:
+                # Reads may be routed to the replica alias.
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(count_query))
+                start = time.perf_counter()
+                if method == 'POST':
+                    response = client.post(path, data=json.dumps(body), content_type='application/json')
+                else:
+                    response = client.get(path)
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+                elapsed = time.perf_counter() - start
+            return elapsed, len(queries), response.status_code
+
+        started = time.perf_counter()
+        if options['concurrency'] == 1:
+            results = [send(request) for request in plan]
+        else:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                results = list(pool.map(send, plan))
+        wall = time.perf_counter() - started
+
+        latencies = sorted(elapsed * 1000 for elapsed, _, _ in results)
+        query_counts = [count for _, count, _ in results]
+        status_counts = {}
+        for _, _, status_code in results:
+            status_counts[str(status_code)] = status_counts.get(str(status_code), 0) + 1
+        errors = sum(count for code, count in status_counts.items() if int(code) >= 500)
+
+        method, path, _ = plan[0]
+        return {
+            'method': method,
+            'sample_path': path,
+            'requests': len(results),
+            'errors': errors,
+            'status_counts': status_counts,
+            'requests_per_second': round(len(results) / wall, 2) if wall else None,
+            'latency_ms': {
+                'mean': round(sum(latencies) / len(latencies), 3),
+                'p50': round(percentile(latencies, 0.50), 3),
+                'p95': round(percentile(latencies, 0.95), 3),
+                'p99': round(percentile(latencies, 0.99), 3),
+                'max': round(latencies[-1], 3),
+            },
+            'queries': {
+                'mean': round(sum(query_counts) / len(query_counts), 2),
+                'max': max(query_counts),
+            },
+            'peak_rss_kb': _peak_rss_kb(),
+        }
@@ -0,0 +1,143 @@
+import json
+import random
+import sys
+import timeit
+import uuid
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotelapi import datasets, fastjson
+from hotelapi.dates import parse_date
+from hotelapi.serializers import HotelSerializer
+
+
+def strptime_date(value):
+    """How dates were parsed before dates.py, as the baseline."""
+    return datetime.strptime(value, '%m/%d/%Y' if '/' in value else '%Y-%m-%d').date()
+
+
+def booking(rng, today):
+    checkin, checkout = datasets.make_stay(rng, today)
+    return {
+        'hotel_id': rng.randint(1, 10000),
+        'checkin': checkin.isoformat(),
+        'checkout': checkout.isoformat(),
+        'guests_list': datasets.make_guest_list(rng),
+    }
+
+
+def reservation(rng, today):
+    """Shaped like views.reservation_to_dict()."""
+    checkin, checkout = datasets.make_stay(rng, today)
+    hotel_id = rng.randint(1, 10000)
+    return {
+        'confirmation_number': str(uuid.UUID(int=rng.getrandbits(128))),
+        'hotel_id': hotel_id,
+        'hotel_name': datasets.hotel_name(rng, hotel_id),
+        'checkin': checkin.isoformat(),
+        'checkout': checkout.isoformat(),
+        'guests': datasets.make_guest_list(rng),
+    }
+
+
+def payloads(rng, page_size):
+    today = datetime(2026, 1, 1).date()
+    return {
+        'booking': booking(rng, today),
+        'bulk_booking': [booking(rng, today) for _ in range(1000)],
+        'hotel_page': {
+            'next': 'eyJvIjpbImlkIl0sImsiOlsxMDBdfQ',
+            'results': HotelSerializer(datasets.make_hotels(page_size, rng, today=today), many=True).data,
+        },
+        'reservation_page': {
+            'next': 'eyJvIjpbImlkIl0sImsiOlsxMDBdfQ',
+            'results': [reservation(rng, today) for _ in range(page_size)],
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Time JSON encoding and decoding of typical request and response bodies '
+        'with each installed JSON backend, and the parsing of request dates.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100, help='Rows per list page payload (default 100).')
+        parser.add_argument(
+            '--repeat', type=int, default=3, help='Timing runs per measurement; the best is kept (default 3).',
+        )
+        parser.add_argument(
+            '--min-time', type=float, default=0.2,
+            help='Seconds each timing run lasts at least (default 0.2).',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the payloads.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        if options['page_size'] < 1 or options['repeat'] < 1:
+            raise CommandError('--page-size and --repeat must be at least 1.')
+        self.repeat = options['repeat']
+        self.min_time = options['min_time']
+
+        rng = random.Random(options['seed'])
+        report = {
+            'meta': {
+                'python': sys.version.split()[0],
+                'backends': list(fastjson.BACKENDS),
+                'page_size': options['page_size'],
+            },
+            'json': [],
+            'dates': [],
+        }
+
+        self.stdout.write(f"{'payload':<20}{'backend':<10}{'bytes':>9}{'dumps/s':>12}{'loads/s':>12}{'dumps MB/s':>12}")
+        for name, payload in payloads(rng, options['page_size']).items():
+            for backend in fastjson.BACKENDS.values():
+                encoded = backend.dumps(payload)
+                result = {
+                    'payload': name,
+                    'backend': backend.name,
+                    'bytes': len(encoded),
+                    'dumps_per_second': self.rate(lambda: backend.dumps(payload)),
+                    'loads_per_second': self.rate(lambda: backend.loads(encoded)),
+                }
+                report['json'].append(result)
+                self.stdout.write(
+                    f"{name:<20}{backend.name:<10}{len(encoded):>9}{result['dumps_per_second']:>12.0f}"
+                    f"{result['loads_per_second']:>12.0f}{result['dumps_per_second'] * len(encoded) / 1e6:>12.1f}"
+                )
+
+        # The checkin and checkout of a bulk booking: mostly repeats.
+        today = datetime(2026, 1, 1).date()
+        values = []
+        for _ in range(1000):
+            checkin, checkout = datasets.make_stay(rng, today)
+            # Some clients still send MM/DD/YYYY.
+            us_format = rng.random() < 0.2
+            values += [checkin.isoformat(), checkout.strftime('%m/%d/%Y') if us_format else checkout.isoformat()]
+        parsers = {
+            'strptime': strptime_date,
+            'parse_date (no cache)': parse_date.__wrapped__,
+            'parse_date': parse_date,
+        }
+        self.stdout.write('')
+        self.stdout.write(f"{'date parser':<24}{'dates/s':>12}")
+        for name, parse in parsers.items():
+            rate = self.rate(lambda: [parse(value) for value in values]) * len(values)
+            report['dates'].append({'parser': name, 'dates_per_second': round(rate)})
+            self.stdout.write(f'{name:<24}{rate:>12.0f}')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+    def rate(self, func):
+        """Best calls per second of ``func`` over ``--repeat`` runs of at least ``--min-time``."""
+        timer = timeit.Timer(func)
+        number = 1
+        while timer.timeit(number) < self.min_time:
+            number *= 2
+        return round(number / max(min(timer.repeat(repeat=self.repeat, number=number)), 1e-9), 1)
@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotelapi.importers import IMPORT_BATCH_SIZE, IMPORT_FORMATS, READERS, import_hotels
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream hotels from a CSV or JSON Lines file (or stdin) and upsert them '
+        'by id. Invalid rows are reported and skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin.")
+        parser.add_argument(
+            '--format', choices=IMPORT_FORMATS,
+            help='Input format (default: from the file extension; required for stdin).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help=f'Hotels per transaction (default {IMPORT_BATCH_SIZE}).',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing.')
+
+    def get_format(self, path, input_format):
+        if input_format:
+            return input_format
+        extension = os.path.splitext(path)[1].lstrip('.').lower()
+        if extension == 'ndjson':
+            extension = 'jsonl'
+        if extension not in IMPORT_FORMATS:
+            raise CommandError('Cannot tell the input format; pass --format csv or --format jsonl.')
+        return extension
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        path = options['path']
+        read = READERS[self.get_format(path, options['format'])]
+
+        def on_error(line_number, errors):
+            self.stderr.write(f'line {line_number}: {json.dumps(errors)}')
+
+        started = time.perf_counter()
+        if path == '-':
+            counts = import_hotels(read(sys.stdin), options['batch_size'], options['dry_run'], on_error)
+        else:
+            try:
+                stream = open(path, newline='', encoding='utf-8')
+            except OSError as e:
+                raise CommandError(f'Cannot open {path}: {e}')
+            with stream:
+                counts = import_hotels(read(stream), options['batch_size'], options['dry_run'], on_error)
+        elapsed = time.perf_counter() - started
+
+        rate = counts['rows'] / elapsed if elapsed else 0
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(
+            f"{verb} {counts['imported']} hotels from {counts['rows']} rows in {elapsed:.1f}s "
+            f"({rate:.0f} rows/sec); {counts['failed']} failed, {counts['duplicates']} duplicate ids."
+        )
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hotelapi.inventory import rebuild_inventory
+
+
+class Command(BaseCommand):
+    help = 'Recount the rooms left per hotel and night from the reservations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', help='Database alias (default: where inventory is written).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = rebuild_inventory(using=options['database'])
+        self.stdout.write(
+            f"Rebuilt inventory for {result['nights']} hotel-nights in {time.perf_counter() - started:.1f}s; "
+            f"{result['overbooked']} overbooked."
+        )
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotelapi.rollups import REBUILD_BATCH_SIZE, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the occupancy and catalogue rollups behind /stats/ from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', help='Database alias (default: where rollups are written).')
+        parser.add_argument(
+            '--batch-size', type=int, default=REBUILD_BATCH_SIZE,
+            help=f'Reservations read, and rows written, per query (default {REBUILD_BATCH_SIZE}).',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        started = time.perf_counter()
+        result = rebuild_rollups(using=options['database'], batch_size=options['batch_size'])
+        self.stdout.write(
+            f"Rebuilt rollups for {result['nights']} hotel-nights and {result['buckets']} catalogue buckets "
+            f"in {time.perf_counter() - started:.1f}s."
+        )
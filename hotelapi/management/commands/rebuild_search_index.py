@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hotelapi.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hotel and guest full-text search indexes from their tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', help='Database alias (default: where hotels are written).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        tables = rebuild_search_index(options['database'])
+        if not tables:
+            self.stdout.write('Full-text search needs SQLite; nothing to rebuild.')
+            return
+        self.stdout.write(f"Rebuilt {', '.join(tables)} in {time.perf_counter() - started:.1f}s")
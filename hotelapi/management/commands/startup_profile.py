@@ -0,0 +1,206 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+# What a worker does before it can serve its first request: set Django up,
+# load the middleware and import the URLconf, with it the views. Prints the
+# seconds it took.
+STARTUP_SCRIPT = '''
+import time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+print(time.perf_counter() - start)
+'''
+
+PROBE = 'hotelapi.management.commands.startup_profile.Probe'
+
+
+class Probe:
+    """
+    Put above and below every middleware by ``profile_middleware``. Each
+    probe adds up the time spent in the layers beneath it, so a
+    middleware's own time is the difference between the probes around it.
+    """
+    loaded = []
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.seconds = 0.0
+        Probe.loaded.append(self)
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+def parse_importtime(output):
+    """(module, self µs, cumulative µs, depth) per line of ``python -X importtime`` output."""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nested imports are indented by two spaces per level.
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        'Profile worker startup, with the import time of every module, and the '
+        'time each middleware adds to a request, for the current settings '
+        '(SETTINGS_PROFILE=api for the API-only profile).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help='Slowest modules and packages to list (default 20).')
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Cold starts, and runs of --requests requests, to take the best of (default 3).',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=2000, help='Requests per middleware timing run (default 2000).',
+        )
+        parser.add_argument(
+            '--url', default='/cache_stats/',
+            help='Path requested to time the middleware; best without queries (default /cache_stats/).',
+        )
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        if options['top'] < 1 or options['repeat'] < 1 or options['requests'] < 1:
+            raise CommandError('--top, --repeat and --requests must be at least 1.')
+
+        report = {
+            'meta': {
+                'django': django.get_version(),
+                'python': sys.version.split()[0],
+                'settings_profile': settings.SETTINGS_PROFILE,
+                'admin_enabled': settings.ADMIN_ENABLED,
+                'installed_apps': list(settings.INSTALLED_APPS),
+                'url': options['url'],
+                'requests': options['requests'],
+            },
+            'startup': self.profile_startup(options),
+            'middleware': self.profile_middleware(options),
+        }
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+    def run_startup(self, *python_options):
+        # Fresh interpreters, with the settings of this one.
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        result = subprocess.run(
+            [sys.executable, *python_options, '-c', STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f'Startup failed:\n{result.stderr}')
+        return result
+
+    def profile_startup(self, options):
+        seconds = min(float(self.run_startup().stdout) for _ in range(options['repeat']))
+        modules = parse_importtime(self.run_startup('-X', 'importtime').stderr)
+
+        packages = {}
+        for name, self_us, _, _ in modules:
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0) + self_us
+        startup = {
+            'seconds': round(seconds, 4),
+            'import_seconds': round(sum(cumulative for _, _, cumulative, depth in modules if depth == 0) / 1e6, 4),
+            'modules': len(modules),
+            'packages': [
+                {'package': package, 'self_ms': round(self_us / 1000, 2)}
+                for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]
+            ],
+            'slowest_modules': [
+                {'module': name, 'self_ms': round(self_us / 1000, 2), 'cumulative_ms': round(cumulative / 1000, 2)}
+                for name, self_us, cumulative, _ in sorted(modules, key=lambda module: -module[1])[:options['top']]
+            ],
+        }
+
+        self.stdout.write(
+            f"Startup: {startup['seconds'] * 1000:.0f} ms. Under -X importtime, importing {startup['modules']} "
+            f"modules took {startup['import_seconds'] * 1000:.0f} ms"
+        )
+        self.stdout.write(f"{'package':<40}{'self ms':>10}")
+        for package in startup['packages']:
+            self.stdout.write(f"{package['package']:<40}{package['self_ms']:>10.2f}")
+        self.stdout.write('')
+        self.stdout.write(f"{'module':<50}{'self ms':>10}{'cumul. ms':>10}")
+        for module in startup['slowest_modules']:
+            self.stdout.write(f"{module['module']:<50}{module['self_ms']:>10.2f}{module['cumulative_ms']:>10.2f}")
+        self.stdout.write('')
+        return startup
+
+    def profile_middleware(self, options):
+        stack = list(settings.MIDDLEWARE)
+        probed = [PROBE]
+        for name in stack:
+            probed += [name, PROBE]
+        try:
+            # Lets the test client's host through ALLOWED_HOSTS.
+            setup_test_environment()
+            own_environment = True
+        except RuntimeError:
+            own_environment = False
+        try:
+            with override_settings(MIDDLEWARE=probed):
+                Probe.loaded = []
+                client = Client(raise_request_exception=False)
+                # The first request loads the middleware.
+                response = client.get(options['url'])
+                if response.status_code >= 400:
+                    raise CommandError(f"{options['url']} answered {response.status_code}; time another --url.")
+                # Loaded from the innermost out.
+                probes = Probe.loaded[::-1]
+                best = None
+                for _ in range(options['repeat']):
+                    for probe in probes:
+                        probe.seconds = 0.0
+                    for _ in range(options['requests']):
+                        client.get(options['url'])
+                    # Time in each middleware and, last, below them all.
+                    spent = [outer.seconds - inner.seconds for outer, inner in zip(probes, probes[1:])]
+                    spent.append(probes[-1].seconds)
+                    best = spent if best is None else [min(pair) for pair in zip(best, spent)]
+        finally:
+            if own_environment:
+                teardown_test_environment()
+
+        per_request = [seconds / options['requests'] * 1e6 for seconds in best]
+        result = {
+            'view_us_per_request': round(per_request[-1], 1),
+            'total_us_per_request': round(sum(per_request[:-1]), 1),
+            'per_middleware': [
+                {'middleware': name, 'us_per_request': round(us, 1)} for name, us in zip(stack, per_request)
+            ],
+        }
+
+        self.stdout.write(f"{'middleware':<60}{'µs/request':>12}")
+        for entry in result['per_middleware']:
+            self.stdout.write(f"{entry['middleware']:<60}{entry['us_per_request']:>12.1f}")
+        self.stdout.write(
+            f"Middleware add {result['total_us_per_request']:.1f} µs to the {result['view_us_per_request']:.1f} µs "
+            f"spent resolving and running the view of {options['url']}"
+        )
+        return result
@@ -0,0 +1,163 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from hotelapi import datasets, group_commit
+from hotelapi.inventory import rooms_needed
+from hotelapi.models import HotelInventory, Reservation
+
+from .bench import bench_databases, percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Book a few hotels from many threads at once and check that no night '
+        'was sold beyond its capacity, reporting throughput at each level of '
+        'writer concurrency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hotels', type=int, default=3, help='Hotels competing for bookings (default 3).')
+        parser.add_argument('--capacity', type=int, default=5, help='Rooms per hotel per night (default 5).')
+        parser.add_argument('--nights', type=int, default=10, help='Nights the bookings fall in (default 10).')
+        parser.add_argument(
+            '--requests', type=int, default=300, help='Booking requests per concurrency level (default 300).',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+            help='Concurrent writer threads to run with, one level after another (default 1 2 4 8 16).',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the requests.')
+        parser.add_argument(
+            '--commit-mode', choices=group_commit.COMMIT_MODES,
+            help='RESERVATION_COMMIT_MODE to run with (default: the configured one).',
+        )
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+        parser.add_argument(
+            '--existing-db', action='store_true',
+            help='Book into the configured database instead of a throwaway one.',
+        )
+
+    def handle(self, *args, **options):
+        if min(options['hotels'], options['capacity'], options['nights'], options['requests'],
+               *options['concurrency']) < 1:
+            raise CommandError('Every count must be at least 1.')
+
+        overrides = {'INVENTORY_DEFAULT_CAPACITY': options['capacity']}
+        if options['commit_mode']:
+            overrides['RESERVATION_COMMIT_MODE'] = options['commit_mode']
+        with bench_databases(options['existing_db']), override_settings(**overrides):
+            report = self.run(options)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+        if any(level['overbooked_nights'] or level['inventory_mismatches'] for level in report['levels']):
+            raise CommandError('Inventory check failed.')
+
+    def run(self, options):
+        hotels = datasets.seed(options['hotels'], 0, seed=options['seed'])
+        report = {
+            'meta': {
+                'hotels': options['hotels'],
+                'capacity': options['capacity'],
+                'nights': options['nights'],
+                'requests': options['requests'],
+                'commit_mode': group_commit.get_commit_mode(),
+            },
+            'levels': [],
+        }
+        self.stdout.write(
+            f"{'threads':>8}{'req/s':>10}{'booked':>8}{'rejected':>10}{'errors':>8}"
+            f"{'p50 ms':>10}{'p99 ms':>10}{'overbooked':>12}"
+        )
+        # Each level books its own range of dates, well clear of the others.
+        first_night = date.today() + timedelta(days=400)
+        for concurrency in options['concurrency']:
+            result = self.run_level(hotels, first_night, concurrency, options)
+            report['levels'].append(result)
+            self.stdout.write(
+                f"{concurrency:>8}{result['requests_per_second']:>10.1f}{result['booked']:>8}"
+                f"{result['rejected']:>10}{result['errors']:>8}{result['latency_ms']['p50']:>10.2f}"
+                f"{result['latency_ms']['p99']:>10.2f}{result['overbooked_nights']:>12}"
+            )
+            first_night += timedelta(days=options['nights'] + 30)
+        return report
+
+    def run_level(self, hotels, first_night, concurrency, options):
+        rng = random.Random(f"{options['seed']}-{concurrency}")
+        url = reverse('reservationConfirmation')
+        plan = []
+        for _ in range(options['requests']):
+            checkin = first_night + timedelta(days=rng.randrange(options['nights']))
+            stay = min(rng.randint(1, 3), (first_night + timedelta(days=options['nights']) - checkin).days)
+            plan.append({
+                'hotel_id': rng.choice(hotels)[0],
+                'checkin': checkin.isoformat(),
+                'checkout': (checkin + timedelta(days=stay)).isoformat(),
+                'guests_list': datasets.make_guest_list(rng),
+            })
+        local = threading.local()
+
+        def book(body):
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client(raise_request_exception=False)
+            start = time.perf_counter()
+            response = client.post(url, data=json.dumps(body), content_type='application/json')
+            return time.perf_counter() - start, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(book, plan))
+        wall = time.perf_counter() - started
+        # Commit whatever group-async mode still has queued before counting.
+        group_commit.reset_writer()
+
+        latencies = sorted(elapsed * 1000 for elapsed, _ in results)
+        codes = [code for _, code in results]
+        overbooked, mismatches = self.check_inventory(first_night, first_night + timedelta(days=options['nights']))
+        return {
+            'concurrency': concurrency,
+            'requests': len(results),
+            'booked': sum(code in (201, 202) for code in codes),
+            'rejected': codes.count(409),
+            'errors': sum(code not in (201, 202, 409) for code in codes),
+            'requests_per_second': round(len(results) / wall, 2),
+            'latency_ms': {
+                'p50': round(percentile(latencies, 0.50), 3),
+                'p99': round(percentile(latencies, 0.99), 3),
+            },
+            'overbooked_nights': overbooked,
+            'inventory_mismatches': mismatches,
+        }
+
+    def check_inventory(self, start, end):
+        """
+        Count the nights in [start, end) booked beyond capacity, and the
+        inventory rows whose remaining rooms don't match the reservations.
+        """
+        stays = Reservation.objects.filter(checkin__lt=end, checkout__gt=start).values_list(
+            'hotel_id', 'checkin', 'checkout')
+        needed = rooms_needed(stays)
+        rows = HotelInventory.objects.filter(night__gte=start, night__lt=end).values_list(
+            'hotel_id', 'night', 'capacity', 'remaining')
+        inventory = {(hotel_id, night): (capacity, remaining) for hotel_id, night, capacity, remaining in rows}
+
+        overbooked = 0
+        mismatches = 0
+        for key in needed.keys() | inventory.keys():
+            if start <= key[1] < end:
+                capacity, remaining = inventory.get(key, (0, 0))
+                overbooked += needed[key] > capacity
+                mismatches += remaining != capacity - needed[key]
+        return overbooked, mismatches
@@ -0,0 +1,237 @@
+"""
+Per-request timing and query instrumentation.
+
+MetricsMiddleware measures every request and files the numbers under the
+resolved URL name (``hotelList``, ``availableHotels``, ...):
+
+- wall time of the whole request,
+- time spent in the database and the number of queries, counted by an
+  execute wrapper installed on every connection (see signals.py),
+- time spent serializing (FastReadSerializer rows and DRF rendering),
+- response size, for non-streaming responses.
+
+The numbers are sent back in a ``Server-Timing`` header and added to
+in-process histograms, which ``/metrics`` exposes in the Prometheus text
+format. Histograms are per process, like Prometheus client libraries
+without a multiprocess collector: scrape each worker.
+
+Recording a request costs a few bisects and additions under one lock, so
+the middleware is meant to stay on in production. ``manage.py bench
+--no-metrics`` measures the difference.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+METRIC_PREFIX = 'hotelapi'
+UNMATCHED_VIEW = 'unmatched'
+
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_current = ContextVar('hotelapi_request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('db_time', 'queries', 'serialize_time')
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = 0
+        self.serialize_time = 0.0
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram keyed by view name. Not thread safe on its
+    own; the Registry holds the lock.
+    """
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, view, value):
+        series = self.series.get(view)
+        if series is None:
+            # One count per bucket plus +Inf, then the sum.
+            series = self.series[view] = [0] * (len(self.buckets) + 1) + [0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for view in sorted(self.series):
+            series = self.series[view]
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{view="{view}",le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{view="{view}"}} {series[-1]}')
+            lines.append(f'{self.name}_count{{view="{view}"}} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.duration = Histogram(
+                f'{METRIC_PREFIX}_request_duration_seconds', 'Wall time of the request.', DURATION_BUCKETS)
+            self.db_duration = Histogram(
+                f'{METRIC_PREFIX}_db_duration_seconds', 'Time spent executing queries.', DURATION_BUCKETS)
+            self.serialize_duration = Histogram(
+                f'{METRIC_PREFIX}_serialize_duration_seconds', 'Time spent serializing the response.',
+                DURATION_BUCKETS)
+            self.queries = Histogram(
+                f'{METRIC_PREFIX}_db_queries', 'Queries executed per request.', QUERY_BUCKETS)
+            self.response_size = Histogram(
+                f'{METRIC_PREFIX}_response_size_bytes', 'Size of non-streaming response bodies.', SIZE_BUCKETS)
+            self.responses = {}
+            self.admission = {}
+
+    def record(self, view, status_code, duration, request_metrics, size):
+        status_key = (view, status_code)
+        with self.lock:
+            self.duration.observe(view, duration)
+            self.db_duration.observe(view, request_metrics.db_time)
+            self.serialize_duration.observe(view, request_metrics.serialize_time)
+            self.queries.observe(view, request_metrics.queries)
+            if size is not None:
+                self.response_size.observe(view, size)
+            self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def record_admission(self, view, outcome):
+        """Count a request admitted or shed by admission.py."""
+        key = (view, outcome)
+        with self.lock:
+            self.admission[key] = self.admission.get(key, 0) + 1
+
+    def render(self):
+        name = f'{METRIC_PREFIX}_responses_total'
+        admission_name = f'{METRIC_PREFIX}_admission_total'
+        with self.lock:
+            lines = [f'# HELP {name} Responses by view and status code.', f'# TYPE {name} counter']
+            for (view, status_code), count in sorted(self.responses.items()):
+                lines.append(f'{name}{{view="{view}",status="{status_code}"}} {count}')
+            lines += [f'# HELP {admission_name} Requests admitted or shed by admission control.',
+                      f'# TYPE {admission_name} counter']
+            for (view, outcome), count in sorted(self.admission.items()):
+                lines.append(f'{admission_name}{{view="{view}",outcome="{outcome}"}} {count}')
+            for histogram in (self.duration, self.db_duration, self.serialize_duration,
+                              self.queries, self.response_size):
+                lines += histogram.render()
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """Execute wrapper that charges query time to the current request."""
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.db_time += time.perf_counter() - start
+        request_metrics.queries += 1
+
+
+def install_db_wrapper(connection):
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
+
+
+@contextmanager
+def serialization():
+    """Charge the time spent in the block to the current request's serialization."""
+    request_metrics = _current.get()
+    if request_metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        request_metrics.serialize_time += time.perf_counter() - start
+
+
+def server_timing(duration, request_metrics):
+    return (
+        f'total;dur={duration * 1000:.2f}, '
+        f'db;dur={request_metrics.db_time * 1000:.2f};desc="{request_metrics.queries} queries", '
+        f'serialize;dur={request_metrics.serialize_time * 1000:.2f}'
+    )
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'SERVER_TIMING_HEADER', True)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics = RequestMetrics()
+        token = _current.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, time.perf_counter() - start, request_metrics)
+
+    async def __acall__(self, request):
+        request_metrics = RequestMetrics()
+        token = _current.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, time.perf_counter() - start, request_metrics)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns.
+        request_metrics = _current.get()
+        if request_metrics is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                request_metrics.serialize_time += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, duration, request_metrics):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match is not None and match.url_name else UNMATCHED_VIEW
+        size = None if response.streaming else len(response.content)
+        registry.record(view, response.status_code, duration, request_metrics, size)
+        if self.server_timing:
+            response['Server-Timing'] = server_timing(duration, request_metrics)
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotelapi', '0003_guest_reservation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['hotel_name', 'checkin', 'checkout'], name='reservation_hotel_stay_idx'),
+        ),
+    ]
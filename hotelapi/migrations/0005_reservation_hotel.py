@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 09:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotelapi', '0004_reservation_hotel_stay_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='reservation',
+            name='reservation_hotel_stay_idx',
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='hotel',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='reservations', to='hotelapi.hotel'),
+        ),
+        migrations.AlterField(
+            model_name='hotel',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['hotel', 'checkin', 'checkout'], name='reservation_hotel_stay_idx'),
+        ),
+    ]
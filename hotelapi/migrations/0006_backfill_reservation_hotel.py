@@ -0,0 +1,56 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 2000
+
+
+def backfill_reservation_hotel(apps, schema_editor):
+    """
+    Point existing reservations at the hotel whose name matches hotel_name.
+
+    Runs in short transactions of BATCH_SIZE reservations so the table is
+    never locked for long. Names matching no hotel are left unlinked; when
+    several hotels share a name the lowest id wins.
+    """
+    Hotel = apps.get_model('hotelapi', 'Hotel')
+    Reservation = apps.get_model('hotelapi', 'Reservation')
+    db_alias = schema_editor.connection.alias
+
+    hotel_ids = {}
+    for hotel_id, name in Hotel.objects.using(db_alias).order_by('-id').values_list('id', 'name').iterator():
+        hotel_ids[name] = hotel_id
+
+    last_pk = 0
+    while True:
+        with transaction.atomic(using=db_alias):
+            batch = list(
+                Reservation.objects.using(db_alias)
+                .filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', 'hotel_name')[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+
+            pks_by_hotel = {}
+            for pk, hotel_name in batch:
+                hotel_id = hotel_ids.get(hotel_name)
+                if hotel_id is not None:
+                    pks_by_hotel.setdefault(hotel_id, []).append(pk)
+            for hotel_id, pks in pks_by_hotel.items():
+                Reservation.objects.using(db_alias).filter(pk__in=pks).update(hotel_id=hotel_id)
+            last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits on its own instead of the whole backfill holding
+    # the write lock for the duration of the migration.
+    atomic = False
+
+    dependencies = [
+        ('hotelapi', '0005_reservation_hotel'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_reservation_hotel, migrations.RunPython.noop),
+    ]
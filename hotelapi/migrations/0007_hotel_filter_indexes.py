@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotelapi', '0006_backfill_reservation_hotel'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hotel',
+            index=models.Index(fields=['available', 'available_until'], name='hotel_available_until_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotel',
+            index=models.Index(fields=['available_until'], name='hotel_until_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotel',
+            index=models.Index(fields=['price'], name='hotel_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotel',
+            index=models.Index(fields=['rating'], name='hotel_rating_idx'),
+        ),
+    ]
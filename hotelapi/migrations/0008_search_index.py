@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from hotelapi.search import install_search_index
+    install_search_index(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from hotelapi.search import uninstall_search_index
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """
+    FTS5 tables and triggers for hotelapi.search; a no-op on databases other
+    than SQLite.
+    """
+
+    dependencies = [
+        ('hotelapi', '0007_hotel_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotelapi', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(fields=['guest_name'], name='guest_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['checkin', 'checkout'], name='reservation_stay_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['checkout'], name='reservation_checkout_idx'),
+        ),
+    ]
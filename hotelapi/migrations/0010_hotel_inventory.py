@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 09:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def rebuild(apps, schema_editor):
+    from hotelapi.inventory import rebuild_inventory
+    rebuild_inventory(apps, using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotelapi', '0009_reservation_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotelInventory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('night', models.DateField()),
+                ('capacity', models.PositiveIntegerField()),
+                ('remaining', models.IntegerField()),
+                ('hotel', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='inventory', to='hotelapi.hotel')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('hotel', 'night'), name='inventory_hotel_night_uniq'), models.CheckConstraint(condition=models.Q(('remaining__gte', 0)), name='inventory_remaining_gte_0')],
+            },
+        ),
+        # Count the rooms taken by existing reservations.
+        migrations.RunPython(rebuild, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 12:10
+
+import hotelapi.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotelapi', '0010_hotel_inventory'),
+    ]
+
+    operations = [
+        # Filled in by 0012, then swapped for confirmation_number by 0013.
+        migrations.AddField(
+            model_name='reservation',
+            name='confirmation_uuid',
+            field=hotelapi.fields.CompactUUIDField(null=True),
+        ),
+    ]
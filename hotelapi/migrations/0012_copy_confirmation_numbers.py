@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 12:10
+
+import uuid
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 5000
+
+
+def copy_confirmation_numbers(apps, schema_editor):
+    """
+    Parse every confirmation number into confirmation_uuid, committing one
+    batch of reservations at a time so large tables aren't locked for the
+    whole copy. Safe to rerun: rows already copied are skipped.
+    """
+    Reservation = apps.get_model('hotelapi', 'Reservation')
+    reservations = Reservation.objects.using(schema_editor.connection.alias)
+    last_id = 0
+    while True:
+        batch = list(
+            reservations.filter(id__gt=last_id, confirmation_uuid__isnull=True)
+            .order_by('id').only('id', 'confirmation_number')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for reservation in batch:
+            try:
+                reservation.confirmation_uuid = uuid.UUID(reservation.confirmation_number)
+            except ValueError:
+                raise ValueError(
+                    f'Reservation {reservation.id} has a confirmation number that is not a UUID: '
+                    f'{reservation.confirmation_number!r}'
+                ) from None
+        with transaction.atomic(using=schema_editor.connection.alias):
+            reservations.bulk_update(batch, ['confirmation_uuid'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own.
+    atomic = False
+
+    dependencies = [
+        ('hotelapi', '0011_reservation_confirmation_uuid'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_confirmation_numbers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 12:10
+
+import hotelapi.fields
+import uuid
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotelapi', '0012_copy_confirmation_numbers'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='reservation',
+            name='confirmation_number',
+        ),
+        migrations.RenameField(
+            model_name='reservation',
+            old_name='confirmation_uuid',
+            new_name='confirmation_number',
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='confirmation_number',
+            field=hotelapi.fields.CompactUUIDField(default=uuid.uuid4, unique=True),
+        ),
+    ]
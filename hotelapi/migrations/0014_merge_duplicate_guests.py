@@ -0,0 +1,56 @@
+# Generated by Django 5.2 on 2026-10-18 12:10
+
+from django.db import migrations, transaction
+from django.db.models import Count, Min
+
+BATCH_SIZE = 1000
+
+
+def merge_duplicate_guests(apps, schema_editor):
+    """
+    Keep the oldest guest of every (guest_name, gender) and move the
+    reservations of the others to it, one batch of names per transaction.
+    Safe to rerun: merged names have no duplicates left.
+    """
+    alias = schema_editor.connection.alias
+    Guest = apps.get_model('hotelapi', 'Guest')
+    Through = apps.get_model('hotelapi', 'Reservation').guests.through
+    guests = Guest.objects.using(alias)
+    while True:
+        duplicated = list(
+            guests.values('guest_name', 'gender').annotate(keep=Min('id'), rows=Count('id'))
+            .filter(rows__gt=1).order_by('keep')[:BATCH_SIZE]
+        )
+        if not duplicated:
+            break
+        keep = {(group['guest_name'], group['gender']): group['keep'] for group in duplicated}
+        with transaction.atomic(using=alias):
+            rows = guests.filter(guest_name__in={name for name, _ in keep}).values_list('id', 'guest_name', 'gender')
+            merged = {
+                guest_id: keep[name, gender]
+                for guest_id, name, gender in rows
+                if (name, gender) in keep and guest_id != keep[name, gender]
+            }
+            links = Through.objects.using(alias).filter(guest_id__in=merged)
+            # A reservation listing the same guest twice keeps one link.
+            Through.objects.using(alias).bulk_create(
+                [Through(reservation_id=reservation_id, guest_id=merged[guest_id])
+                 for reservation_id, guest_id in links.values_list('reservation_id', 'guest_id')],
+                ignore_conflicts=True,
+                batch_size=BATCH_SIZE,
+            )
+            links.delete()
+            guests.filter(id__in=merged).delete()
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own.
+    atomic = False
+
+    dependencies = [
+        ('hotelapi', '0013_compact_confirmation_number'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_guests, migrations.RunPython.noop),
+    ]
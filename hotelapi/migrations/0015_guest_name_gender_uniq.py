@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotelapi', '0014_merge_duplicate_guests'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='guest',
+            constraint=models.UniqueConstraint(fields=('guest_name', 'gender'), name='guest_name_gender_uniq'),
+        ),
+        # The constraint's index leads with guest_name.
+        migrations.RemoveIndex(
+            model_name='guest',
+            name='guest_name_idx',
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 10:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def rebuild(apps, schema_editor):
+    from hotelapi.rollups import rebuild_rollups
+    rebuild_rollups(apps, using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotelapi', '0015_guest_name_gender_uniq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('bucket', models.CharField(max_length=20)),
+                ('hotels', models.IntegerField()),
+                ('price_total', models.BigIntegerField()),
+                ('rating_total', models.DecimalField(decimal_places=1, max_digits=12)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'bucket'), name='catalogue_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HotelNightStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('night', models.DateField()),
+                ('rooms', models.IntegerField(default=0)),
+                ('guests', models.IntegerField(default=0)),
+                ('hotel', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='night_stats', to='hotelapi.hotel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['night'], name='night_stats_night_idx')],
+                'constraints': [models.UniqueConstraint(fields=('hotel', 'night'), name='night_stats_hotel_night_uniq')],
+            },
+        ),
+        # Count the existing reservations and hotels.
+        migrations.RunPython(rebuild, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 10:18
+
+import django.db.models.deletion
+import hotelapi.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotelapi', '0016_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedReservation',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('confirmation_number', hotelapi.fields.CompactUUIDField(unique=True)),
+                ('hotel_name', models.CharField(max_length=100)),
+                ('checkin', models.DateField()),
+                ('checkout', models.DateField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('guests', models.ManyToManyField(related_name='archived_reservations', to='hotelapi.guest')),
+                ('hotel', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_reservations', to='hotelapi.hotel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hotel', 'checkin', 'checkout'], name='archived_hotel_stay_idx'), models.Index(fields=['checkin', 'checkout'], name='archived_stay_idx'), models.Index(fields=['checkout'], name='archived_checkout_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def set_journal_mode(mode):
+    def run(apps, schema_editor):
+        connection = schema_editor.connection
+        # In-memory databases (the test suite's) only have their own mode.
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA journal_mode={mode}')
+    return run
+
+
+class Migration(migrations.Migration):
+    # The journal mode can't be changed inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('hotelapi', '0017_archived_reservation'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            set_journal_mode(getattr(settings, 'SQLITE_JOURNAL_MODE', 'WAL')),
+            set_journal_mode('DELETE'),
+        ),
+    ]
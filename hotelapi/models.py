@@ -1,15 +1,28 @@
 from django.db import models
 import uuid
 
+from .fields import CompactUUIDField
+
 # Create your models here.
 class Hotel(models.Model):
     id = models.IntegerField(primary_key=True)
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, db_index=True)
     rating = models.DecimalField(max_digits=3, decimal_places=1)
     price = models.IntegerField()
     available_until = models.DateField()
     available = models.BooleanField(null=True)
 
+    class Meta:
+        # One per filter and sort key of the hotel list endpoints (see
+        # filters.py); name is indexed by db_index above.
+        indexes = [
+            # Also serves available_hotels: available = 1 AND available_until >= checkout.
+            models.Index(fields=['available', 'available_until'], name='hotel_available_until_idx'),
+            models.Index(fields=['available_until'], name='hotel_until_idx'),
+            models.Index(fields=['price'], name='hotel_price_idx'),
+            models.Index(fields=['rating'], name='hotel_rating_idx'),
+        ]
+
     def __str__(self):
         return self.name 
 
@@ -17,16 +30,140 @@ class Guest(models.Model):
     guest_name = models.CharField(max_length=100)
     gender = models.CharField(max_length=20)
 
+    class Meta:
+        constraints = [
+            # A guest is stored once and shared by all of their reservations
+            # (see services.intern_guests). Also serves ?guest_name= on the
+            # reservation list.
+            models.UniqueConstraint(fields=['guest_name', 'gender'], name='guest_name_gender_uniq'),
+        ]
+
     def __str__(self):
         return self.guest_name
 
 class Reservation(models.Model):
-    confirmation_number = models.CharField(max_length=50, unique=True, default=uuid.uuid4)
+    # 16 bytes instead of a 36 character string; see fields.py.
+    confirmation_number = CompactUUIDField(unique=True, default=uuid.uuid4)
+    # Not indexed on its own: reservation_hotel_stay_idx leads with hotel.
+    hotel = models.ForeignKey(
+        Hotel, on_delete=models.PROTECT, null=True, blank=True,
+        related_name='reservations', db_index=False,
+    )
+    # Name as submitted by the client; kept for reservations made before the
+    # hotel foreign key existed, which may not match any hotel.
     hotel_name = models.CharField(max_length=100)
     checkin = models.DateField()
     checkout = models.DateField()
     guests = models.ManyToManyField(Guest)
+
+    class Meta:
+        indexes = [
+            # Serves per-hotel lookups and the overlap check in
+            # available_hotels: seek on hotel, range on checkin, checkout
+            # read from the index.
+            models.Index(fields=['hotel', 'checkin', 'checkout'], name='reservation_hotel_stay_idx'),
+            # Date range lookups across all hotels (see filters.py).
+            models.Index(fields=['checkin', 'checkout'], name='reservation_stay_idx'),
+            models.Index(fields=['checkout'], name='reservation_checkout_idx'),
+        ]
     
     def __str__(self):
-        return self.confirmation_number
+        return str(self.confirmation_number)
+
+
+class HotelInventory(models.Model):
+    """
+    Rooms of a hotel for one night. Rows are created on the first booking of
+    the night; see inventory.py.
+    """
+    hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='inventory', db_index=False)
+    night = models.DateField()
+    capacity = models.PositiveIntegerField()
+    remaining = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            # Also the index every booking seeks on.
+            models.UniqueConstraint(fields=['hotel', 'night'], name='inventory_hotel_night_uniq'),
+            # Last line of defence: a booking that would overbook fails
+            # even if it skipped the conditional update.
+            models.CheckConstraint(condition=models.Q(remaining__gte=0), name='inventory_remaining_gte_0'),
+        ]
+
+    def __str__(self):
+        return f'{self.hotel_id} {self.night}: {self.remaining}/{self.capacity}'
+
+
+class HotelNightStats(models.Model):
+    """
+    Rooms booked and guests staying at a hotel on one night, kept up to date
+    as reservations are made; see rollups.py.
+    """
+    hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='night_stats', db_index=False)
+    night = models.DateField()
+    # Not constrained to be positive: a stale rollup must not make deletes fail.
+    rooms = models.IntegerField(default=0)
+    guests = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves /stats/?hotel_id=.
+            models.UniqueConstraint(fields=['hotel', 'night'], name='night_stats_hotel_night_uniq'),
+        ]
+        indexes = [
+            # Date ranges across all hotels.
+            models.Index(fields=['night'], name='night_stats_night_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.hotel_id} {self.night}: {self.rooms} rooms, {self.guests} guests'
+
+
+class CatalogueBucket(models.Model):
+    """
+    Hotels in one price band, star rating or availability state, with their
+    price and rating totals; see rollups.py.
+    """
+    dimension = models.CharField(max_length=20)
+    bucket = models.CharField(max_length=20)
+    hotels = models.IntegerField()
+    price_total = models.BigIntegerField()
+    rating_total = models.DecimalField(max_digits=12, decimal_places=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'bucket'], name='catalogue_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.dimension} {self.bucket}: {self.hotels}'
+
 
+class ArchivedReservation(models.Model):
+    """
+    A reservation that checked out before an archive cutoff, moved out of
+    Reservation with its guests to keep the live tables small; see
+    archive.py. It keeps the id and confirmation number it had there.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    confirmation_number = CompactUUIDField(unique=True)
+    hotel = models.ForeignKey(
+        Hotel, on_delete=models.PROTECT, null=True, blank=True,
+        related_name='archived_reservations', db_index=False,
+    )
+    hotel_name = models.CharField(max_length=100)
+    checkin = models.DateField()
+    checkout = models.DateField()
+    guests = models.ManyToManyField(Guest, related_name='archived_reservations')
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # The lookups of the reservation list, for ?include_archived=true.
+        indexes = [
+            models.Index(fields=['hotel', 'checkin', 'checkout'], name='archived_hotel_stay_idx'),
+            models.Index(fields=['checkin', 'checkout'], name='archived_stay_idx'),
+            models.Index(fields=['checkout'], name='archived_checkout_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.confirmation_number)
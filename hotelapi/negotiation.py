@@ -0,0 +1,96 @@
+"""
+MessagePack responses for the list endpoints, chosen with the Accept header.
+
+``/hotel_list/`` and ``/reservations/`` answer ``Accept: application/msgpack``
+(or ``application/x-msgpack``) with the same data as their JSON, packed
+with MessagePack, when the ``msgpack`` package is installed. Otherwise,
+and for any other Accept header, they send JSON. Streamed responses
+(``?stream=``) are always JSON.
+
+MessagePackRenderer lets DRF's content negotiation accept such requests;
+settings.py only installs it when msgpack is importable.
+"""
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import BaseRenderer
+
+from .fastjson import JsonResponse
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_CONTENT_TYPE = 'application/msgpack'
+MSGPACK_MEDIA_TYPES = {'application/msgpack', 'application/x-msgpack'}
+
+# Values MessagePack has no type for (dates, Decimal, UUID) are sent as
+# the strings JSON would have.
+_default = DjangoJSONEncoder().default
+
+
+def header_qualities(header):
+    """
+    Map each value of an Accept or Accept-Encoding header to its quality,
+    e.g. ``'gzip, br;q=0.5'`` to ``{'gzip': 1.0, 'br': 0.5}``.
+    """
+    qualities = {}
+    for item in (header or '').split(','):
+        value, *params = item.split(';')
+        value = value.strip().lower()
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, number = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        qualities[value] = quality
+    return qualities
+
+
+def wants_msgpack(request):
+    """Whether the Accept header asks for MessagePack and we can send it."""
+    accept = request.META.get('HTTP_ACCEPT', '')
+    if msgpack is None or 'msgpack' not in accept:
+        return False
+    qualities = header_qualities(accept)
+    return any(qualities.get(media_type, 0) > 0 for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def packb(data):
+    return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+class MsgPackResponse(HttpResponse):
+    """Like JsonResponse, packed with MessagePack."""
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', MSGPACK_CONTENT_TYPE)
+        super().__init__(content=packb(data), **kwargs)
+
+
+def negotiated_response(request, data, safe=True, **kwargs):
+    """A MsgPackResponse or JsonResponse of ``data``, as the client asked."""
+    response_class = MsgPackResponse if wants_msgpack(request) else JsonResponse
+    response = response_class(data, safe=safe, **kwargs)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = MSGPACK_CONTENT_TYPE
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return packb(data)
@@ -0,0 +1,174 @@
+import base64
+import binascii
+import heapq
+from functools import cmp_to_key
+from itertools import islice
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+from . import fastjson
+
+
+def encode_cursor(ordering, values):
+    """
+    Pack the ordering and the key values of the last row of a page into an
+    opaque, URL-safe token.
+    """
+    raw = fastjson.dumps({'o': list(ordering), 'k': list(values)})
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, ordering):
+    padding = '=' * (-len(token) % 4)
+    try:
+        payload = fastjson.loads(base64.urlsafe_b64decode(token + padding))
+        values = payload['k']
+        cursor_ordering = payload['o']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+    if cursor_ordering != list(ordering) or len(values) != len(ordering):
+        raise ValidationError({'cursor': 'Cursor does not match the requested ordering.'})
+    return values
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique key (or a key with a unique tiebreaker).
+
+    Each page is fetched with a ``WHERE key > last_key ORDER BY key LIMIT n``
+    query, so the cost of a page does not depend on how deep into the table
+    the client is. Pagination is opt-in: without ``limit`` or ``cursor`` the
+    view returns the full, unpaginated list as before.
+    """
+    ordering = ('id',)
+    limit_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    default_limit = 100
+    max_limit = 1000
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+        self.next_cursor = None
+
+    def get_limit(self, request):
+        limit = request.GET.get(self.limit_query_param)
+        if limit is None:
+            if self.cursor_query_param in request.GET:
+                return self.default_limit
+            return None
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValidationError({self.limit_query_param: 'A valid integer is required.'})
+        if limit < 1:
+            raise ValidationError({self.limit_query_param: 'Ensure this value is greater than or equal to 1.'})
+        return min(limit, self.max_limit)
+
+    def get_key_filter(self, values):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y), respecting each
+        # field's direction.
+        key_filter = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            key_filter |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return key_filter
+
+    @property
+    def key_fields(self):
+        """The columns a row needs for get_key(), which must be fetched."""
+        return tuple(field.lstrip('-') for field in self.ordering)
+
+    def get_key(self, row):
+        if isinstance(row, dict):
+            return [row[field] for field in self.key_fields]
+        return [getattr(row, field) for field in self.key_fields]
+
+    def _page_queryset(self, queryset, request):
+        limit = self.get_limit(request)
+        if limit is None:
+            return None, None
+
+        queryset = queryset.order_by(*self.ordering)
+        token = request.GET.get(self.cursor_query_param)
+        if token:
+            queryset = queryset.filter(self.get_key_filter(decode_cursor(token, self.ordering)))
+
+        # Fetch one extra row to find out whether there is a next page.
+        return queryset[:limit + 1], limit
+
+    def _finish_page(self, rows, limit):
+        page = rows[:limit]
+        if len(rows) > limit:
+            self.next_cursor = encode_cursor(self.ordering, self.get_key(page[-1]))
+        else:
+            self.next_cursor = None
+        return page
+
+    def compare(self, a, b):
+        """Order two rows by their keys, respecting each field's direction."""
+        for field, x, y in zip(self.ordering, self.get_key(a), self.get_key(b)):
+            if x != y:
+                result = -1 if x < y else 1
+                return -result if field.startswith('-') else result
+        return 0
+
+    def _merge_pages(self, pages, limit):
+        # Each source already holds its own first limit + 1 rows past the
+        # cursor, so the first limit + 1 of the merge are the page's.
+        return list(islice(heapq.merge(*pages, key=cmp_to_key(self.compare)), limit + 1))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, limit = self._page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self._finish_page(list(queryset), limit)
+
+    async def apaginate_queryset(self, queryset, request):
+        queryset, limit = self._page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self._finish_page([row async for row in queryset], limit)
+
+    def paginate_querysets(self, querysets, request):
+        """
+        Like paginate_queryset() over the union of ``querysets``, whose rows
+        have the same keys and are never equal.
+        """
+        if len(querysets) == 1:
+            return self.paginate_queryset(querysets[0], request)
+        pages = [self._page_queryset(queryset, request) for queryset in querysets]
+        limit = pages[0][1]
+        if limit is None:
+            return None
+        return self._finish_page(self._merge_pages([list(page) for page, _ in pages], limit), limit)
+
+    async def apaginate_querysets(self, querysets, request):
+        if len(querysets) == 1:
+            return await self.apaginate_queryset(querysets[0], request)
+        pages = [self._page_queryset(queryset, request) for queryset in querysets]
+        limit = pages[0][1]
+        if limit is None:
+            return None
+        rows = [[row async for row in page] for page, _ in pages]
+        return self._finish_page(self._merge_pages(rows, limit), limit)
+
+    def get_paginated_data(self, data):
+        return {'next': self.next_cursor, 'results': data}
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+
+class HotelPagination(KeysetPagination):
+    ordering = ('id',)
+
+
+class ReservationPagination(KeysetPagination):
+    ordering = ('confirmation_number',)
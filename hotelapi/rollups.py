@@ -0,0 +1,315 @@
+"""
+Occupancy and catalogue rollups, which /stats/ reads instead of the raw
+tables.
+
+HotelNightStats holds the rooms booked and the guests staying at each
+hotel on each night. It is updated in the transaction that writes the
+reservation (services.create_reservations, and the signals for single
+saves, guest changes and deletes), with one conditional update per
+distinct change, like inventory.py:
+
+    UPDATE hotelapi_hotelnightstats SET rooms = rooms + 1, guests = guests + 2
+    WHERE hotel_id = %s AND night IN (...)
+
+CatalogueBucket holds hotel counts, with price and rating totals, per price
+band, whole star rating and availability flag. It is updated the same way,
+in the transaction that writes the hotels: the Hotel signals read the
+stored values before a save or delete, and services.upsert_hotels before
+its bulk upsert, then the hotel is taken out of its old buckets and counted
+in its new ones. import_hotels skips that per batch and recomputes the
+buckets in one pass over Hotel at the end (refresh_catalogue), once.
+
+Archived reservations (archive.py) still count. Writes that bypass those
+paths, such as datasets.seed_reservations, Hotel.objects.update(), deleting
+guests, changing the dates of a reservation or changing STATS_PRICE_BAND,
+must be followed by rebuild_rollups() (``manage.py rebuild_rollups``).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .inventory import stay_nights
+from .models import ArchivedReservation, CatalogueBucket, Hotel, HotelNightStats, Reservation
+
+DEFAULT_PRICE_BAND = 50
+REBUILD_BATCH_SIZE = 5000
+# Nights /stats/ reports when no range is given, and at most.
+DEFAULT_STATS_NIGHTS = 30
+MAX_STATS_NIGHTS = 366
+
+AVAILABILITY_BUCKETS = {True: 'true', False: 'false', None: 'null'}
+# The Hotel fields the catalogue buckets depend on.
+CATALOGUE_FIELDS = ('price', 'rating', 'available')
+
+
+def get_price_band():
+    return getattr(settings, 'STATS_PRICE_BAND', DEFAULT_PRICE_BAND)
+
+
+def night_changes(changes):
+    """
+    (rooms, guests) to add per (hotel_id, night) for an iterable of
+    (hotel_id, checkin, checkout, rooms, guests).
+    """
+    totals = {}
+    for hotel_id, checkin, checkout, rooms, guests in changes:
+        if hotel_id is None:
+            continue
+        for night in stay_nights(checkin, checkout):
+            old_rooms, old_guests = totals.get((hotel_id, night), (0, 0))
+            totals[hotel_id, night] = (old_rooms + rooms, old_guests + guests)
+    return {key: change for key, change in totals.items() if change != (0, 0)}
+
+
+def update_night_stats(changes):
+    """
+    Add ``changes``, (hotel_id, checkin, checkout, rooms, guests) tuples, to
+    every night of their stays; negative numbers subtract. Takes one insert
+    plus one update per distinct (rooms, guests) change, usually one.
+
+    Call it in the transaction that writes the reservations, so the rollup
+    changes only if they commit.
+    """
+    totals = night_changes(changes)
+    if not totals:
+        return
+    HotelNightStats.objects.bulk_create(
+        [HotelNightStats(hotel_id=hotel_id, night=night) for hotel_id, night in totals],
+        ignore_conflicts=True,
+    )
+    groups = {}
+    for (hotel_id, night), change in totals.items():
+        groups.setdefault(change, {}).setdefault(hotel_id, []).append(night)
+    for (rooms, guests), nights_by_hotel in groups.items():
+        condition = Q()
+        for hotel_id, nights in nights_by_hotel.items():
+            condition |= Q(hotel_id=hotel_id, night__in=nights)
+        HotelNightStats.objects.filter(condition).update(rooms=F('rooms') + rooms, guests=F('guests') + guests)
+
+
+def bucket_keys(price, rating, available, price_band):
+    """(dimension, bucket) of each catalogue bucket a hotel is counted in."""
+    return (
+        ('price', str(price // price_band * price_band)),
+        ('rating', str(int(rating))),
+        ('available', AVAILABILITY_BUCKETS[available]),
+    )
+
+
+def catalogue_entry(hotel):
+    """(price, rating, available) of a Hotel instance, as they are stored."""
+    return tuple(Hotel._meta.get_field(name).to_python(getattr(hotel, name)) for name in CATALOGUE_FIELDS)
+
+
+def stored_catalogue_entries(hotel_ids, using=None):
+    """hotel id -> stored (price, rating, available), for the ids that exist."""
+    rows = Hotel.objects.db_manager(using).filter(id__in=hotel_ids).values_list('id', *CATALOGUE_FIELDS)
+    return {hotel_id: entry for hotel_id, *entry in rows}
+
+
+def update_catalogue(changes, using=None):
+    """
+    Apply ``changes``, (price, rating, available, sign) tuples, to the
+    catalogue buckets: sign 1 counts a hotel in, -1 takes it out. Takes one
+    insert plus one update per distinct change, and a delete of the buckets
+    left empty when hotels were taken out.
+
+    Call it in the transaction that writes the hotels, so the buckets
+    change only if they commit.
+    """
+    price_band = get_price_band()
+    totals = {}
+    for price, rating, available, sign in changes:
+        for key in bucket_keys(price, rating, available, price_band):
+            count, price_total, rating_total = totals.get(key, (0, 0, Decimal(0)))
+            totals[key] = (count + sign, price_total + sign * price, rating_total + sign * rating)
+    # A save that changes none of the fields changes nothing.
+    totals = {key: change for key, change in totals.items() if change != (0, 0, 0)}
+    if not totals:
+        return
+    buckets = CatalogueBucket.objects.db_manager(using)
+    buckets.bulk_create(
+        [CatalogueBucket(dimension=dimension, bucket=bucket, hotels=0, price_total=0, rating_total=0)
+         for dimension, bucket in totals],
+        ignore_conflicts=True,
+    )
+    groups = {}
+    for (dimension, bucket), change in totals.items():
+        groups.setdefault(change, {}).setdefault(dimension, []).append(bucket)
+    for (count, price_total, rating_total), buckets_by_dimension in groups.items():
+        condition = Q()
+        for dimension, names in buckets_by_dimension.items():
+            condition |= Q(dimension=dimension, bucket__in=names)
+        buckets.filter(condition).update(
+            hotels=F('hotels') + count,
+            price_total=F('price_total') + price_total,
+            rating_total=F('rating_total') + rating_total,
+        )
+    if any(count < 0 for count, _, _ in totals.values()):
+        # As refresh_catalogue() would leave them: gone.
+        buckets.filter(hotels__lte=0).delete()
+
+
+def catalogue_buckets(hotels, price_band, bucket_model=CatalogueBucket):
+    """CatalogueBucket rows for an iterable of (price, rating, available)."""
+    totals = {}
+    for price, rating, available in hotels:
+        for key in bucket_keys(price, rating, available, price_band):
+            count, price_total, rating_total = totals.get(key, (0, 0, Decimal(0)))
+            totals[key] = (count + 1, price_total + price, rating_total + rating)
+    return [
+        bucket_model(dimension=dimension, bucket=bucket, hotels=count,
+                     price_total=price_total, rating_total=rating_total)
+        for (dimension, bucket), (count, price_total, rating_total) in totals.items()
+    ]
+
+
+def refresh_catalogue(apps=None, using=None):
+    """Recompute the catalogue buckets from the hotels. Returns their number."""
+    hotel_model = apps.get_model('hotelapi', 'Hotel') if apps else Hotel
+    bucket_model = apps.get_model('hotelapi', 'CatalogueBucket') if apps else CatalogueBucket
+    using = using or router.db_for_write(bucket_model)
+
+    with transaction.atomic(using=using):
+        hotels = hotel_model.objects.using(using).values_list(*CATALOGUE_FIELDS)
+        rows = catalogue_buckets(hotels.iterator(chunk_size=REBUILD_BATCH_SIZE), get_price_band(), bucket_model)
+        bucket_model.objects.using(using).all().delete()
+        bucket_model.objects.using(using).bulk_create(rows)
+    return len(rows)
+
+
+def _stays(reservation_models, using, batch_size):
+    """
+    (hotel_id, checkin, checkout, 1, guests) of every reservation with a
+    hotel, read in batches by id.
+    """
+    for reservation_model in reservation_models:
+        reservations = (
+            reservation_model.objects.using(using).filter(hotel__isnull=False)
+            .annotate(guest_count=Count('guests')).order_by('id')
+        )
+        last_id = 0
+        while True:
+            batch = list(reservations.filter(id__gt=last_id).values_list(
+                'id', 'hotel_id', 'checkin', 'checkout', 'guest_count')[:batch_size])
+            for _, hotel_id, checkin, checkout, guests in batch:
+                yield hotel_id, checkin, checkout, 1, guests
+            if len(batch) < batch_size:
+                break
+            last_id = batch[-1][0]
+
+
+def _reservation_models(apps):
+    if apps is None:
+        return [Reservation, ArchivedReservation]
+    models = [apps.get_model('hotelapi', 'Reservation')]
+    try:
+        models.append(apps.get_model('hotelapi', 'ArchivedReservation'))
+    except LookupError:
+        # Migrating from before the archive existed.
+        pass
+    return models
+
+
+def rebuild_rollups(apps=None, using=None, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Recompute every rollup from scratch: reservations, live and archived,
+    are read in batches of ``batch_size``, then the night stats are
+    replaced in one transaction and the catalogue buckets refreshed.
+
+    ``apps`` is the app registry of a migration, when called from one.
+    """
+    stats_model = apps.get_model('hotelapi', 'HotelNightStats') if apps else HotelNightStats
+    using = using or router.db_for_write(stats_model)
+
+    with transaction.atomic(using=using):
+        totals = night_changes(_stays(_reservation_models(apps), using, batch_size))
+        stats_model.objects.using(using).all().delete()
+        stats_model.objects.using(using).bulk_create(
+            [stats_model(hotel_id=hotel_id, night=night, rooms=rooms, guests=guests)
+             for (hotel_id, night), (rooms, guests) in totals.items()],
+            batch_size=batch_size,
+        )
+        buckets = refresh_catalogue(apps, using)
+    return {'nights': len(totals), 'buckets': buckets}
+
+
+def occupancy_stats(start, end, hotel_id=None):
+    """
+    Rooms booked, guests and hotels with bookings for every night from
+    ``start`` to ``end`` inclusive, with totals over the range.
+    """
+    stats = HotelNightStats.objects.filter(night__gte=start, night__lte=end, rooms__gt=0)
+    if hotel_id is not None:
+        stats = stats.filter(hotel_id=hotel_id)
+    by_night = {
+        night: (rooms, guests, hotels)
+        for night, rooms, guests, hotels in stats.order_by().values_list('night').annotate(
+            Sum('rooms'), Sum('guests'), Count('hotel_id'))
+    }
+
+    nights = []
+    room_nights = guest_nights = 0
+    for offset in range((end - start).days + 1):
+        night = start + timedelta(days=offset)
+        rooms, guests, hotels = by_night.get(night, (0, 0, 0))
+        nights.append({'night': night.isoformat(), 'rooms': rooms, 'guests': guests, 'hotels': hotels})
+        room_nights += rooms
+        guest_nights += guests
+    return {
+        'room_nights': room_nights,
+        'guest_nights': guest_nights,
+        'average_rooms_per_night': round(room_nights / len(nights), 2),
+        'average_guests_per_room': round(guest_nights / room_nights, 2) if room_nights else None,
+        'nights': nights,
+    }
+
+
+def _averages(hotels, price_total, rating_total):
+    if not hotels:
+        return None, None
+    return round(price_total / hotels, 2), round(float(rating_total) / hotels, 2)
+
+
+def catalogue_stats():
+    """Hotel counts and averages overall, per price band, star rating and availability."""
+    by_dimension = {}
+    for dimension, bucket, hotels, price_total, rating_total in CatalogueBucket.objects.values_list(
+            'dimension', 'bucket', 'hotels', 'price_total', 'rating_total'):
+        by_dimension.setdefault(dimension, {})[bucket] = (hotels, price_total, rating_total)
+
+    # Every hotel is in exactly one availability bucket.
+    availability = by_dimension.get('available', {})
+    hotels = sum(count for count, _, _ in availability.values())
+    average_price, average_rating = _averages(
+        hotels,
+        sum(price_total for _, price_total, _ in availability.values()),
+        sum((rating_total for _, _, rating_total in availability.values()), Decimal(0)),
+    )
+
+    price_band = get_price_band()
+    price_histogram = []
+    for bucket, (count, price_total, rating_total) in sorted(
+            by_dimension.get('price', {}).items(), key=lambda item: int(item[0])):
+        _, bucket_rating = _averages(count, price_total, rating_total)
+        price_histogram.append({
+            'min_price': int(bucket), 'max_price': int(bucket) + price_band - 1,
+            'hotels': count, 'average_rating': bucket_rating,
+        })
+    rating_histogram = []
+    for bucket, (count, price_total, rating_total) in sorted(
+            by_dimension.get('rating', {}).items(), key=lambda item: int(item[0])):
+        bucket_price, _ = _averages(count, price_total, rating_total)
+        rating_histogram.append({'stars': int(bucket), 'hotels': count, 'average_price': bucket_price})
+
+    return {
+        'hotels': hotels,
+        'average_price': average_price,
+        'average_rating': average_rating,
+        'availability': {name: availability.get(name, (0,))[0] for name in AVAILABILITY_BUCKETS.values()},
+        'price_histogram': price_histogram,
+        'rating_histogram': rating_histogram,
+    }
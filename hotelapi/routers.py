@@ -0,0 +1,29 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads to the read-only 'replica' connection and writes to 'default'.
+
+    Both aliases open the same SQLite file, so there is no replication lag:
+    anything committed on 'default' is visible to the next read. Reads made
+    inside a transaction on 'default' stay there so they see the
+    transaction's own uncommitted writes and keep its locks.
+    """
+
+    def db_for_read(self, model, **hints):
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_DB_ALIAS
@@ -0,0 +1,182 @@
+"""
+Full-text search over hotel names and guest names.
+
+On SQLite the text lives in two external-content FTS5 tables,
+hotelapi_hotel_fts and hotelapi_guest_fts, which index the name columns
+of hotelapi_hotel and hotelapi_guest without storing a second copy of the
+text. Triggers on the source tables keep them in sync, so bulk inserts,
+upserts and raw SQL are covered as well as the ORM. Matching ignores case
+and accents, and every term is a prefix. Results are ranked by bm25, or
+newest first when a search matches too many rows to rank cheaply.
+
+Other databases fall back to ``icontains`` lookups, unranked.
+
+``manage.py rebuild_search_index`` rebuilds both indexes from their tables.
+"""
+import re
+
+from django.db import connections, router
+
+from .models import Guest, Hotel, Reservation
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# Terms beyond this many are ignored.
+SEARCH_MAX_TERMS = 8
+# bm25 is computed for every match before the best ones can be picked,
+# which for a common surname means tens of thousands of rows. Broader
+# searches than this are returned newest first instead, which FTS5 can
+# stop early on.
+SEARCH_RANK_MAX_MATCHES = 2000
+# Guests fetched per reservation wanted; several matching guests can share
+# a reservation.
+SEARCH_GUESTS_PER_RESERVATION = 4
+
+# (FTS table, source table, indexed column)
+SEARCH_INDEXES = [
+    ('hotelapi_hotel_fts', 'hotelapi_hotel', 'name'),
+    ('hotelapi_guest_fts', 'hotelapi_guest', 'guest_name'),
+]
+
+_TERM_RE = re.compile(r'\w+')
+
+
+def _create_table_sql(fts_table, table, column):
+    # prefix='2 3' adds index entries for 2 and 3 character prefixes, which
+    # keeps short "starts with" searches from scanning the whole term list.
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+        f"{column}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+
+
+def _trigger_sql(fts_table, table, column):
+    delete_old = (
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column});"
+    )
+    insert_new = f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF id, {column} ON {table} "
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def install_search_index(connection):
+    """Create the FTS tables and triggers if missing and index existing rows."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for fts_table, table, column in SEARCH_INDEXES:
+            cursor.execute(_create_table_sql(fts_table, table, column))
+            for sql in _trigger_sql(fts_table, table, column):
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def uninstall_search_index(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for fts_table, _, _ in SEARCH_INDEXES:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {fts_table}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {fts_table}")
+
+
+def ensure_search_triggers(connection):
+    """
+    Recreate missing triggers on tables that have a search index.
+
+    SQLite's schema editor rebuilds a table (and drops its triggers) for
+    most ALTERs, so this runs after every migrate.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    existing = set(connection.introspection.table_names(include_views=True))
+    with connection.cursor() as cursor:
+        for fts_table, table, column in SEARCH_INDEXES:
+            if fts_table in existing and table in existing:
+                for sql in _trigger_sql(fts_table, table, column):
+                    cursor.execute(sql)
+
+
+def rebuild_search_index(using=None):
+    """Re-index every row and merge the index b-trees; returns the tables rebuilt."""
+    connection = connections[using or router.db_for_write(Hotel)]
+    if connection.vendor != 'sqlite':
+        return []
+    with connection.cursor() as cursor:
+        for fts_table, _, _ in SEARCH_INDEXES:
+            cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('optimize')")
+    return [fts_table for fts_table, _, _ in SEARCH_INDEXES]
+
+
+def search_terms(text):
+    return _TERM_RE.findall(text)[:SEARCH_MAX_TERMS]
+
+
+def match_expression(terms):
+    """
+    An FTS5 query matching rows that contain every term as a prefix. Terms
+    are quoted, so FTS5 operators in user input are taken literally.
+    """
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def _match_ordering(cursor, fts_table, expression):
+    cursor.execute(f"SELECT count(*) FROM {fts_table} WHERE {fts_table} MATCH %s", [expression])
+    if cursor.fetchone()[0] <= SEARCH_RANK_MAX_MATCHES:
+        return 'rank, rowid'
+    return 'rowid DESC'
+
+
+def search_hotel_ids(terms, limit=SEARCH_DEFAULT_LIMIT):
+    """Ids of the hotels whose name matches ``terms``, best match first."""
+    connection = connections[router.db_for_read(Hotel)]
+    if connection.vendor != 'sqlite':
+        queryset = Hotel.objects.order_by('id')
+        for term in terms:
+            queryset = queryset.filter(name__icontains=term)
+        return list(queryset.values_list('id', flat=True)[:limit])
+
+    expression = match_expression(terms)
+    with connection.cursor() as cursor:
+        ordering = _match_ordering(cursor, 'hotelapi_hotel_fts', expression)
+        cursor.execute(
+            f"SELECT rowid FROM hotelapi_hotel_fts WHERE hotelapi_hotel_fts MATCH %s ORDER BY {ordering} LIMIT %s",
+            [expression, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_reservation_ids(terms, limit=SEARCH_DEFAULT_LIMIT):
+    """
+    Ids of the reservations with a guest whose name matches ``terms``,
+    ordered by their best matching guest.
+    """
+    connection = connections[router.db_for_read(Reservation)]
+    if connection.vendor != 'sqlite':
+        guests = Guest.objects.all()
+        for term in terms:
+            guests = guests.filter(guest_name__icontains=term)
+        queryset = Reservation.objects.filter(guests__in=guests).distinct().order_by('id')
+        return list(queryset.values_list('id', flat=True)[:limit])
+
+    expression = match_expression(terms)
+    through_table = Reservation.guests.through._meta.db_table
+    with connection.cursor() as cursor:
+        ordering = _match_ordering(cursor, 'hotelapi_guest_fts', expression)
+        # Pick the best guests first, so only they are joined and grouped.
+        cursor.execute(
+            f"SELECT t.reservation_id FROM ("
+            f"SELECT rowid, row_number() OVER (ORDER BY {ordering}) AS position FROM hotelapi_guest_fts "
+            f"WHERE hotelapi_guest_fts MATCH %s ORDER BY {ordering} LIMIT %s"
+            f") g JOIN {through_table} t ON t.guest_id = g.rowid "
+            f"GROUP BY t.reservation_id ORDER BY MIN(g.position) LIMIT %s",
+            [expression, limit * SEARCH_GUESTS_PER_RESERVATION, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -1,23 +1,216 @@
-from rest_framework import serializers
+import decimal
+from datetime import date, datetime
+from datetime import timedelta
+from decimal import Decimal
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from .dates import ISO_FORMAT_HINT, US_FORMAT_HINT, parse_date
 from .models import Hotel, Guest, Reservation
+from .services import HotelLookup
+from .metrics import serialization
+from .rollups import DEFAULT_STATS_NIGHTS, MAX_STATS_NIGHTS
+from .search import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT
+
+# Sort keys accepted by the hotel list endpoints. Each one is backed by an
+# index on Hotel, so sorting never needs a full sort of the table.
+HOTEL_SORT_KEYS = ['id', 'price', 'rating', 'name', 'available_until']
+HOTEL_SORT_KEYS += [f'-{key}' for key in HOTEL_SORT_KEYS]
+FIELDS_QUERY_PARAM = 'fields'
+
+class FlexibleDateField(serializers.DateField):
+    """A DateField accepting YYYY-MM-DD and MM/DD/YYYY; see dates.py."""
+
+    def to_internal_value(self, value):
+        if isinstance(value, datetime):
+            self.fail('datetime')
+        if isinstance(value, date):
+            return value
+        try:
+            return parse_date(value)
+        except (TypeError, ValueError):
+            self.fail('invalid', format=f'{ISO_FORMAT_HINT}, {US_FORMAT_HINT}')
 
 class HotelSerializer(serializers.ModelSerializer):
     class Meta:
         model = Hotel
         fields = ['id', 'name', 'rating', 'price', 'available_until', 'available']
 
+class HotelFilterSerializer(serializers.Serializer):
+    """Query parameters of the hotel list endpoints; see filters.py."""
+    min_price = serializers.IntegerField(required=False)
+    max_price = serializers.IntegerField(required=False)
+    min_rating = serializers.DecimalField(max_digits=3, decimal_places=1, required=False)
+    name_prefix = serializers.CharField(max_length=100, required=False, trim_whitespace=False)
+    available = serializers.BooleanField(required=False, allow_null=True)
+    min_available_until = FlexibleDateField(required=False)
+    max_available_until = FlexibleDateField(required=False)
+    sort = serializers.ChoiceField(choices=HOTEL_SORT_KEYS, required=False)
+
+class ReservationFilterSerializer(serializers.Serializer):
+    """Query parameters of the reservation list endpoint; see filters.py."""
+    hotel_id = serializers.IntegerField(required=False)
+    guest_name = serializers.CharField(max_length=100, required=False)
+    min_checkin = FlexibleDateField(required=False)
+    max_checkin = FlexibleDateField(required=False)
+    min_checkout = FlexibleDateField(required=False)
+    max_checkout = FlexibleDateField(required=False)
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    type = serializers.ChoiceField(choices=['all', 'hotels', 'reservations'], default='all')
+    limit = serializers.IntegerField(min_value=1, max_value=SEARCH_MAX_LIMIT, default=SEARCH_DEFAULT_LIMIT)
+
+class StatsQuerySerializer(serializers.Serializer):
+    """Query parameters of /stats/; nights from start to end, inclusive."""
+    start = FlexibleDateField(required=False)
+    end = FlexibleDateField(required=False)
+    hotel_id = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        data.setdefault('start', date.today())
+        data.setdefault('end', data['start'] + timedelta(days=DEFAULT_STATS_NIGHTS - 1))
+        nights = (data['end'] - data['start']).days + 1
+        if nights < 1:
+            raise serializers.ValidationError({'end': ['Must not be before start.']})
+        if nights > MAX_STATS_NIGHTS:
+            raise serializers.ValidationError({'end': [f'At most {MAX_STATS_NIGHTS} nights can be requested at once.']})
+        return data
+
 class GuestSerializer(serializers.ModelSerializer):
     class Meta:
         model = Guest
         fields = ['guest_name', 'gender']
+        # Existing guests are reused, not rejected (see services.intern_guests).
+        validators = []
 
 class ReservationInputSerializer(serializers.Serializer):
-    hotel_name = serializers.CharField(max_length=100)
-    checkin = serializers.DateField()
-    checkout = serializers.DateField()
+    # Either is accepted; hotel_name is kept for older clients.
+    hotel_id = serializers.IntegerField(required=False)
+    hotel_name = serializers.CharField(max_length=100, required=False)
+    checkin = FlexibleDateField()
+    checkout = FlexibleDateField()
     guests_list = GuestSerializer(many=True)
 
+    def validate(self, data):
+        if data['checkout'] <= data['checkin']:
+            raise serializers.ValidationError({'checkout': ['Must be after checkin.']})
+        # Views creating many reservations pass a shared lookup so hotels are
+        # resolved with one query for the whole request.
+        lookup = self.context.get('hotel_lookup') or HotelLookup.for_items([data])
+        data['hotel_id'], data['hotel_name'] = lookup.resolve(data.get('hotel_id'), data.get('hotel_name'))
+        return data
+
 class ReservationResponseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Reservation
-        fields = ['confirmation_number'] 
\ No newline at end of file
+        fields = ['confirmation_number'] 
+
+class FastReadSerializer:
+    """
+    Read-only serializer that renders rows fetched with ``values_list()``
+    instead of model instances.
+
+    The output is identical to ``serializer_class`` (a ModelSerializer), but
+    no model objects are built and DRF field objects are not walked per row:
+    a converter for each field is compiled once and applied to the tuples
+    straight from the database cursor.
+    """
+    serializer_class = None
+
+    _converters_cache = {}
+
+    def __init__(self, fields=None):
+        if fields is None:
+            fields = self.serializer_class.Meta.fields
+        self.fields = tuple(fields)
+        self.converters = self.get_converters(self.fields)
+
+    @classmethod
+    def get_converters(cls, fields):
+        key = (cls, fields)
+        if key not in cls._converters_cache:
+            serializer_fields = cls.serializer_class().fields
+            cls._converters_cache[key] = tuple(
+                _compile_converter(serializer_fields[name]) for name in fields
+            )
+        return cls._converters_cache[key]
+
+    @classmethod
+    def from_request(cls, request):
+        """A serializer for the fields asked for with ``?fields=``, if any."""
+        return cls(parse_fields(request, cls.serializer_class.Meta.fields))
+
+    def get_columns(self, extra=()):
+        """
+        The serialized fields, followed by any ``extra`` ones the caller needs
+        (such as pagination keys). Extra columns come last, so
+        to_representation() never sees them.
+        """
+        return self.fields + tuple(name for name in extra if name not in self.fields)
+
+    def get_rows(self, queryset, named=False, extra=()):
+        return queryset.values_list(*self.get_columns(extra), named=named)
+
+    def to_representation(self, row):
+        return {
+            name: value if convert is None or value is None else convert(value)
+            for name, convert, value in zip(self.fields, self.converters, row)
+        }
+
+    def to_representation_many(self, rows):
+        to_representation = self.to_representation
+        with serialization():
+            return [to_representation(row) for row in rows]
+
+def parse_fields(request, allowed):
+    """
+    The field names of a ``?fields=a,b`` query parameter, in the order given,
+    or all of ``allowed`` without one. Raises ValidationError for unknown
+    names.
+    """
+    value = request.GET.get(FIELDS_QUERY_PARAM)
+    if value is None:
+        return tuple(allowed)
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    if not fields:
+        raise serializers.ValidationError({FIELDS_QUERY_PARAM: ['Name at least one field.']})
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise serializers.ValidationError({FIELDS_QUERY_PARAM: [
+            f"Unknown field(s): {', '.join(unknown)}. Choose from: {', '.join(allowed)}."
+        ]})
+    return fields
+
+def _compile_converter(field):
+    """
+    Return a fast callable equivalent to ``field.to_representation`` for
+    values coming from the database, or None when the value can be used as is.
+    """
+    if isinstance(field, (serializers.IntegerField, serializers.CharField, serializers.BooleanField)):
+        return None
+
+    if isinstance(field, serializers.DateField):
+        output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+        if output_format is not None and output_format.lower() == ISO_8601:
+            return date.isoformat
+
+    if isinstance(field, serializers.DecimalField):
+        coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        if (coerce_to_string and not field.localize and not field.normalize_output
+                and field.decimal_places is not None):
+            exponent = Decimal('.1') ** field.decimal_places
+            context = decimal.getcontext().copy()
+            if field.max_digits is not None:
+                context.prec = field.max_digits
+            rounding = field.rounding
+
+            def convert_decimal(value):
+                return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+
+            return convert_decimal
+
+    return field.to_representation
+
+class HotelReadSerializer(FastReadSerializer):
+    serializer_class = HotelSerializer
@@ -0,0 +1,195 @@
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from . import cache
+from .availability import record_reservations
+from .inventory import InventoryExhausted, reserve_rooms
+from .models import Guest, Hotel, Reservation
+from .rollups import catalogue_entry, stored_catalogue_entries, update_catalogue, update_night_stats
+
+# Reservations per transaction for the multi-reservation endpoint.
+RESERVATION_BATCH_SIZE = 100
+# Upper bound on the number of reservations accepted in one request.
+RESERVATION_BULK_MAX_ITEMS = 1000
+
+
+class HotelLookup:
+    """
+    Resolves the hotel of reservation input, given as ``hotel_id`` or (for
+    older clients) ``hotel_name``, for many items with a single query.
+    """
+
+    def __init__(self, hotels):
+        self.names_by_id = {}
+        self.ids_by_name = {}
+        for hotel_id, name in hotels:
+            self.names_by_id[hotel_id] = name
+            self.ids_by_name.setdefault(name, []).append(hotel_id)
+
+    @classmethod
+    def for_items(cls, items):
+        hotel_ids = set()
+        hotel_names = set()
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                hotel_ids.add(int(item['hotel_id']))
+            except (KeyError, TypeError, ValueError):
+                pass
+            if isinstance(item.get('hotel_name'), str):
+                hotel_names.add(item['hotel_name'])
+        if not hotel_ids and not hotel_names:
+            return cls([])
+        hotels = Hotel.objects.filter(Q(id__in=hotel_ids) | Q(name__in=hotel_names)).values_list('id', 'name')
+        return cls(hotels)
+
+    def resolve(self, hotel_id=None, hotel_name=None):
+        """Return (hotel_id, hotel_name) or raise ValidationError."""
+        if hotel_id is not None:
+            name = self.names_by_id.get(hotel_id)
+            if name is None:
+                raise ValidationError({'hotel_id': ['Hotel not found.']})
+            if hotel_name is not None and hotel_name != name:
+                raise ValidationError({'hotel_name': ['Does not match the name of hotel_id.']})
+            return hotel_id, name
+
+        if hotel_name is None:
+            raise ValidationError({'hotel_name': ['Either hotel_id or hotel_name is required.']})
+        hotel_ids = self.ids_by_name.get(hotel_name, [])
+        if not hotel_ids:
+            raise ValidationError({'hotel_name': ['Hotel not found.']})
+        if len(hotel_ids) > 1:
+            raise ValidationError({'hotel_name': ['Several hotels have this name; use hotel_id instead.']})
+        return hotel_ids[0], hotel_name
+
+
+def _new_reservation(item):
+    reservation = Reservation(
+        hotel_id=item['hotel_id'],
+        hotel_name=item['hotel_name'],
+        checkin=item['checkin'],
+        checkout=item['checkout'],
+    )
+    # Group commit hands out the confirmation number before the row exists.
+    if 'confirmation_number' in item:
+        reservation.confirmation_number = item['confirmation_number']
+    return reservation
+
+
+def intern_guests(identities):
+    """
+    Return the id of the Guest row for each (guest_name, gender) in
+    ``identities``, inserting the ones not seen before. Guests are stored
+    once and shared by all of their reservations, so a returning guest
+    costs a link row rather than a new Guest.
+
+    Takes two queries however many guests there are. Must be called inside
+    a transaction.
+    """
+    identities = set(identities)
+    if not identities:
+        return {}
+    # Conflicts are guests that already exist, possibly inserted by a
+    # concurrent booking; either way the select below finds them.
+    Guest.objects.bulk_create(
+        [Guest(guest_name=name, gender=gender) for name, gender in identities],
+        ignore_conflicts=True,
+    )
+    rows = Guest.objects.filter(guest_name__in={name for name, _ in identities}).values_list(
+        'id', 'guest_name', 'gender')
+    return {(name, gender): guest_id for guest_id, name, gender in rows if (name, gender) in identities}
+
+
+def create_reservations(items):
+    """
+    Create reservations and their guests from validated
+    ``ReservationInputSerializer`` data using a constant number of queries:
+    one bulk insert for the reservations, two to intern the guests (see
+    intern_guests), one for the M2M through rows and two for the occupancy
+    rollup (see rollups.py).
+
+    Claims the rooms first (see inventory.py) and raises InventoryExhausted
+    if some night is full. Must be called inside a transaction.
+    """
+    reserve_rooms((item['hotel_id'], item['checkin'], item['checkout']) for item in items)
+    reservations = Reservation.objects.bulk_create([_new_reservation(item) for item in items])
+
+    guest_lists = [
+        [(guest_data['guest_name'], guest_data['gender']) for guest_data in item['guests_list']]
+        for item in items
+    ]
+    guest_ids = intern_guests(identity for guests in guest_lists for identity in guests)
+
+    # The same guest listed twice is linked once.
+    linked_guests = [list(dict.fromkeys(guest_ids[identity] for identity in guests)) for guests in guest_lists]
+    Through = Reservation.guests.through
+    Through.objects.bulk_create([
+        Through(reservation_id=reservation.pk, guest_id=guest_id)
+        for reservation, guests in zip(reservations, linked_guests)
+        for guest_id in guests
+    ])
+
+    # bulk_create() doesn't send post_save, so update the rollups, the index
+    # and the response cache ourselves.
+    update_night_stats(
+        (reservation.hotel_id, reservation.checkin, reservation.checkout, 1, len(guests))
+        for reservation, guests in zip(reservations, linked_guests)
+    )
+    record_reservations(reservations)
+    cache.bump_version_on_commit(cache.RESERVATIONS)
+    return reservations
+
+
+def create_reservation(item):
+    with transaction.atomic():
+        return create_reservations([item])[0]
+
+
+def create_reservations_in_batches(items, batch_size=RESERVATION_BATCH_SIZE):
+    """
+    Commit ``items`` in batches of ``batch_size``, one transaction per batch.
+
+    Returns a list with, for every item, either the created Reservation or
+    the exception that kept it from being saved. A batch that fails is
+    retried one item at a time, so a full hotel only rejects its own
+    bookings.
+    """
+    results = []
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        try:
+            with transaction.atomic():
+                results.extend(create_reservations(batch))
+        except (DatabaseError, InventoryExhausted) as e:
+            if len(batch) == 1:
+                results.append(e)
+            else:
+                results.extend(create_reservations_in_batches(batch, batch_size=1))
+    return results
+
+
+def upsert_hotels(hotels, catalogue=True):
+    """
+    Insert ``hotels`` (unsaved Hotel instances), replacing every field of the
+    existing rows with the same id, in one statement per database batch.
+
+    The catalogue buckets (see rollups.py) are updated with what changed,
+    which takes a query for the stored rows first. Pass ``catalogue=False``
+    to skip that when refresh_catalogue() is run afterwards, as
+    importers.import_hotels does.
+
+    Must be called inside a transaction.
+    """
+    if catalogue:
+        before = stored_catalogue_entries([hotel.pk for hotel in hotels])
+    update_fields = [field.name for field in Hotel._meta.concrete_fields if not field.primary_key]
+    Hotel.objects.bulk_create(hotels, update_conflicts=True, unique_fields=['id'], update_fields=update_fields)
+    # bulk_create() doesn't send post_save.
+    if catalogue:
+        update_catalogue(
+            [(*entry, -1) for entry in before.values()] + [(*catalogue_entry(hotel), 1) for hotel in hotels]
+        )
+    cache.bump_version_on_commit(cache.HOTELS)
+    return hotels
@@ -0,0 +1,118 @@
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import cache
+from .availability import availability_index
+from .inventory import release_rooms
+from .metrics import install_db_wrapper
+from .rollups import (
+    CATALOGUE_FIELDS, catalogue_entry, stored_catalogue_entries, update_catalogue, update_night_stats,
+)
+from .search import ensure_search_triggers
+from .models import Hotel, Reservation
+
+
+def _changes_catalogue(update_fields):
+    return update_fields is None or not update_fields.isdisjoint(CATALOGUE_FIELDS)
+
+
+@receiver(pre_save, sender=Hotel)
+def hotel_saving(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+    if not raw and _changes_catalogue(update_fields):
+        # What the catalogue counts the hotel as until it is saved.
+        instance._catalogue_before = stored_catalogue_entries([instance.pk], using).get(instance.pk)
+
+
+@receiver(post_save, sender=Hotel)
+def hotel_saved(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+    if raw or not _changes_catalogue(update_fields):
+        return
+    before = instance.__dict__.pop('_catalogue_before', None)
+    changes = [(*before, -1)] if before else []
+    update_catalogue(changes + [(*catalogue_entry(instance), 1)], using)
+
+
+@receiver(pre_delete, sender=Hotel)
+def hotel_deleting(sender, instance, using=None, **kwargs):
+    # The stored values: the instance may have been changed since it was read.
+    before = stored_catalogue_entries([instance.pk], using).get(instance.pk)
+    if before:
+        update_catalogue([(*before, -1)], using)
+
+
+@receiver(post_save, sender=Hotel)
+@receiver(post_delete, sender=Hotel)
+def hotel_changed(sender, raw=False, **kwargs):
+    if not raw:
+        cache.bump_version_on_commit(cache.HOTELS)
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    cache.bump_version_on_commit(cache.RESERVATIONS)
+    if created:
+        # Guests are added afterwards; see guests_changed(). The rooms, and
+        # with them the availability index, are only taken by
+        # services.create_reservations().
+        update_night_stats([(instance.hotel_id, instance.checkin, instance.checkout, 1, 0)])
+    else:
+        # The previous dates are unknown here; rebuild on next use.
+        transaction.on_commit(availability_index.reset, robust=True)
+
+
+@receiver(pre_delete, sender=Reservation)
+def reservation_deleting(sender, instance, **kwargs):
+    if instance.hotel_id is None:
+        return
+    # Before the guest links are deleted with it.
+    guests = Reservation.guests.through.objects.filter(reservation_id=instance.pk).count()
+    update_night_stats([(instance.hotel_id, instance.checkin, instance.checkout, -1, -guests)])
+
+
+@receiver(m2m_changed, sender=Reservation.guests.through)
+def guests_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep the guest counts of the rollup in step with the guest links."""
+    if action == 'post_add':
+        # Only the links that were actually added.
+        sign, linked = 1, pk_set
+    elif action in ('pre_remove', 'pre_clear'):
+        # The links that exist, before they go.
+        links = sender.objects.filter(**{'guest_id' if reverse else 'reservation_id': instance.pk})
+        if pk_set is not None:
+            links = links.filter(**{'reservation_id__in' if reverse else 'guest_id__in': pk_set})
+        sign, linked = -1, set(links.values_list('reservation_id' if reverse else 'guest_id', flat=True))
+    else:
+        return
+    if not linked:
+        return
+    if reverse:
+        stays = Reservation.objects.filter(pk__in=linked).values_list('hotel_id', 'checkin', 'checkout')
+        update_night_stats((*stay, 0, sign) for stay in stays)
+    else:
+        update_night_stats([(instance.hotel_id, instance.checkin, instance.checkout, 0, sign * len(linked))])
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted(sender, instance, **kwargs):
+    cache.bump_version_on_commit(cache.RESERVATIONS)
+    if instance.hotel_id is None:
+        return
+    stay = (instance.hotel_id, instance.checkin, instance.checkout)
+    # In the deleting transaction, so the rooms come back only if it commits.
+    release_rooms([stay])
+    transaction.on_commit(lambda: availability_index.remove(*stay), robust=True)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    install_db_wrapper(connection)
+
+
+@receiver(post_migrate)
+def migrated(sender, using, **kwargs):
+    if sender.name == 'hotelapi':
+        ensure_search_triggers(connections[using])
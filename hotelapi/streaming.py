@@ -0,0 +1,133 @@
+from itertools import chain
+
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+
+from .fastjson import dumps
+
+STREAM_QUERY_PARAM = 'stream'
+STREAM_CHUNK_SIZE = 2000
+# Rows are buffered into chunks of roughly this many bytes before being
+# handed to the server, so we don't pay a write per row.
+STREAM_BUFFER_SIZE = 64 * 1024
+
+STREAM_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class _ChunkWriter:
+    """
+    Encodes items one at a time and hands back byte chunks of about
+    STREAM_BUFFER_SIZE. A JSON array is written as '[' item (',' item)* ']';
+    NDJSON as (item '\\n')*.
+    """
+
+    def __init__(self, stream_format):
+        self.array = stream_format == 'json'
+        self.buffer = [b'['] if self.array else []
+        self.size = len(self.buffer)
+        self.separator = b''
+
+    def write(self, item):
+        if self.array:
+            encoded = self.separator + dumps(item)
+            self.separator = b','
+        else:
+            encoded = dumps(item) + b'\n'
+        self.buffer.append(encoded)
+        self.size += len(encoded)
+        if self.size >= STREAM_BUFFER_SIZE:
+            return self.flush()
+        return None
+
+    def flush(self):
+        chunk = b''.join(self.buffer)
+        self.buffer = []
+        self.size = 0
+        return chunk
+
+    def close(self):
+        if self.array:
+            self.buffer.append(b']')
+        return self.flush()
+
+
+def iter_chunks(rows, serialize, stream_format):
+    """
+    Yield the encoded ``serialize(row)`` items as byte chunks without ever
+    holding the whole response in memory.
+    """
+    writer = _ChunkWriter(stream_format)
+    for row in rows:
+        chunk = writer.write(serialize(row))
+        if chunk:
+            yield chunk
+    chunk = writer.close()
+    if chunk:
+        yield chunk
+
+
+async def aiter_chunks(rows, serialize, stream_format):
+    """Async variant of iter_chunks() for ``async for`` row sources."""
+    writer = _ChunkWriter(stream_format)
+    async for row in rows:
+        chunk = writer.write(serialize(row))
+        if chunk:
+            yield chunk
+    chunk = writer.close()
+    if chunk:
+        yield chunk
+
+
+def get_stream_format(request):
+    stream_format = request.GET.get(STREAM_QUERY_PARAM)
+    if stream_format is None:
+        return None
+    if stream_format not in STREAM_FORMATS:
+        raise ValidationError({
+            STREAM_QUERY_PARAM: f"Unsupported stream format. Use one of: {', '.join(STREAM_FORMATS)}."
+        })
+    return stream_format
+
+
+def _querysets(queryset):
+    return queryset if isinstance(queryset, (list, tuple)) else [queryset]
+
+
+async def _aiterate(querysets, chunk_size):
+    for queryset in querysets:
+        async for row in queryset.aiterator(chunk_size=chunk_size):
+            yield row
+
+
+def streaming_response(request, queryset, serialize, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Return a StreamingHttpResponse for ``queryset`` (or a list of them, sent
+    one after the other) when the client asked for ``?stream=json`` or
+    ``?stream=ndjson``, otherwise None.
+
+    Rows are read with ``QuerySet.iterator()`` so the first bytes go out
+    before the last row is fetched and memory stays flat.
+    """
+    stream_format = get_stream_format(request)
+    if stream_format is None:
+        return None
+
+    rows = chain.from_iterable(queryset.iterator(chunk_size=chunk_size) for queryset in _querysets(queryset))
+    content = iter_chunks(rows, serialize, stream_format)
+    return StreamingHttpResponse(content, content_type=STREAM_FORMATS[stream_format])
+
+
+def async_streaming_response(request, queryset, serialize, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Like streaming_response(), but reads rows with ``QuerySet.aiterator()``
+    so ASGI servers can stream without buffering the whole body.
+    """
+    stream_format = get_stream_format(request)
+    if stream_format is None:
+        return None
+
+    content = aiter_chunks(_aiterate(_querysets(queryset), chunk_size), serialize, stream_format)
+    return StreamingHttpResponse(content, content_type=STREAM_FORMATS[stream_format])
@@ -1,16 +1,54 @@
-from django.test import TestCase
-from django.urls import reverse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.db import connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
 from rest_framework.test import APIClient
 from rest_framework import status
+import gzip
+import importlib
+import io
 import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import zlib
 from datetime import datetime, date, timedelta
-from .models import Hotel, Guest, Reservation
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from testproj import urls as project_urls
+from .models import ArchivedReservation, CatalogueBucket, Hotel, Guest, HotelInventory, HotelNightStats, Reservation
+from .serializers import HOTEL_SORT_KEYS, HotelSerializer, HotelReadSerializer
+from .availability import IntervalIndex, availability_index, available_hotel_rows, response_max_age
+from .metrics import registry
+from .importers import HotelRowValidator
+from .filters import filter_hotels, filter_reservations
+from .services import upsert_hotels
+from .inventory import rebuild_inventory
+from .rollups import rebuild_rollups, refresh_catalogue
+from .archive import archive_batch
+from .dates import parse_date
+from .negotiation import msgpack
+from . import admission, cache as response_cache, compression, datasets, fastjson, group_commit
+from .management.commands.bench import Scenarios, api_url_names
 
 # Create your tests here.
 class HotelAPITestCase(TestCase):
     def setUp(self):
         # Set up test client
         self.client = APIClient()
+        cache.clear()
         
         # Create test hotels
         self.hotel1 = Hotel.objects.create(
@@ -233,3 +271,2422 @@ class HotelAPITestCase(TestCase):
         )
         
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reservation_confirmation_rejects_empty_stays(self):
+        """Test reservationConfirmation rejects a checkout on or before checkin"""
+        url = reverse('reservationConfirmation')
+        checkin = date.today() + timedelta(days=3)
+
+        for checkout in (checkin, checkin - timedelta(days=1)):
+            response = self.client.post(
+                url,
+                data=json.dumps({
+                    "hotel_name": "Test Hotel 1",
+                    "checkin": checkin.isoformat(),
+                    "checkout": checkout.isoformat(),
+                    "guests_list": [{"guest_name": "Test User", "gender": "Male"}]
+                }),
+                content_type='application/json'
+            )
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.json(), {'checkout': ['Must be after checkin.']})
+        self.assertFalse(Reservation.objects.exists())
+
+
+class ListPaginationStreamingTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+        Hotel.objects.bulk_create([
+            Hotel(
+                id=i,
+                name=f"Hotel {i}",
+                rating=4.0,
+                price=100 + i,
+                available_until=date.today() + timedelta(days=30),
+                available=True
+            )
+            for i in range(1, 8)
+        ])
+
+        for i in range(5):
+            reservation = Reservation.objects.create(
+                hotel_name="Hotel 1",
+                checkin=date.today() + timedelta(days=i),
+                checkout=date.today() + timedelta(days=i + 2),
+            )
+            reservation.guests.add(Guest.objects.create(guest_name=f"Guest {i}", gender="Female"))
+
+    def _walk_pages(self, url, limit):
+        pages = []
+        response = self.client.get(url, {'limit': limit})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            body = response.json()
+            pages.append(body['results'])
+            if body['next'] is None:
+                return pages
+            response = self.client.get(url, {'limit': limit, 'cursor': body['next']})
+
+    def test_hotels_list_keyset_pagination(self):
+        """Test Hotels_list pages through every hotel exactly once using next cursors"""
+        pages = self._walk_pages(reverse('hotelList'), 3)
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        hotel_ids = [hotel['id'] for page in pages for hotel in page]
+        self.assertEqual(hotel_ids, list(range(1, 8)))
+
+    def test_generics_list_keyset_pagination(self):
+        """Test get_generics_list uses the same cursor pagination"""
+        pages = self._walk_pages(reverse('genericsList'), 4)
+
+        hotel_ids = [hotel['id'] for page in pages for hotel in page]
+        self.assertEqual(hotel_ids, list(range(1, 8)))
+
+    def test_reservation_list_keyset_pagination(self):
+        """Test reservation_list paginates on confirmation_number"""
+        pages = self._walk_pages(reverse('reservationList'), 2)
+
+        numbers = [reservation['confirmation_number'] for page in pages for reservation in page]
+        self.assertEqual(numbers, [str(n) for n in sorted(Reservation.objects.values_list('confirmation_number', flat=True))])
+        self.assertEqual(len(pages[0][0]['guests']), 1)
+
+    def test_unpaginated_list_is_unchanged(self):
+        """Test the list endpoints still return a plain array without limit/cursor"""
+        response = self.client.get(reverse('hotelList'))
+
+        self.assertIsInstance(response.json(), list)
+        self.assertEqual(len(response.json()), 7)
+
+    def test_invalid_cursor_and_limit(self):
+        """Test malformed pagination parameters are rejected"""
+        url = reverse('hotelList')
+
+        self.assertEqual(self.client.get(url, {'cursor': 'not-a-cursor'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'limit': 'abc'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'limit': 0}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stream_json_array(self):
+        """Test ?stream=json returns the same array as the unpaginated response"""
+        url = reverse('hotelList')
+        response = self.client.get(url, {'stream': 'json'})
+
+        self.assertTrue(response.streaming)
+        streamed = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(streamed, self.client.get(url).json())
+
+    def test_stream_ndjson(self):
+        """Test ?stream=ndjson returns one JSON document per line"""
+        for name in ('genericsList', 'reservationList'):
+            response = self.client.get(reverse(name), {'stream': 'ndjson'})
+
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            lines = b''.join(response.streaming_content).decode().splitlines()
+            self.assertEqual(len(lines), 7 if name == 'genericsList' else 5)
+            self.assertIn('confirmation_number' if name == 'reservationList' else 'name', json.loads(lines[0]))
+
+    def test_stream_unknown_format(self):
+        """Test an unsupported stream format is rejected"""
+        response = self.client.get(reverse('hotelList'), {'stream': 'xml'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class HotelReadSerializerTestCase(TestCase):
+    def setUp(self):
+        Hotel.objects.bulk_create([
+            Hotel(id=1, name="Plain", rating=4.5, price=150,
+                  available_until=date(2025, 1, 31), available=True),
+            Hotel(id=2, name="Zero rating", rating=0, price=0,
+                  available_until=date(2030, 12, 1), available=False),
+            Hotel(id=3, name="Unknown availability", rating=5.0, price=99,
+                  available_until=date(2024, 2, 29), available=None),
+            Hotel(id=4, name="H\u00f4tel \u00e9t\u00e9 \"quoted\"", rating=9.9, price=1,
+                  available_until=date(2026, 6, 15), available=True),
+        ])
+
+    def test_matches_model_serializer(self):
+        """Test HotelReadSerializer produces exactly the same data as HotelSerializer"""
+        hotels = Hotel.objects.order_by('id')
+        read_serializer = HotelReadSerializer()
+
+        expected = HotelSerializer(hotels, many=True).data
+        actual = read_serializer.to_representation_many(read_serializer.get_rows(hotels))
+
+        self.assertEqual(json.dumps(actual), json.dumps(expected))
+
+    def test_named_rows_and_field_subset(self):
+        """Test named rows and a subset of fields are serialized like the full serializer"""
+        hotels = Hotel.objects.order_by('id')
+        read_serializer = HotelReadSerializer(fields=['id', 'rating'])
+
+        actual = read_serializer.to_representation_many(read_serializer.get_rows(hotels, named=True))
+        expected = [
+            {'id': hotel['id'], 'rating': hotel['rating']}
+            for hotel in HotelSerializer(hotels, many=True).data
+        ]
+        self.assertEqual(actual, expected)
+
+    def test_views_match_model_serializer(self):
+        """Test the hotel read endpoints return the same JSON as the ModelSerializer"""
+        cache.clear()
+        client = APIClient()
+        expected = json.loads(json.dumps(HotelSerializer(Hotel.objects.order_by('id'), many=True).data))
+
+        self.assertEqual(client.get(reverse('hotelList')).json(), expected)
+        self.assertEqual(client.get(reverse('genericsList')).json(), expected)
+        self.assertEqual(client.get(reverse('hotelDetail', args=[3])).json(), expected[2])
+
+
+class ReservationBulkWriteTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        Hotel.objects.bulk_create([
+            Hotel(id=i + 1, name=name, rating=4.0, price=100,
+                  available_until=date.today() + timedelta(days=30), available=True)
+            for i, name in enumerate(["Test Hotel 1"] + [f"Hotel {i}" for i in range(5)])
+        ])
+
+    def _reservation(self, guests=1, **overrides):
+        data = {
+            "hotel_name": "Test Hotel 1",
+            "checkin": (date.today() + timedelta(days=1)).isoformat(),
+            "checkout": (date.today() + timedelta(days=3)).isoformat(),
+            "guests_list": [
+                {"guest_name": f"Guest {i}", "gender": "Female"}
+                for i in range(guests)
+            ]
+        }
+        data.update(overrides)
+        return data
+
+    def _post(self, url_name, data):
+        return self.client.post(reverse(url_name), data=json.dumps(data), content_type='application/json')
+
+    def test_group_booking_uses_constant_queries(self):
+        """Test reservationConfirmation does not issue queries per guest"""
+        # hotel lookup + savepoint + inventory insert and update +
+        # reservation insert + guest insert and select + through-table
+        # insert + rollup insert and update + release
+        with self.assertNumQueries(11):
+            response = self._post('reservationConfirmation', self._reservation(guests=2))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with self.assertNumQueries(11):
+            response = self._post('reservationConfirmation', self._reservation(guests=25))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        reservation = Reservation.objects.get(confirmation_number=response.json()['confirmation_number'])
+        self.assertEqual(reservation.guests.count(), 25)
+
+    def test_returning_guests_are_stored_once(self):
+        """Test guests already on file are reused instead of inserted again"""
+        ann = {"guest_name": "Ann", "gender": "Female"}
+        for guests_list in ([ann], [ann, {"guest_name": "Bo", "gender": "Male"}], [ann, ann]):
+            response = self._post('reservationConfirmation', dict(self._reservation(), guests_list=guests_list))
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(sorted(Guest.objects.values_list('guest_name', flat=True)), ["Ann", "Bo"])
+        self.assertEqual(
+            [reservation.guests.count() for reservation in Reservation.objects.order_by('id')], [1, 2, 1])
+
+    def test_bulk_reservations(self):
+        """Test the multi-reservation endpoint creates every reservation with its guests"""
+        items = [self._reservation(guests=i + 1, hotel_name=f"Hotel {i}") for i in range(5)]
+        response = self._post('bulkReservationConfirmation', items)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        results = response.json()['results']
+        self.assertEqual(len(results), 5)
+        for i, result in enumerate(results):
+            reservation = Reservation.objects.get(confirmation_number=result['confirmation_number'])
+            self.assertEqual(reservation.hotel_name, f"Hotel {i}")
+            self.assertEqual(reservation.guests.count(), i + 1)
+
+    def test_bulk_reservations_partial_errors(self):
+        """Test invalid items are reported per item without blocking valid ones"""
+        tomorrow = (date.today() + timedelta(days=1)).strftime('%m/%d/%Y')
+        items = [
+            self._reservation(),
+            self._reservation(checkin="invalid-date"),
+            self._reservation(checkin="13/45/2025"),
+            "not a reservation",
+            self._reservation(checkin=tomorrow),
+        ]
+        response = self._post('bulkReservationConfirmation', items)
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        results = response.json()['results']
+        self.assertIn('confirmation_number', results[0])
+        self.assertIn('checkin', results[1]['errors'])
+        self.assertIn('errors', results[2])
+        self.assertIn('errors', results[3])
+        self.assertIn('confirmation_number', results[4])
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_bulk_reservations_rejects_non_list(self):
+        """Test the multi-reservation endpoint requires a list"""
+        response = self._post('bulkReservationConfirmation', self._reservation())
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(INVENTORY_DEFAULT_CAPACITY=2)
+class HotelInventoryTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        Hotel.objects.bulk_create([
+            Hotel(id=i, name=f"Hotel {i}", rating=4.0, price=100,
+                  available_until=date.today() + timedelta(days=30), available=True)
+            for i in (1, 2)
+        ])
+        self.checkin = date.today() + timedelta(days=1)
+
+    def _reservation(self, hotel_id=1, nights=2, offset=0):
+        checkin = self.checkin + timedelta(days=offset)
+        return {
+            "hotel_id": hotel_id,
+            "checkin": checkin.isoformat(),
+            "checkout": (checkin + timedelta(days=nights)).isoformat(),
+            "guests_list": [{"guest_name": "Ann", "gender": "Female"}],
+        }
+
+    def _post(self, url_name, data):
+        return self.client.post(reverse(url_name), data=json.dumps(data), content_type='application/json')
+
+    def _remaining(self, hotel_id=1):
+        return dict(HotelInventory.objects.filter(hotel_id=hotel_id).values_list('night', 'remaining'))
+
+    def test_booking_is_rejected_when_a_night_is_full(self):
+        """Test a stay is refused with a 409 once any of its nights has no rooms left"""
+        for _ in range(2):
+            self.assertEqual(self._post('reservationConfirmation', self._reservation()).status_code,
+                             status.HTTP_201_CREATED)
+
+        # Overlaps the second night only.
+        response = self._post('reservationConfirmation', self._reservation(offset=1))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.json(), {'error': 'No rooms left at this hotel for the requested dates'})
+
+        # The rejected booking took nothing, not even the free third night.
+        self.assertEqual(Reservation.objects.count(), 2)
+        self.assertEqual(Reservation.guests.through.objects.count(), 2)
+        self.assertEqual(self._remaining(), {self.checkin: 0, self.checkin + timedelta(days=1): 0})
+        self.assertEqual(self._post('reservationConfirmation', self._reservation(offset=2)).status_code,
+                         status.HTTP_201_CREATED)
+        self.assertEqual(self._post('reservationConfirmation', self._reservation(hotel_id=2)).status_code,
+                         status.HTTP_201_CREATED)
+
+    def test_bulk_rejects_only_sold_out_items(self):
+        """Test sold-out items of a bulk request fail on their own"""
+        items = [self._reservation(), self._reservation(hotel_id=2), self._reservation(), self._reservation()]
+        response = self._post('bulkReservationConfirmation', items)
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        results = response.json()['results']
+        self.assertEqual(['confirmation_number' in result for result in results], [True, True, True, False])
+        self.assertIn('No rooms left', results[3]['errors']['error'])
+        self.assertEqual(Reservation.objects.count(), 3)
+
+    def test_cancelling_releases_rooms(self):
+        """Test deleting a reservation gives its nights back"""
+        self._post('reservationConfirmation', self._reservation())
+        self._post('reservationConfirmation', self._reservation())
+
+        Reservation.objects.first().delete()
+
+        self.assertEqual(self._remaining(), {self.checkin: 1, self.checkin + timedelta(days=1): 1})
+        self.assertEqual(self._post('reservationConfirmation', self._reservation()).status_code,
+                         status.HTTP_201_CREATED)
+
+    def test_deleting_reservations_that_took_no_room_stays_within_capacity(self):
+        """Test ORM-created reservations on a booked night give back no more than its capacity"""
+        availability_index.reset()
+        self.addCleanup(availability_index.reset)
+        self._post('reservationConfirmation', self._reservation(nights=1))
+        # Created without reserve_rooms(): they took no room.
+        unbooked = [
+            Reservation.objects.create(hotel_id=1, hotel_name="Hotel 1", checkin=self.checkin,
+                                       checkout=self.checkin + timedelta(days=1))
+            for _ in range(2)
+        ]
+        availability_index.get_hotels()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for reservation in unbooked:
+                reservation.delete()
+
+        self.assertEqual(self._remaining(), {self.checkin: 2})
+        self.assertEqual(availability_index.get_hotels()[1].remaining, {self.checkin: 2})
+
+    def test_rebuild_inventory(self):
+        """Test rebuilding recounts rooms from reservations, keeping capacities and flagging overbooking"""
+        self._post('reservationConfirmation', self._reservation(nights=1))
+        HotelInventory.objects.update(capacity=5, remaining=5)
+        # Bulk inserts bypass the inventory.
+        Reservation.objects.bulk_create([
+            Reservation(hotel_id=2, hotel_name="Hotel 2", checkin=self.checkin, checkout=self.checkin + timedelta(days=1))
+            for _ in range(3)
+        ])
+
+        self.assertEqual(rebuild_inventory(), {'nights': 2, 'overbooked': 1})
+        self.assertEqual(self._remaining(1), {self.checkin: 4})
+        self.assertEqual(self._remaining(2), {self.checkin: 0})
+
+
+class RollupTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        Hotel.objects.bulk_create([
+            Hotel(id=1, name="Hotel 1", rating=Decimal('4.5'), price=120,
+                  available_until=date.today() + timedelta(days=60), available=True),
+            Hotel(id=2, name="Hotel 2", rating=Decimal('3.0'), price=180,
+                  available_until=date.today() + timedelta(days=60), available=True),
+            Hotel(id=3, name="Hotel 3", rating=Decimal('4.0'), price=90,
+                  available_until=date.today() + timedelta(days=60), available=None),
+        ])
+        refresh_catalogue()
+        self.checkin = date.today() + timedelta(days=1)
+
+    def _reservation(self, hotel_id=1, nights=2, guests=1):
+        return {
+            "hotel_id": hotel_id,
+            "checkin": self.checkin.isoformat(),
+            "checkout": (self.checkin + timedelta(days=nights)).isoformat(),
+            "guests_list": [{"guest_name": f"Guest {i}", "gender": "Female"} for i in range(guests)],
+        }
+
+    def _post(self, url_name, data):
+        return self.client.post(reverse(url_name), data=json.dumps(data), content_type='application/json')
+
+    def _night_stats(self):
+        return set(HotelNightStats.objects.filter(rooms__gt=0).values_list('hotel_id', 'night', 'rooms', 'guests'))
+
+    def assertRollupsMatchRebuild(self):
+        incremental = self._night_stats()
+        rebuild_rollups(batch_size=2)
+        self.assertEqual(incremental, self._night_stats())
+
+    def _buckets(self):
+        return set(CatalogueBucket.objects.values_list('dimension', 'bucket', 'hotels', 'price_total', 'rating_total'))
+
+    def assertCatalogueMatchesRefresh(self):
+        incremental = self._buckets()
+        refresh_catalogue()
+        self.assertEqual(incremental, self._buckets())
+
+    def test_bookings_update_rollups(self):
+        """Test single and bulk bookings add their rooms and guests to every night of the stay"""
+        self._post('reservationConfirmation', self._reservation(guests=2))
+        self._post('bulkReservationConfirmation', [self._reservation(nights=1, guests=3), self._reservation(hotel_id=2)])
+
+        second_night = self.checkin + timedelta(days=1)
+        self.assertEqual(self._night_stats(), {
+            (1, self.checkin, 2, 5), (1, second_night, 1, 2),
+            (2, self.checkin, 1, 1), (2, second_night, 1, 1),
+        })
+        self.assertRollupsMatchRebuild()
+
+    def test_signals_keep_rollups_in_step(self):
+        """Test saves, guest changes and deletes outside the services keep the rollup exact"""
+        ann, bo, cy = [Guest.objects.create(guest_name=name, gender="Female") for name in ('Ann', 'Bo', 'Cy')]
+        first = Reservation.objects.create(hotel_id=1, hotel_name="", checkin=self.checkin,
+                                           checkout=self.checkin + timedelta(days=3))
+        second = Reservation.objects.create(hotel_id=2, hotel_name="", checkin=self.checkin,
+                                            checkout=self.checkin + timedelta(days=1))
+        first.guests.add(ann, bo)
+        first.guests.add(ann)
+        cy.reservation_set.add(first, second)
+        self.assertRollupsMatchRebuild()
+
+        first.guests.remove(bo, Guest.objects.create(guest_name="Dee", gender="Male"))
+        self.assertRollupsMatchRebuild()
+        ann.reservation_set.clear()
+        self.assertRollupsMatchRebuild()
+        second.guests.clear()
+        self.assertRollupsMatchRebuild()
+        first.delete()
+        self.assertEqual(self._night_stats(), {(2, self.checkin, 1, 0)})
+        self.assertRollupsMatchRebuild()
+
+    def test_stats_reads_only_rollups(self):
+        """Test /stats/ answers from the rollup tables in two queries"""
+        self._post('bulkReservationConfirmation', [self._reservation(guests=2), self._reservation(hotel_id=2)])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('stats'), {'start': date.today().isoformat(), 'end': self.checkin.isoformat()})
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any('hotelapi_reservation' in query['sql'] for query in queries.captured_queries))
+        self.assertFalse(any('"hotelapi_hotel"' in query['sql'] for query in queries.captured_queries))
+
+        body = response.json()
+        self.assertEqual(body['occupancy']['nights'], [
+            {'night': date.today().isoformat(), 'rooms': 0, 'guests': 0, 'hotels': 0},
+            {'night': self.checkin.isoformat(), 'rooms': 2, 'guests': 3, 'hotels': 2},
+        ])
+        self.assertEqual(body['occupancy']['room_nights'], 2)
+        self.assertEqual(body['occupancy']['average_guests_per_room'], 1.5)
+        self.assertEqual(body['catalogue'], {
+            'hotels': 3,
+            'average_price': 130.0,
+            'average_rating': 3.83,
+            'availability': {'true': 2, 'false': 0, 'null': 1},
+            'price_histogram': [
+                {'min_price': 50, 'max_price': 99, 'hotels': 1, 'average_rating': 4.0},
+                {'min_price': 100, 'max_price': 149, 'hotels': 1, 'average_rating': 4.5},
+                {'min_price': 150, 'max_price': 199, 'hotels': 1, 'average_rating': 3.0},
+            ],
+            'rating_histogram': [
+                {'stars': 3, 'hotels': 1, 'average_price': 180.0},
+                {'stars': 4, 'hotels': 2, 'average_price': 105.0},
+            ],
+        })
+
+        body = self.client.get(reverse('stats'), {'hotel_id': 2}).json()
+        self.assertEqual(len(body['occupancy']['nights']), 30)
+        self.assertEqual(body['occupancy']['room_nights'], 2)
+
+    def test_hotel_writes_update_the_catalogue(self):
+        """Test hotel writes move the hotel between buckets in their own transaction"""
+        self._post('hotelList', {"id": 4, "name": "Hotel 4", "rating": 2.0, "price": 610,
+                                 "available_until": date.today().isoformat(), "available": False})
+        catalogue = self.client.get(reverse('stats')).json()['catalogue']
+        self.assertEqual(catalogue['hotels'], 4)
+        self.assertEqual(catalogue['availability']['false'], 1)
+        self.assertEqual(catalogue['price_histogram'][-1]['min_price'], 600)
+        self.assertCatalogueMatchesRefresh()
+
+        with transaction.atomic():
+            upsert_hotels([Hotel(id=4, name="Hotel 4", rating=Decimal('5.0'), price=10,
+                                 available_until=date.today(), available=True)])
+        catalogue = self.client.get(reverse('stats')).json()['catalogue']
+        self.assertEqual(catalogue['availability'], {'true': 3, 'false': 0, 'null': 1})
+        self.assertEqual(catalogue['rating_histogram'][-1], {'stars': 5, 'hotels': 1, 'average_price': 10.0})
+        self.assertNotIn(600, [band['min_price'] for band in catalogue['price_histogram']])
+        self.assertCatalogueMatchesRefresh()
+
+    def test_hotel_signals_keep_the_catalogue_in_step(self):
+        """Test saves, partial saves and deletes outside the services keep the buckets exact"""
+        hotel = Hotel.objects.get(id=1)
+        hotel.price, hotel.rating = 130, 4.9
+        hotel.save()
+        self.assertCatalogueMatchesRefresh()
+
+        hotel.available = False
+        hotel.save(update_fields=['available'])
+        hotel.name = "Renamed"
+        with self.assertNumQueries(1):
+            hotel.save(update_fields=['name'])
+        self.assertCatalogueMatchesRefresh()
+
+        # Changed in memory only: the stored values are the ones taken out.
+        changed = Hotel.objects.get(id=2)
+        changed.price = 999
+        changed.delete()
+        Hotel.objects.filter(id=3).delete()
+        self.assertEqual(self.client.get(reverse('stats')).json()['catalogue']['hotels'], 1)
+        self.assertCatalogueMatchesRefresh()
+
+    def test_invalid_parameters(self):
+        """Test malformed or oversized date ranges are rejected"""
+        for params in ({'start': 'soon'}, {'start': '2026-02-01', 'end': '2026-01-01'},
+                       {'start': '2026-01-01', 'end': '2028-01-01'}, {'hotel_id': 'one'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(reverse('stats'), params).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_command(self):
+        """Test rebuild_rollups recounts reservations inserted in bulk"""
+        reservations = Reservation.objects.bulk_create([
+            Reservation(hotel_id=3, hotel_name="Hotel 3", checkin=self.checkin, checkout=self.checkin + timedelta(days=1))
+            for _ in range(3)
+        ])
+        Reservation.guests.through.objects.bulk_create([
+            Reservation.guests.through(reservation_id=reservations[0].pk,
+                                       guest_id=Guest.objects.create(guest_name="Ann", gender="Female").pk)
+        ])
+        stdout = io.StringIO()
+        call_command('rebuild_rollups', batch_size=2, stdout=stdout)
+
+        self.assertIn('1 hotel-nights', stdout.getvalue())
+        self.assertEqual(self._night_stats(), {(3, self.checkin, 3, 1)})
+
+
+class ArchiveTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        Hotel.objects.bulk_create([
+            Hotel(id=i, name=f"Hotel {i}", rating=4.0, price=100,
+                  available_until=date.today() + timedelta(days=60), available=True)
+            for i in (1, 2)
+        ])
+        self.ann = Guest.objects.create(guest_name="Ann Lee", gender="Female")
+        self.bo = Guest.objects.create(guest_name="Bo Chen", gender="Male")
+        # Five past stays and two current ones.
+        for days_ago in (40, 30, 20, 10, 5, 1, -3):
+            checkout = date.today() - timedelta(days=days_ago)
+            reservation = Reservation.objects.create(hotel_id=1 + days_ago % 2, hotel_name="",
+                                                     checkin=checkout - timedelta(days=2), checkout=checkout)
+            reservation.guests.add(self.ann, *([self.bo] if days_ago % 2 else []))
+        self.reservations = list(Reservation.objects.order_by('id'))
+
+    def _archive(self, batch_size=2):
+        stdout = io.StringIO()
+        call_command('archive_reservations', before=(date.today() - timedelta(days=2)).isoformat(),
+                     batch_size=batch_size, stdout=stdout)
+        return stdout.getvalue()
+
+    def _confirmation_numbers(self, params=None):
+        return [reservation['confirmation_number'] for reservation in self.client.get('/reservations/', params).json()]
+
+    def test_archive_moves_past_reservations_in_batches(self):
+        """Test past stays move with their guest links, keeping ids, rooms and rollups"""
+        rollups = set(HotelNightStats.objects.values_list('hotel_id', 'night', 'rooms', 'guests'))
+        inventory = set(HotelInventory.objects.values_list('hotel_id', 'night', 'remaining'))
+
+        output = self._archive()
+        self.assertIn('Archived 5 reservations and 6 guest links in 3 batches', output)
+
+        self.assertEqual(list(Reservation.objects.order_by('id')), self.reservations[5:])
+        archived = ArchivedReservation.objects.order_by('id')
+        self.assertEqual([(r.id, r.confirmation_number, r.hotel_id, r.checkout) for r in archived],
+                         [(r.id, r.confirmation_number, r.hotel_id, r.checkout) for r in self.reservations[:5]])
+        self.assertEqual([r.guests.count() for r in archived.prefetch_related('guests')], [1, 1, 1, 1, 2])
+        self.assertEqual(Reservation.guests.through.objects.count(), 4)
+        self.assertEqual(Guest.objects.count(), 2)
+
+        # History still counts.
+        self.assertEqual(set(HotelNightStats.objects.values_list('hotel_id', 'night', 'rooms', 'guests')), rollups)
+        self.assertEqual(set(HotelInventory.objects.values_list('hotel_id', 'night', 'remaining')), inventory)
+        rebuild_rollups()
+        self.assertEqual(set(HotelNightStats.objects.values_list('hotel_id', 'night', 'rooms', 'guests')), rollups)
+
+        self.assertIn('Archived 0 reservations', self._archive())
+
+    def test_archive_rejects_future_cutoffs(self):
+        """Test bookings that have not checked out yet cannot be archived"""
+        for before in ((date.today() + timedelta(days=1)).isoformat(), 'soon'):
+            with self.subTest(before=before), self.assertRaises(CommandError):
+                call_command('archive_reservations', before=before, stdout=io.StringIO())
+        self.assertEqual(ArchivedReservation.objects.count(), 0)
+
+    def test_archived_reservations_only_when_asked_for(self):
+        """Test the list and detail endpoints include archived reservations only with include_archived"""
+        self._archive()
+        everything = {str(r.confirmation_number) for r in self.reservations}
+        current = {str(r.confirmation_number) for r in self.reservations[5:]}
+
+        self.assertEqual(set(self._confirmation_numbers()), current)
+        self.assertEqual(set(self._confirmation_numbers({'include_archived': 'false'})), current)
+        self.assertEqual(set(self._confirmation_numbers({'include_archived': 'true'})), everything)
+        body = self.client.get('/reservations/', {'include_archived': 'true', 'stream': 'ndjson'})
+        self.assertEqual({json.loads(line)['confirmation_number']
+                          for line in b''.join(body.streaming_content).splitlines()}, everything)
+
+        old = self.reservations[0]
+        self.assertEqual(self.client.get(f'/reservations/{old.confirmation_number}').status_code,
+                         status.HTTP_404_NOT_FOUND)
+        response = self.client.get(f'/reservations/{old.confirmation_number}', {'include_archived': 'true'})
+        self.assertEqual(response.json()['hotel_name'], 'Hotel 1')
+        self.assertEqual(len(response.json()['guests']), 1)
+
+        for url in ('/reservations/', f'/reservations/{old.confirmation_number}'):
+            self.assertEqual(self.client.get(url, {'include_archived': 'maybe'}).status_code,
+                             status.HTTP_400_BAD_REQUEST)
+
+    def test_filters_and_pagination_span_the_archive(self):
+        """Test lookups apply to archived reservations and pages merge both tables in key order"""
+        expected = [r for r in self.reservations if r.hotel_id == 2 and r.guests.filter(guest_name='Bo Chen').exists()]
+        self._archive()
+        params = {'include_archived': 'true', 'guest_name': 'Bo Chen', 'hotel_id': 2}
+        # Without pagination, live reservations come first.
+        self.assertCountEqual(self._confirmation_numbers(params), [str(r.confirmation_number) for r in expected])
+
+        for params, key in (({}, lambda r: r.confirmation_number),
+                            ({'min_checkin': date.today() - timedelta(days=60)}, lambda r: (r.checkin, r.checkout, r.id))):
+            with self.subTest(params=params):
+                confirmation_numbers = []
+                params = {**params, 'include_archived': 'true', 'limit': 3}
+                while True:
+                    body = self.client.get('/reservations/', params).json()
+                    confirmation_numbers += [r['confirmation_number'] for r in body['results']]
+                    if body['next'] is None:
+                        break
+                    params['cursor'] = body['next']
+                self.assertEqual(confirmation_numbers,
+                                 [str(r.confirmation_number) for r in sorted(self.reservations, key=key)])
+
+
+class StartupProfileCommandTestCase(SimpleTestCase):
+    # The stack of the full profile, spelled out so the tests don't depend
+    # on the profile the suite itself runs under.
+    FULL_MIDDLEWARE = [
+        'hotelapi.metrics.MetricsMiddleware',
+        'hotelapi.compression.CompressionMiddleware',
+        'hotelapi.admission.AdmissionMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    ]
+
+    def _profile(self, settings_profile, *args):
+        """Report of startup_profile run under ``settings_profile``."""
+        # In a separate process: the profile is picked when settings load.
+        report_path = os.path.join(tempfile.mkdtemp(), 'startup.json')
+        self.addCleanup(os.remove, report_path)
+        env = {name: value for name, value in os.environ.items() if name != 'ADMIN_ENABLED'}
+        subprocess.run(
+            [sys.executable, 'manage.py', 'startup_profile', '--repeat', '1', '--requests', '20',
+             '--output', report_path, *args],
+            cwd=settings.BASE_DIR, env={**env, 'SECRET_KEY': settings.SECRET_KEY, 'SETTINGS_PROFILE': settings_profile},
+            check=True, capture_output=True,
+        )
+        with open(report_path) as f:
+            return json.load(f)
+
+    def test_startup_profile_reports_imports_and_middleware(self):
+        """Test startup_profile times imports per module and every middleware of the stack"""
+        report = self._profile('full', '--top', '5')
+
+        self.assertEqual(report['meta']['settings_profile'], 'full')
+        self.assertTrue(report['meta']['admin_enabled'])
+        self.assertGreater(report['startup']['seconds'], 0)
+        self.assertGreater(report['startup']['modules'], 100)
+        self.assertEqual(len(report['startup']['slowest_modules']), 5)
+        self.assertIn('django', [package['package'] for package in report['startup']['packages']])
+        self.assertEqual([entry['middleware'] for entry in report['middleware']['per_middleware']],
+                         self.FULL_MIDDLEWARE)
+        self.assertGreater(report['middleware']['view_us_per_request'], 0)
+
+    def test_api_profile(self):
+        """Test the API-only profile drops the browser apps and middleware and still serves the API"""
+        report = self._profile('api', '--top', '3', '--url', '/metrics')
+
+        self.assertEqual(report['meta']['settings_profile'], 'api')
+        self.assertEqual(report['meta']['installed_apps'], ['rest_framework', 'hotelapi'])
+        self.assertFalse(report['meta']['admin_enabled'])
+        middleware = [entry['middleware'] for entry in report['middleware']['per_middleware']]
+        self.assertIn('hotelapi.admission.AdmissionMiddleware', middleware)
+        self.assertNotIn('django.contrib.sessions.middleware.SessionMiddleware', middleware)
+        self.assertNotIn('django.middleware.csrf.CsrfViewMiddleware', middleware)
+        self.assertLess(len(middleware), len(self.FULL_MIDDLEWARE))
+
+
+class StressBookingsCommandTestCase(SimpleTestCase):
+    def test_stress_command_finds_no_overbooking(self):
+        """Test concurrent bookings never sell more rooms than a night has"""
+        # In a separate process: the command books from several threads into
+        # a throwaway database file, which can't be swapped in for the test
+        # suite's in-memory database.
+        report_path = os.path.join(tempfile.mkdtemp(), 'stress.json')
+        self.addCleanup(os.remove, report_path)
+        subprocess.run(
+            [sys.executable, 'manage.py', 'stress_bookings', '--hotels', '1', '--capacity', '2',
+             '--nights', '3', '--requests', '30', '--concurrency', '1', '4', '--output', report_path],
+            cwd=settings.BASE_DIR, env={**os.environ, 'SECRET_KEY': settings.SECRET_KEY},
+            check=True, capture_output=True,
+        )
+
+        with open(report_path) as f:
+            report = json.load(f)
+        self.assertEqual([level['concurrency'] for level in report['levels']], [1, 4])
+        for level in report['levels']:
+            self.assertEqual(level['errors'], 0)
+            self.assertEqual(level['overbooked_nights'], 0)
+            self.assertEqual(level['inventory_mismatches'], 0)
+            self.assertGreater(level['rejected'], 0)
+            self.assertEqual(level['booked'] + level['rejected'], 30)
+
+
+@override_settings(INVENTORY_DEFAULT_CAPACITY=2)
+class AvailabilityEngineTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        self.start = date.today() + timedelta(days=1)
+        self.rng = random.Random(4)
+        availability_index.reset()
+        self.addCleanup(availability_index.reset)
+
+        Hotel.objects.bulk_create([
+            Hotel(
+                id=i,
+                name=f"Hotel {i}",
+                rating=4.0,
+                price=100,
+                available_until=self.start + timedelta(days=self.rng.randint(10, 60)),
+                available=(i % 7 != 0)
+            )
+            for i in range(1, 31)
+        ])
+
+    def _random_stay(self):
+        checkin = self.start + timedelta(days=self.rng.randint(0, 45))
+        return checkin, checkin + timedelta(days=self.rng.randint(1, 7))
+
+    def _oracle(self, checkin, checkout):
+        """Brute force: count the reservations of every night of the stay"""
+        booked = {}
+        for reservation in Reservation.objects.all():
+            night = max(reservation.checkin, checkin)
+            while night < min(reservation.checkout, checkout):
+                booked[reservation.hotel_id, night] = booked.get((reservation.hotel_id, night), 0) + 1
+                night += timedelta(days=1)
+        full = {hotel_id for (hotel_id, _), count in booked.items() if count >= 2}
+        return [
+            hotel.id for hotel in Hotel.objects.order_by('id')
+            if hotel.available and hotel.available_until >= checkout and hotel.id not in full
+        ]
+
+    def test_interval_index_matches_brute_force(self):
+        """Test IntervalIndex.overlaps against a brute-force overlap check"""
+        index = IntervalIndex()
+        intervals = []
+        for step in range(400):
+            start = self.rng.randint(0, 200)
+            end = start + self.rng.randint(1, 20)
+            if intervals and self.rng.random() < 0.2:
+                removed = intervals.pop(self.rng.randrange(len(intervals)))
+                self.assertTrue(index.remove(*removed))
+            else:
+                intervals.append((start, end))
+                index.add(start, end)
+
+            query_start = self.rng.randint(0, 220)
+            query_end = query_start + self.rng.randint(1, 15)
+            expected = any(s < query_end and query_start < e for s, e in intervals)
+            self.assertEqual(index.overlaps(query_start, query_end), expected, (step, query_start, query_end))
+        self.assertEqual(len(index), len(intervals))
+
+    def test_backends_match_oracle(self):
+        """Test both availability backends agree with the brute-force oracle"""
+        for _ in range(150):
+            checkin, checkout = self._random_stay()
+            hotel_id = self.rng.randint(1, 30)
+            Reservation.objects.create(hotel_id=hotel_id, hotel_name=f"Hotel {hotel_id}", checkin=checkin, checkout=checkout)
+        # Some nights end up overbooked, which the inventory counts as full.
+        rebuild_inventory()
+        read_serializers = [HotelReadSerializer(), HotelReadSerializer(fields=['id'])]
+
+        for _ in range(100):
+            checkin, checkout = self._random_stay()
+            expected = self._oracle(checkin, checkout)
+            for backend in ('index', 'database'):
+                for read_serializer in read_serializers:
+                    rows = available_hotel_rows(read_serializer, checkin, checkout, backend=backend)
+                    hotel_ids = [hotel['id'] for hotel in read_serializer.to_representation_many(rows)]
+                    self.assertEqual(hotel_ids, expected, (backend, checkin, checkout))
+
+    def test_index_follows_reservation_writes(self):
+        """Test the index picks up rooms booked and released after it was built"""
+        checkin, checkout = self.start, self.start + timedelta(days=3)
+        url = f"/available_hotels/?checkin={checkin.isoformat()}&checkout={checkout.isoformat()}"
+        hotel_ids = [hotel['id'] for hotel in self.client.get(url).json()]
+        self.assertIn(1, hotel_ids)
+
+        for rooms_left in (1, 0):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse('reservationConfirmation'),
+                    data=json.dumps({
+                        "hotel_name": "Hotel 1",
+                        "checkin": (checkin + timedelta(days=2)).isoformat(),
+                        "checkout": (checkout + timedelta(days=2)).isoformat(),
+                        "guests_list": [{"guest_name": "Ann", "gender": "Female"}]
+                    }),
+                    content_type='application/json'
+                )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            # Listed while it has a room left, as bookings are accepted.
+            self.assertEqual(1 in [hotel['id'] for hotel in self.client.get(url).json()], rooms_left > 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.get(confirmation_number=response.json()['confirmation_number']).delete()
+        self.assertIn(1, [hotel['id'] for hotel in self.client.get(url).json()])
+
+    def test_back_to_back_stays_do_not_conflict(self):
+        """Test a stay starting on a full stay's checkout date is available"""
+        for _ in range(2):
+            Reservation.objects.create(hotel_id=1, hotel_name="Hotel 1", checkin=self.start, checkout=self.start + timedelta(days=2))
+        rebuild_inventory()
+        url = f"/available_hotels/?checkin={(self.start + timedelta(days=2)).isoformat()}&checkout={(self.start + timedelta(days=4)).isoformat()}"
+        overlapping = f"/available_hotels/?checkin={(self.start + timedelta(days=1)).isoformat()}&checkout={(self.start + timedelta(days=3)).isoformat()}"
+
+        self.assertIn(1, [hotel['id'] for hotel in self.client.get(url).json()])
+        self.assertNotIn(1, [hotel['id'] for hotel in self.client.get(overlapping).json()])
+
+    def test_checkout_must_follow_checkin(self):
+        """Test available_hotels rejects empty or inverted stays and bad checkin dates"""
+        day = self.start.isoformat()
+        self.assertEqual(self.client.get(f"/available_hotels/?checkin={day}&checkout={day}").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(f"/available_hotels/?checkin=13/40/2025&checkout={day}").status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ReservationHotelForeignKeyTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        self.hotel = Hotel.objects.create(id=1, name="Harbour View", rating=4.0, price=100,
+                                          available_until=date.today() + timedelta(days=30), available=True)
+        Hotel.objects.create(id=2, name="Twin", rating=3.0, price=80,
+                             available_until=date.today() + timedelta(days=30), available=True)
+        Hotel.objects.create(id=3, name="Twin", rating=3.0, price=80,
+                             available_until=date.today() + timedelta(days=30), available=True)
+
+    def _post(self, **hotel):
+        data = {
+            "checkin": (date.today() + timedelta(days=1)).isoformat(),
+            "checkout": (date.today() + timedelta(days=3)).isoformat(),
+            "guests_list": [{"guest_name": "Ann", "gender": "Female"}],
+            **hotel
+        }
+        return self.client.post(reverse('reservationConfirmation'), data=json.dumps(data), content_type='application/json')
+
+    def test_hotel_name_input_links_hotel(self):
+        """Test reservations posted with hotel_name are linked to the hotel"""
+        response = self._post(hotel_name="Harbour View")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        reservation = Reservation.objects.get(confirmation_number=response.json()['confirmation_number'])
+        self.assertEqual(reservation.hotel, self.hotel)
+
+    def test_hotel_id_input(self):
+        """Test reservations can be posted with hotel_id and get the hotel's name"""
+        response = self._post(hotel_id=3)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        reservation = Reservation.objects.get(confirmation_number=response.json()['confirmation_number'])
+        self.assertEqual((reservation.hotel_id, reservation.hotel_name), (3, "Twin"))
+
+    def test_unknown_or_ambiguous_hotel_is_rejected(self):
+        """Test typos, ambiguous names and mismatched ids don't create orphan bookings"""
+        self.assertEqual(self._post(hotel_name="Harbor View").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._post(hotel_name="Twin").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._post(hotel_id=99).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._post(hotel_id=1, hotel_name="Twin").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._post().status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_reservation_list_follows_hotel(self):
+        """Test reservation_list reports the linked hotel and keeps legacy names"""
+        self._post(hotel_id=1)
+        Reservation.objects.create(hotel_name="Gone Hotel", checkin=date.today(), checkout=date.today() + timedelta(days=1))
+        Hotel.objects.filter(id=1).update(name="Harbour View Renamed")
+
+        with self.assertNumQueries(2):
+            reservations = self.client.get(reverse('reservationList')).json()
+        self.assertEqual(
+            [(r['hotel_id'], r['hotel_name']) for r in reservations],
+            [(1, "Harbour View Renamed"), (None, "Gone Hotel")]
+        )
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Runs each test against the schema as of ``migrate_from``."""
+    databases = '__all__'
+    migrate_from = None
+    migrate_to = None
+
+    def _migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(target)
+        return executor
+
+    def setUp(self):
+        executor = self._migrate([self.migrate_from])
+        self.apps = executor.loader.project_state([self.migrate_from]).apps
+
+    def tearDown(self):
+        self._migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+
+class ReservationHotelBackfillMigrationTestCase(MigrationTestCase):
+    migrate_from = ('hotelapi', '0005_reservation_hotel')
+    migrate_to = ('hotelapi', '0006_backfill_reservation_hotel')
+
+    def test_backfill_links_reservations_by_name(self):
+        """Test the data migration links reservations to hotels by name, in batches"""
+        backfill = importlib.import_module('hotelapi.migrations.0006_backfill_reservation_hotel')
+
+        OldHotel = self.apps.get_model('hotelapi', 'Hotel')
+        OldReservation = self.apps.get_model('hotelapi', 'Reservation')
+        OldHotel.objects.create(id=1, name="Alpha", rating=4.0, price=1, available_until=date.today(), available=True)
+        OldHotel.objects.create(id=2, name="Beta", rating=4.0, price=1, available_until=date.today(), available=True)
+        OldHotel.objects.create(id=3, name="Beta", rating=4.0, price=1, available_until=date.today(), available=True)
+        names = ["Alpha", "Beta", "Typo"] * 5
+        for name in names:
+            OldReservation.objects.create(hotel_name=name, checkin=date.today(), checkout=date.today())
+
+        original_batch_size = backfill.BATCH_SIZE
+        backfill.BATCH_SIZE = 4
+        self.addCleanup(setattr, backfill, 'BATCH_SIZE', original_batch_size)
+        self._migrate([self.migrate_to])
+
+        links = list(Reservation.objects.order_by('id').values_list('hotel_name', 'hotel_id'))
+        self.assertEqual(links, [(name, {"Alpha": 1, "Beta": 2}.get(name)) for name in names])
+
+
+class CompactStorageMigrationTestCase(MigrationTestCase):
+    migrate_from = ('hotelapi', '0010_hotel_inventory')
+    migrate_to = ('hotelapi', '0015_guest_name_gender_uniq')
+
+    def test_confirmation_numbers_and_guests_are_compacted(self):
+        """Test the migrations keep confirmation numbers and merge duplicate guests, in batches"""
+        for name in ('0012_copy_confirmation_numbers', '0014_merge_duplicate_guests'):
+            migration = importlib.import_module(f'hotelapi.migrations.{name}')
+            self.addCleanup(setattr, migration, 'BATCH_SIZE', migration.BATCH_SIZE)
+            migration.BATCH_SIZE = 2
+
+        OldReservation = self.apps.get_model('hotelapi', 'Reservation')
+        OldGuest = self.apps.get_model('hotelapi', 'Guest')
+        numbers = [str(uuid.uuid4()) for _ in range(5)]
+        guests = {}
+        for number, names in zip(numbers, [["Ann"], ["Ann", "Bo"], ["Bo", "Bo"], ["Cy"], ["Ann", "Cy", "Ann"]]):
+            reservation = OldReservation.objects.create(
+                confirmation_number=number, hotel_name="Gone", checkin=date.today(), checkout=date.today())
+            reservation.guests.add(*[OldGuest.objects.create(guest_name=name, gender="Female") for name in names])
+            guests[number] = sorted(set(names))
+        self._migrate([self.migrate_to])
+
+        self.assertEqual(Guest.objects.count(), 3)
+        for number in numbers:
+            reservation = Reservation.objects.get(confirmation_number=number)
+            self.assertEqual(sorted(reservation.guests.values_list('guest_name', flat=True)), guests[number])
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+        Hotel.objects.bulk_create([
+            Hotel(id=i, name=f"Hotel {i}", rating=4.0, price=100 + i,
+                  available_until=date.today() + timedelta(days=30), available=True)
+            for i in range(1, 4)
+        ])
+        self.checkin = (date.today() + timedelta(days=1)).isoformat()
+        self.checkout = (date.today() + timedelta(days=3)).isoformat()
+
+    def test_repeated_get_is_served_from_cache(self):
+        """Test a second identical GET runs no queries and returns the same body and ETag"""
+        for name, args in (('hotelList', []), ('hotelDetail', [2]), ('genericsList', [])):
+            url = reverse(name, args=args)
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+
+            self.assertEqual(second.status_code, status.HTTP_200_OK)
+            self.assertEqual(second.content, first.content)
+            self.assertEqual(second['ETag'], first['ETag'])
+            self.assertTrue(first['ETag'].startswith('"'))
+
+    def test_query_params_are_normalized(self):
+        """Test parameter order doesn't affect the cache key"""
+        self.client.get(f"/available_hotels/?checkin={self.checkin}&checkout={self.checkout}")
+        with self.assertNumQueries(0):
+            response = self.client.get(f"/available_hotels/?checkout={self.checkout}&checkin={self.checkin}")
+        self.assertEqual(len(response.json()), 3)
+
+    def test_if_none_match_returns_304(self):
+        """Test clients sending the current ETag get a 304 with no body"""
+        url = reverse('hotelList')
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_hotel_write_invalidates(self):
+        """Test saving a hotel changes the catalogue version and the ETag"""
+        url = reverse('hotelList')
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Hotel.objects.filter(id=1).update(price=1)
+            Hotel.objects.get(id=1).save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['price'], 1)
+
+    def test_versions_are_shared_between_workers(self):
+        """Test a version bumped by another worker misses this worker's cached responses"""
+        url = reverse('hotelList')
+        self.client.get(url)
+
+        # What another worker's bump looks like from here: only the shared
+        # versions cache changes.
+        caches['versions'].incr(response_cache._version_key(response_cache.HOTELS))
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_availability_is_cached_no_longer_than_the_index_lags(self):
+        """Test available_hotels entries expire with the availability index"""
+        with override_settings(RESPONSE_CACHE_TIMEOUT=3600, AVAILABILITY_INDEX_TTL=60):
+            self.assertEqual(response_cache._timeout(response_max_age), 60)
+            self.assertEqual(response_cache._timeout(None), 3600)
+            with override_settings(AVAILABILITY_BACKEND='database'):
+                self.assertEqual(response_cache._timeout(response_max_age), 3600)
+
+    @override_settings(INVENTORY_DEFAULT_CAPACITY=1)
+    def test_reservation_invalidates_availability(self):
+        """Test a new reservation invalidates available_hotels but not the hotel list"""
+        availability_index.reset()
+        self.addCleanup(availability_index.reset)
+        availability_url = f"/available_hotels/?checkin={self.checkin}&checkout={self.checkout}"
+        self.assertEqual(len(self.client.get(availability_url).json()), 3)
+        self.client.get(reverse('hotelList'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('reservationConfirmation'),
+                data=json.dumps({
+                    "hotel_id": 1, "checkin": self.checkin, "checkout": self.checkout,
+                    "guests_list": [{"guest_name": "Ann", "gender": "Female"}]
+                }),
+                content_type='application/json'
+            )
+
+        self.assertEqual(len(self.client.get(availability_url).json()), 2)
+        with self.assertNumQueries(0):
+            self.client.get(reverse('hotelList'))
+
+    def test_uncacheable_responses(self):
+        """Test errors and streams bypass the cache"""
+        url = reverse('availableHotels')
+        self.client.get(url)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.get(reverse('hotelList'), {'stream': 'json'})
+        response = self.client.get(reverse('hotelList'), {'stream': 'json'})
+        self.assertTrue(response.streaming)
+        self.assertNotIn('ETag', response)
+
+    def test_cache_stats(self):
+        """Test hit and miss counters are exposed per view"""
+        url = reverse('hotelList')
+        etag = self.client.get(url)['ETag']
+        self.client.get(url)
+        self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        stats = self.client.get(reverse('cacheStats')).json()
+        self.assertEqual(stats['Hotels_list'], {'hit': 2, 'miss': 1, 'not_modified': 1, 'hit_rate': 2 / 3})
+        self.assertEqual(stats['available_hotels']['hit_rate'], None)
+
+
+class SparseFieldsetTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        availability_index.reset()
+        self.addCleanup(availability_index.reset)
+        Hotel.objects.bulk_create([
+            Hotel(id=i, name=f"Hotel {i}", rating=4.0, price=300 - 10 * i,
+                  available_until=date.today() + timedelta(days=30), available=True)
+            for i in range(1, 8)
+        ])
+        guest = Guest.objects.create(guest_name="Ann Lee", gender="Female")
+        for hotel_id in (1, 2, 2):
+            reservation = Reservation.objects.create(
+                hotel_id=hotel_id, hotel_name="", checkin=date.today() + timedelta(days=hotel_id),
+                checkout=date.today() + timedelta(days=hotel_id + 2),
+            )
+            reservation.guests.add(guest)
+
+    def _get(self, url, params):
+        """The response, its JSON body and the SQL of the queries it ran"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+            # Streamed rows are only read as the body is consumed.
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, json.loads(content), ' '.join(query['sql'] for query in queries.captured_queries)
+
+    def test_hotel_endpoints_select_only_requested_fields(self):
+        """Test ?fields= trims the output and the selected columns of every hotel endpoint"""
+        stay = {'checkin': (date.today() + timedelta(days=1)).isoformat(),
+                'checkout': (date.today() + timedelta(days=2)).isoformat()}
+        for url, params in [('/hotel_list/', {}), ('/generics_hotel_list/', {}), ('/hotel_list/3', {}),
+                            ('/available_hotels/', stay), ('/hotel_list/', {'stream': 'json'})]:
+            with self.subTest(url=url, params=params):
+                response, body, sql = self._get(url, {**params, 'fields': 'name, price'})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                for hotel in body if isinstance(body, list) else [body]:
+                    self.assertEqual(list(hotel), ['name', 'price'])
+                self.assertNotIn('"rating"', sql)
+                self.assertNotIn('"available_until"', sql.split('WHERE')[0])
+
+    def test_ordering_keys_are_fetched_but_not_returned(self):
+        """Test pagination keys are selected when not asked for and the cursor still works"""
+        for url in ('/hotel_list/', '/generics_hotel_list/'):
+            with self.subTest(url=url):
+                names = []
+                params = {'fields': 'name', 'sort': 'price', 'limit': 3}
+                while True:
+                    body = self.client.get(url, params).json()
+                    self.assertTrue(all(list(hotel) == ['name'] for hotel in body['results']))
+                    names += [hotel['name'] for hotel in body['results']]
+                    if body['next'] is None:
+                        break
+                    params['cursor'] = body['next']
+                self.assertEqual(names, [f"Hotel {i}" for i in range(7, 0, -1)])
+
+    def test_model_serializer_path(self):
+        """Test ?fields= also narrows the generic view when it reads through HotelSerializer"""
+        with patch('hotelapi.views.get_generics_list.read_serializer_class', None):
+            _, body, sql = self._get('/generics_hotel_list/', {'fields': 'id,available', 'limit': 2})
+        self.assertEqual(body['results'], [{'id': 1, 'available': True}, {'id': 2, 'available': True}])
+        self.assertNotIn('"price"', sql)
+
+    def test_unknown_fields_are_rejected(self):
+        """Test unknown or empty field lists get a 400 naming the valid fields"""
+        for url in ('/hotel_list/', '/hotel_list/1', '/generics_hotel_list/', '/reservations/'):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'fields': 'name,address'})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('address', response.json()['fields'][0])
+                self.assertEqual(self.client.get(url, {'fields': ','}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reservation_guests_are_only_loaded_when_asked_for(self):
+        """Test reservations skip the guest query and the hotel join unless those fields are asked for"""
+        with self.assertNumQueries(1):
+            _, body, sql = self._get('/reservations/', {'fields': 'checkin,hotel_id'})
+        self.assertEqual(body[0], {'checkin': (date.today() + timedelta(days=1)).isoformat(), 'hotel_id': 1})
+        self.assertNotIn('hotelapi_hotel', sql)
+        self.assertNotIn('"hotel_name"', sql)
+
+        with self.assertNumQueries(2):
+            body = self.client.get('/reservations/', {'fields': 'guests,hotel_name', 'hotel_id': 2, 'limit': 1}).json()
+        self.assertEqual(body['results'], [{'guests': [{'guest_name': 'Ann Lee', 'gender': 'Female'}],
+                                            'hotel_name': 'Hotel 2'}])
+        body = self.client.get('/reservations/', {'fields': 'guests', 'hotel_id': 2, 'cursor': body['next']}).json()
+        self.assertEqual(len(body['results']), 1)
+        self.assertIsNone(body['next'])
+
+        reservation = Reservation.objects.first()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/reservations/{reservation.confirmation_number}', {'fields': 'checkout'})
+        self.assertEqual(response.json(), {'checkout': reservation.checkout.isoformat()})
+
+
+class AsyncViewsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        availability_index.reset()
+        self.addCleanup(availability_index.reset)
+        self._route_async_views(True)
+        self.addCleanup(self._route_async_views, False)
+
+        Hotel.objects.bulk_create([
+            Hotel(id=i, name=f"Hotel {i}", rating=4.5, price=100 + i,
+                  available_until=date.today() + timedelta(days=30), available=i != 3)
+            for i in range(1, 6)
+        ])
+        reservation = Reservation.objects.create(
+            hotel_id=1, hotel_name="Hotel 1",
+            checkin=date.today() + timedelta(days=1), checkout=date.today() + timedelta(days=3),
+        )
+        reservation.guests.add(Guest.objects.create(guest_name="Ann", gender="Female"))
+        self.confirmation_number = reservation.confirmation_number
+
+    def _route_async_views(self, enabled):
+        with override_settings(ASYNC_VIEWS=enabled):
+            importlib.reload(project_urls)
+        clear_url_caches()
+
+    def _sync_json(self, url):
+        """The response of the sync view, for comparison"""
+        self._route_async_views(False)
+        try:
+            cache.clear()
+            return APIClient().get(url).json()
+        finally:
+            self._route_async_views(True)
+            cache.clear()
+
+    def test_urls_resolve_to_coroutines(self):
+        """Test the read endpoints are native async views when ASYNC_VIEWS is on"""
+        for url in ('/hotel_list/', '/hotel_list/1', '/generics_hotel_list/', '/available_hotels/', '/reservations/'):
+            self.assertTrue(iscoroutinefunction(resolve(url).func), url)
+        self.assertFalse(iscoroutinefunction(resolve('/reservation/').func))
+
+    async def test_async_reads_match_sync_views(self):
+        """Test every async read endpoint returns the same JSON as its sync view"""
+        checkin = (date.today() + timedelta(days=2)).isoformat()
+        checkout = (date.today() + timedelta(days=4)).isoformat()
+        urls = [
+            '/hotel_list/', '/hotel_list/?limit=2', '/hotel_list/2', '/hotel_list/99',
+            '/generics_hotel_list/', '/generics_hotel_list/?limit=3',
+            f'/available_hotels/?checkin={checkin}&checkout={checkout}', '/available_hotels/',
+            '/reservations/', '/reservations/?limit=1', '/reservations/?hotel_id=1&limit=1',
+            f'/reservations/{self.confirmation_number}', '/reservations/unknown',
+            '/hotel_list/?fields=name,price&sort=price&limit=2', '/hotel_list/2?fields=name',
+            '/generics_hotel_list/?fields=rating', f'/available_hotels/?checkin={checkin}&checkout={checkout}&fields=name',
+            '/reservations/?fields=checkin,guests', f'/reservations/{self.confirmation_number}?fields=hotel_name',
+            '/hotel_list/?fields=address', '/reservations/?fields=hotel',
+            '/reservations/?include_archived=true&limit=1', '/reservations/?include_archived=x',
+            f'/reservations/{self.confirmation_number}?include_archived=1',
+        ]
+        for url in urls:
+            response = await self.async_client.get(url)
+            expected = await sync_to_async(self._sync_json)(url)
+            self.assertEqual(response.json(), expected, url)
+
+    async def test_async_pagination_follows_cursor(self):
+        """Test async keyset pagination walks every hotel"""
+        hotel_ids = []
+        response = await self.async_client.get('/hotel_list/', {'limit': 2})
+        while True:
+            body = response.json()
+            hotel_ids += [hotel['id'] for hotel in body['results']]
+            if body['next'] is None:
+                break
+            response = await self.async_client.get('/hotel_list/', {'limit': 2, 'cursor': body['next']})
+        self.assertEqual(hotel_ids, [1, 2, 3, 4, 5])
+
+    async def test_async_streaming(self):
+        """Test async streams are served from an async iterator"""
+        response = await self.async_client.get('/reservations/', {'stream': 'ndjson'})
+
+        self.assertTrue(response.is_async)
+        lines = b''.join([chunk async for chunk in response.streaming_content]).splitlines()
+        self.assertEqual(json.loads(lines[0])['guests'], [{'guest_name': 'Ann', 'gender': 'Female'}])
+
+    async def test_async_errors(self):
+        """Test invalid query parameters and cached 304s work on async views"""
+        response = await self.async_client.get('/hotel_list/', {'limit': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        etag = (await self.async_client.get('/hotel_list/'))['ETag']
+        response = await self.async_client.get('/hotel_list/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    async def test_async_compression_and_msgpack(self):
+        """Test async streams are compressed chunk by chunk and lists negotiate MessagePack"""
+        response = await self.async_client.get('/reservations/', {'stream': 'ndjson'},
+                                                headers={'Accept-Encoding': 'gzip'})
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        body = zlib.decompress(b''.join([chunk async for chunk in response.streaming_content]), 31)
+        self.assertEqual(json.loads(body.splitlines()[0])['confirmation_number'], str(self.confirmation_number))
+
+        if msgpack is not None:
+            response = await self.async_client.get('/hotel_list/', headers={'Accept': 'application/msgpack'})
+            self.assertEqual(response['Content-Type'], 'application/msgpack')
+            self.assertEqual(msgpack.unpackb(response.content), await sync_to_async(self._sync_json)('/hotel_list/'))
+
+    def test_writes_are_delegated_to_sync_views(self):
+        """Test POSTs to async URLs still go through the sync DRF views"""
+        response = self.client.post('/hotel_list/', data=json.dumps({
+            "id": 10, "name": "New", "rating": 4.0, "price": 1,
+            "available_until": date.today().isoformat(), "available": True
+        }), content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Hotel.objects.filter(id=10).exists())
+        self.assertEqual(self.client.delete('/hotel_list/1').status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class BenchCommandTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        availability_index.reset()
+        self.addCleanup(availability_index.reset)
+
+    def test_bench_reports_every_endpoint(self):
+        """Test the bench command seeds data and reports stats for every URL"""
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('bench', hotels=20, reservations=50, requests=3, concurrency=1,
+                         existing_db=True, output=output.name, stdout=io.StringIO())
+            report = json.load(open(output.name))
+
+        self.assertEqual(Hotel.objects.count(), 20)
+        # 50 seeded, plus whatever the POST endpoints created.
+        self.assertGreater(Reservation.objects.count(), 50)
+        self.assertTrue(Guest.objects.exists())
+        self.assertEqual(set(report['endpoints']), {
+            'hotelList', 'hotelDetail', 'genericsList', 'reservationConfirmation',
+            'bulkReservationConfirmation', 'availableHotels', 'reservationList', 'reservationDetail', 'cacheStats',
+            'search', 'metrics', 'stats',
+        })
+        for name, result in report['endpoints'].items():
+            self.assertEqual(result['requests'], 3)
+            self.assertEqual(result['errors'], 0, name)
+            self.assertLessEqual(result['latency_ms']['p50'], result['latency_ms']['p99'])
+        self.assertGreater(report['meta']['peak_rss_kb'], 0)
+
+    def test_bench_rejects_unknown_endpoints(self):
+        """Test unknown URL names are rejected before anything is seeded"""
+        with self.assertRaises(CommandError):
+            call_command('bench', endpoints=['nope'], existing_db=True, stdout=io.StringIO())
+        self.assertFalse(Hotel.objects.exists())
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Every URL in testproj/urls.py runs a fixed number of queries however big
+    the dataset, and those that read a page or a row never read a whole
+    table. With QUERY_BUDGET_TIMING set, they are also timed as it grows.
+    """
+    # Hotels at each size, with twice as many reservations. datasets.seed
+    # grows the dataset in bulk from one size to the next.
+    SIZES = (25, 100, 400)
+    PAGE_SIZE = 20
+    # Queries of the bench scenario of each URL name, with nothing cached.
+    QUERY_BUDGETS = {
+        'hotelList': 1,
+        'hotelDetail': 1,
+        'genericsList': 1,
+        # See ReservationBulkWriteTestCase.
+        'reservationConfirmation': 11,
+        'bulkReservationConfirmation': 14,
+        # Hotels, then the inventory behind the availability index.
+        'availableHotels': 2,
+        # Reservations, then the guests of the page.
+        'reservationList': 2,
+        'reservationDetail': 2,
+        'search': 6,
+        'stats': 2,
+        'cacheStats': 0,
+        'metrics': 0,
+    }
+    # Unpaginated, streamed and archive-spanning variants.
+    EXTRA_QUERY_BUDGETS = {
+        '/hotel_list/': 1,
+        '/hotel_list/?stream=json': 1,
+        '/generics_hotel_list/': 1,
+        '/reservations/': 2,
+        '/reservations/?stream=ndjson': 2,
+        '/reservations/?include_archived=true': 4,
+        '/reservations/?include_archived=true&limit=20': 4,
+    }
+    # Endpoints whose answer grows with the dataset: /available_hotels/
+    # returns every free hotel. The others read a page or a row.
+    LINEAR = {'availableHotels'}
+    # Tables that don't grow with the dataset: one row per catalogue bucket.
+    SMALL_TABLES = {'hotelapi_cataloguebucket'}
+    # How much slower than at the smallest size the largest may be.
+    CONSTANT_SLOWDOWN = 3
+    TIMING_RUNS = 5
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.addCleanup(registry.reset)
+        availability_index.reset()
+        self.addCleanup(availability_index.reset)
+
+    def _grow(self):
+        """Seed each size in turn, yielding the size and its bench scenarios."""
+        hotels = 0
+        for size in self.SIZES:
+            rows = datasets.seed(size - hotels, 2 * (size - hotels), seed=size, start_id=hotels + 1)
+            # And a tenth of the reservations archived.
+            archive_batch(date.max, (size - hotels) // 5, 'default')
+            hotels = size
+            yield size, Scenarios(rows, self.PAGE_SIZE)
+
+    def _send(self, method, path, body):
+        # Nothing cached: every request does all of its work.
+        cache.clear()
+        availability_index.reset()
+        if method == 'POST':
+            response = self.client.post(path, data=json.dumps(body), content_type='application/json')
+        else:
+            response = self.client.get(path)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, path)
+        return response
+
+    def test_every_url_has_a_budget(self):
+        """Test a new URL can't go unchecked"""
+        self.assertEqual(set(api_url_names()), set(self.QUERY_BUDGETS))
+
+    def test_query_budgets_do_not_grow_with_data(self):
+        """Test each endpoint runs the same, fixed number of queries at every dataset size"""
+        for size, scenarios in self._grow():
+            requests = [(name, scenarios.build(name, random.Random(name)), budget)
+                        for name, budget in self.QUERY_BUDGETS.items()]
+            requests += [(path, ('GET', path, None), budget) for path, budget in self.EXTRA_QUERY_BUDGETS.items()]
+            for name, request, budget in requests:
+                with self.subTest(size=size, request=name), self.assertNumQueries(budget):
+                    self._send(*request)
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN output is SQLite specific')
+    def test_query_plans_do_not_read_whole_tables(self):
+        """Test paged and single-row endpoints search an index, or scan in order up to a LIMIT"""
+        for _, scenarios in self._grow():
+            # Plans at the largest size.
+            pass
+        tables = set(connection.introspection.table_names()) - self.SMALL_TABLES
+        for name in sorted(self.QUERY_BUDGETS.keys() - self.LINEAR):
+            request = scenarios.build(name, random.Random(name))
+            with CaptureQueriesContext(connection) as queries:
+                self._send(*request)
+            for query in queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                    steps = [row[3] for row in cursor.fetchall()]
+                # Full-text matches show as a SCAN of a virtual table.
+                scans = [step for step in steps if step.split()[0] == 'SCAN' and step.split()[1] in tables
+                         and 'VIRTUAL TABLE' not in step]
+                if scans:
+                    with self.subTest(endpoint=name, sql=query['sql'][:80]):
+                        self.assertIn(' LIMIT ', query['sql'], steps)
+                        self.assertFalse([step for step in steps if 'TEMP B-TREE' in step], steps)
+
+    @skipUnless(os.environ.get('QUERY_BUDGET_TIMING'), 'set QUERY_BUDGET_TIMING=1 to time the endpoints')
+    def test_latency_scales_as_expected(self):
+        """Test paged and single-row endpoints stay flat as data grows and the rest grow at most linearly"""
+        best = {}
+        for size, scenarios in self._grow():
+            for name in self.QUERY_BUDGETS:
+                rng = random.Random(name)
+                # Warm up, e.g. lazy imports, then keep the best run.
+                self._send(*scenarios.build(name, rng))
+                timings = []
+                for _ in range(self.TIMING_RUNS):
+                    request = scenarios.build(name, rng)
+                    start = time.perf_counter()
+                    self._send(*request)
+                    timings.append(time.perf_counter() - start)
+                best.setdefault(name, {})[size] = min(timings)
+
+        growth = self.SIZES[-1] / self.SIZES[0]
+        for name, timings in best.items():
+            allowed = 2 * growth if name in self.LINEAR else self.CONSTANT_SLOWDOWN
+            with self.subTest(endpoint=name):
+                # A millisecond of slack for timer noise on the fastest endpoints.
+                self.assertLessEqual(timings[self.SIZES[-1]], allowed * timings[self.SIZES[0]] + 0.001,
+                                     {size: round(seconds * 1000, 2) for size, seconds in timings.items()})
+
+
+class FastJSONTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        Hotel.objects.create(id=1, name="Café Royal", rating=4.5, price=100,
+                             available_until=date.today() + timedelta(days=30), available=True)
+
+    def test_backends_encode_alike(self):
+        """Test every JSON backend gives the same bytes, matching Django's encoder for its extra types"""
+        payload = {
+            'rating': Decimal('4.5'), 'day': date(2025, 5, 1), 'at': datetime(2025, 5, 1, 10, 30, 0, 123456),
+            'uuid': uuid.UUID(int=1), 'name': "Café", 1: [None, True, 1.5],
+        }
+        expected = {
+            'rating': '4.5', 'day': '2025-05-01', 'at': '2025-05-01T10:30:00.123',
+            'uuid': str(uuid.UUID(int=1)), 'name': "Café", '1': [None, True, 1.5],
+        }
+        encoded = {name: backend.dumps(payload) for name, backend in fastjson.BACKENDS.items()}
+        self.assertEqual(len(set(encoded.values())), 1, encoded)
+        for backend in fastjson.BACKENDS.values():
+            self.assertEqual(backend.loads(encoded['stdlib']), expected)
+
+    def test_views_with_each_backend(self):
+        """Test requests are parsed and responses rendered with each backend"""
+        checkin = date.today() + timedelta(days=1)
+        for name in fastjson.BACKENDS:
+            with self.subTest(backend=name), override_settings(JSON_BACKEND=name):
+                cache.clear()
+                response = self.client.post(reverse('reservationConfirmation'), data=json.dumps({
+                    "hotel_id": 1,
+                    "checkin": checkin.strftime('%m/%d/%Y'),
+                    "checkout": (checkin + timedelta(days=2)).isoformat(),
+                    "guests_list": [{"guest_name": "Zoë", "gender": "Female"}],
+                }), content_type='application/json')
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+                reservation = self.client.get(f"/reservations/{response.json()['confirmation_number']}").json()
+                self.assertEqual((reservation['checkin'], reservation['guests'][0]['guest_name']),
+                                 (checkin.isoformat(), "Zoë"))
+                self.assertEqual(self.client.get(reverse('hotelList')).json()[0]['name'], "Café Royal")
+
+                response = self.client.post(reverse('reservationConfirmation'), data='{"hotel_id": 1,',
+                                            content_type='application/json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('JSON parse error', response.json()['detail'])
+
+    def test_parse_date(self):
+        """Test both date formats are accepted, with or without zero padding, and results are memoized"""
+        for value in ('2025-05-01', '2025-5-1', '05/01/2025', '5/1/2025'):
+            self.assertEqual(parse_date(value), date(2025, 5, 1))
+        for value in ('2025-02-30', '01-05-2025', '2025/05/01', '20250501', '2025-05-01T00:00', '२०२५-05-01'):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_date(value)
+
+        parse_date.cache_clear()
+        parse_date('2025-05-01')
+        parse_date('2025-05-01')
+        self.assertEqual(parse_date.cache_info().hits, 1)
+
+    def test_invalid_dates_are_rejected(self):
+        """Test bad dates in bodies and query strings get a 400 naming the accepted formats"""
+        response = self.client.post(reverse('reservationConfirmation'), data=json.dumps({
+            "hotel_id": 1, "checkin": "13/01/2025", "checkout": "2025-01-20",
+            "guests_list": [{"guest_name": "Ann", "gender": "Female"}],
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {
+            'checkin': ['Date has wrong format. Use one of these formats instead: YYYY-MM-DD, MM/DD/YYYY.'],
+        })
+
+        response = self.client.get(reverse('availableHotels'), {'checkin': '13/01/2025', 'checkout': '2025-01-20'})
+        self.assertEqual(response.json(), {'error': 'Invalid checkin date format. Use MM/DD/YYYY'})
+
+    def test_bench_json_command(self):
+        """Test the micro-benchmark reports every payload for every backend"""
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('bench_json', page_size=2, repeat=1, min_time=0.001, output=output.name,
+                         stdout=io.StringIO())
+            report = json.load(open(output.name))
+
+        self.assertEqual(len(report['json']), 4 * len(fastjson.BACKENDS))
+        self.assertTrue(all(result['dumps_per_second'] > 0 for result in report['json']))
+        self.assertEqual([result['parser'] for result in report['dates']],
+                         ['strptime', 'parse_date (no cache)', 'parse_date'])
+
+
+class ResponseCompressionTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        Hotel.objects.bulk_create([
+            Hotel(id=i, name=f"Hotel {i}", rating=4.5, price=100 + i,
+                  available_until=date.today() + timedelta(days=30), available=True)
+            for i in range(1, 51)
+        ])
+        reservation = Reservation.objects.create(
+            hotel_id=1, hotel_name="Hotel 1",
+            checkin=date.today() + timedelta(days=1), checkout=date.today() + timedelta(days=3),
+        )
+        reservation.guests.add(Guest.objects.create(guest_name="Ann", gender="Female"))
+
+    def test_gzip(self):
+        """Test large responses are gzipped, with a weak ETag that still gets a 304"""
+        plain = self.client.get(reverse('hotelList'))
+        response = self.client.get(reverse('hotelList'), headers={'Accept-Encoding': 'gzip, deflate'})
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content) / 3)
+        self.assertEqual(response['ETag'], f"W/{plain['ETag']}")
+
+        response = self.client.get(reverse('hotelList'),
+                                   headers={'Accept-Encoding': 'gzip', 'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @skipUnless(compression.brotli, 'brotli is not installed')
+    def test_brotli(self):
+        """Test brotli is preferred when the client accepts it"""
+        plain = self.client.get(reverse('hotelList'))
+        response = self.client.get(reverse('hotelList'), headers={'Accept-Encoding': 'gzip, br'})
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content), plain.content)
+
+    def test_small_or_unwanted_responses_are_not_compressed(self):
+        """Test bodies under the threshold and clients refusing compression get plain responses"""
+        for url, accept_encoding in ((reverse('hotelDetail', args=[1]), 'gzip'),
+                                     (reverse('hotelList'), 'identity'),
+                                     (reverse('hotelList'), 'gzip;q=0, br;q=0')):
+            with self.subTest(url=url, accept_encoding=accept_encoding):
+                response = self.client.get(url, headers={'Accept-Encoding': accept_encoding})
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertIsInstance(response.json(), (dict, list))
+
+        with override_settings(RESPONSE_COMPRESSION=False):
+            response = APIClient().get(reverse('hotelList'), headers={'Accept-Encoding': 'gzip'})
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_accepted_encodings(self):
+        """Test Accept-Encoding is read with its quality values and wildcard"""
+        self.assertEqual(compression.accepted_encodings('gzip, deflate, br'), {'gzip', 'br'})
+        self.assertEqual(compression.accepted_encodings('br;q=0.5, gzip;q=1.0'), {'gzip', 'br'})
+        self.assertEqual(compression.accepted_encodings('*, gzip;q=0'), {'br'})
+        self.assertEqual(compression.accepted_encodings('identity'), set())
+        self.assertEqual(compression.accepted_encodings(None), set())
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_streams_are_compressed_chunk_by_chunk(self):
+        """Test every chunk of a compressed stream can be decoded as it arrives"""
+        with patch('hotelapi.streaming.STREAM_BUFFER_SIZE', 200):
+            response = APIClient().get(reverse('hotelList'), {'stream': 'ndjson'},
+                                       headers={'Accept-Encoding': 'gzip'})
+            chunks = list(response.streaming_content)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertGreater(len(chunks), 2)
+        decompressor = zlib.decompressobj(31)
+        lines = b''
+        for chunk in chunks[:-1]:
+            lines += decompressor.decompress(chunk)
+            # Nothing is held back waiting for the end of the stream.
+            self.assertTrue(lines.endswith(b'\n'))
+        lines += decompressor.decompress(chunks[-1]) + decompressor.flush()
+        self.assertEqual([json.loads(line)['id'] for line in lines.splitlines()], list(range(1, 51)))
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_msgpack(self):
+        """Test the list endpoints send MessagePack when the Accept header asks for it"""
+        for url in (reverse('hotelList'), reverse('hotelList') + '?limit=5', reverse('reservationList'),
+                    reverse('genericsList')):
+            with self.subTest(url=url):
+                expected = self.client.get(url).json()
+                response = self.client.get(url, headers={'Accept': 'application/msgpack'})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response['Content-Type'], 'application/msgpack')
+                self.assertIn('Accept', response['Vary'])
+                self.assertEqual(msgpack.unpackb(response.content), expected)
+
+        # JSON is still preferred when the client ranks it higher.
+        response = self.client.get(reverse('hotelList'), headers={'Accept': 'application/x-msgpack;q=0, */*'})
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+        response = self.client.get(reverse('hotelList'), headers={
+            'Accept': 'application/msgpack', 'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(msgpack.unpackb(gzip.decompress(response.content))), 50)
+
+
+class MetricsMiddlewareTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        registry.reset()
+        self.addCleanup(registry.reset)
+        Hotel.objects.create(id=1, name="Test Hotel 1", rating=4.5, price=150,
+                             available_until=date.today() + timedelta(days=30), available=True)
+
+    def test_server_timing_header(self):
+        """Test responses carry total, db and serialize timings"""
+        response = self.client.get('/hotel_list/1')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+
+    def test_metrics_endpoint(self):
+        """Test /metrics exposes per-view histograms in the Prometheus text format"""
+        self.client.get('/hotel_list/')
+        self.client.get('/hotel_list/1')
+        self.client.get('/hotel_list/99')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('hotelapi_responses_total{view="hotelDetail",status="200"} 1', body)
+        self.assertIn('hotelapi_responses_total{view="hotelDetail",status="404"} 1', body)
+        self.assertIn('hotelapi_request_duration_seconds_count{view="hotelList"} 1', body)
+        self.assertIn('hotelapi_db_queries_bucket{view="hotelDetail",le="1"} 2', body)
+        self.assertIn('hotelapi_response_size_bytes_bucket{view="hotelList",le="+Inf"} 1', body)
+        self.assertIn('# TYPE hotelapi_serialize_duration_seconds histogram', body)
+
+    def test_queries_outside_requests_are_not_counted(self):
+        """Test the execute wrapper ignores queries run outside a request"""
+        list(Hotel.objects.all())
+        self.client.get('/hotel_list/1')
+
+        self.assertEqual(registry.queries.series['hotelDetail'][-1], 1)
+
+    def test_async_views_are_measured(self):
+        """Test DB time and queries are recorded for async views"""
+        with override_settings(ASYNC_VIEWS=True):
+            importlib.reload(project_urls)
+        clear_url_caches()
+        self.addCleanup(clear_url_caches)
+        self.addCleanup(importlib.reload, project_urls)
+
+        response = async_to_sync(self.async_client.get)('/hotel_list/1')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        self.assertEqual(registry.queries.series['hotelDetail'][-1], 1)
+
+
+class AdmissionControlTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.addCleanup(registry.reset)
+        Hotel.objects.bulk_create([
+            Hotel(id=i, name=f"Hotel {i}", rating=4.0, price=100,
+                  available_until=date.today() + timedelta(days=30), available=True)
+            for i in (1, 2)
+        ])
+
+    def test_rate_limit_sheds_with_retry_after(self):
+        """Test requests past the token bucket get a 429 while other endpoints and writes go through"""
+        with override_settings(ADMISSION_LIMITS={'hotelList': {'rate': 0.5, 'burst': 2}}):
+            # A new client loads the middleware again, with these limits.
+            client = APIClient()
+            statuses = [client.get('/hotel_list/').status_code for _ in range(3)]
+            shed = client.get('/hotel_list/')
+            detail = client.get('/hotel_list/1')
+            created = client.post('/hotel_list/', {"id": 3, "name": "Hotel 3", "rating": 3.0, "price": 90,
+                                                   "available_until": date.today().isoformat(), "available": True},
+                                  format='json')
+
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(shed.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn(shed['Retry-After'], ('1', '2'))
+        self.assertIn('error', shed.json())
+        self.assertEqual(detail.status_code, status.HTTP_200_OK)
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('hotelapi_admission_total{view="hotelList",outcome="admitted"} 2', body)
+        self.assertIn('hotelapi_admission_total{view="hotelList",outcome="shed_rate"} 2', body)
+        self.assertIn('hotelapi_responses_total{view="hotelList",status="429"} 2', body)
+
+    def test_concurrency_limit_counts_streams_until_closed(self):
+        """Test an open stream holds its slot, so the next request gets a 503 until it is read"""
+        with override_settings(ADMISSION_LIMITS={'hotelList': {'concurrency': 1}}):
+            client = APIClient()
+            stream = client.get('/hotel_list/', {'stream': 'json'})
+            busy = client.get('/hotel_list/')
+            b''.join(stream.streaming_content)
+            free = client.get('/hotel_list/')
+
+        self.assertEqual(busy.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(busy['Retry-After'], '1')
+        self.assertEqual(free.status_code, status.HTTP_200_OK)
+        self.assertEqual(registry.admission[('hotelList', 'shed_concurrency')], 1)
+
+    def test_streams_release_their_slot_once(self):
+        """Test sync and async streams free their slot after the last chunk, and unread streams on close"""
+        async def chunks():
+            yield b'a'
+            yield b'b'
+
+        with override_settings(ADMISSION_LIMITS={'hotelList': {'concurrency': 1}}):
+            middleware = admission.AdmissionMiddleware(lambda request: None)
+        with patch.object(middleware.store, 'release') as release:
+            sync_stream = middleware.finish('hotelList', StreamingHttpResponse(iter([b'a', b'b'])))
+            self.assertEqual(b''.join(sync_stream.streaming_content), b'ab')
+            sync_stream.close()
+            self.assertEqual(release.call_count, 1)
+
+            async def read(response):
+                return b''.join([chunk async for chunk in response.streaming_content])
+
+            async_stream = middleware.finish('hotelList', StreamingHttpResponse(chunks()))
+            self.assertTrue(async_stream.is_async)
+            self.assertEqual(async_to_sync(read)(async_stream), b'ab')
+            self.assertEqual(release.call_count, 2)
+
+            middleware.finish('hotelList', StreamingHttpResponse(iter([b'a']))).close()
+            self.assertEqual(release.call_count, 3)
+
+    def test_disabled(self):
+        """Test ADMISSION_CONTROL=False leaves every request alone"""
+        with override_settings(ADMISSION_CONTROL=False, ADMISSION_LIMITS={'hotelList': {'rate': 0.1, 'burst': 1}}):
+            client = APIClient()
+            statuses = {client.get('/hotel_list/').status_code for _ in range(3)}
+        self.assertEqual(statuses, {200})
+        self.assertEqual(registry.admission, {})
+
+    @skipUnless(admission.fcntl is not None and hasattr(os, 'fork'), 'the file store needs fcntl and fork')
+    def test_file_store_is_shared_between_processes(self):
+        """Test worker processes share the file store and slots of dead workers are reclaimed"""
+        limits = {'hotelList': admission.Limit(concurrency=1, rate=None, burst=None)}
+        with tempfile.TemporaryDirectory() as directory:
+            store = admission.FileStore(os.path.join(directory, 'admission.shm'), limits)
+            acquired_read, acquired_write = os.pipe()
+            exit_read, exit_write = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                # The child takes the only slot and dies holding it.
+                os.write(acquired_write, store.acquire('hotelList')[0].encode())
+                os.read(exit_read, 1)
+                os._exit(0)
+            self.assertEqual(os.read(acquired_read, 64).decode(), admission.ADMITTED)
+            self.assertEqual(store.acquire('hotelList')[0], admission.SHED_CONCURRENCY)
+            os.write(exit_write, b'x')
+            os.waitpid(pid, 0)
+            for fd in (acquired_read, acquired_write, exit_read, exit_write):
+                os.close(fd)
+
+            self.assertEqual(store.acquire('hotelList')[0], admission.ADMITTED)
+            self.assertEqual(store.acquire('hotelList')[0], admission.SHED_CONCURRENCY)
+            store.release('hotelList')
+            self.assertEqual(store.acquire('hotelList')[0], admission.ADMITTED)
+
+
+@skipUnless('replica' in settings.DATABASES, 'read replica routing is disabled')
+class DatabaseRoutingTestCase(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        availability_index.reset()
+        self.addCleanup(availability_index.reset)
+        Hotel.objects.create(id=1, name="Test Hotel 1", rating=4.5, price=150,
+                             available_until=date.today() + timedelta(days=30), available=True)
+
+    def test_reads_use_replica_and_writes_use_primary(self):
+        """Test reads outside transactions go to the replica and writes to the primary"""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get('/hotel_list/1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(primary), 0)
+        self.assertEqual(len(replica), 1)
+
+        with CaptureQueriesContext(connections['default']) as primary:
+            response = self.client.post('/reservation/', data=json.dumps({
+                "hotel_id": 1, "checkin": "2025-05-01", "checkout": "2025-05-03",
+                "guests_list": [{"guest_name": "Ann", "gender": "Female"}]
+            }), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(any(query['sql'].startswith('INSERT') for query in primary))
+
+    def test_reads_in_transactions_use_primary(self):
+        """Test reads inside atomic blocks see the transaction's own writes"""
+        with transaction.atomic():
+            Hotel.objects.filter(id=1).update(name="Renamed")
+            self.assertEqual(Hotel.objects.all().db, 'default')
+            self.assertEqual(Hotel.objects.get(id=1).name, "Renamed")
+        self.assertEqual(Hotel.objects.all().db, 'replica')
+
+    def test_sqlite_connection_pragmas(self):
+        """Test new connections are configured by the init command"""
+        with connections['default'].cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+        # Set once by a migration, not by every connection.
+        self.assertNotIn('journal_mode', connections['default'].settings_dict['OPTIONS']['init_command'])
+
+
+class ImportHotelsCommandTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        Hotel.objects.create(id=1, name="Old Name", rating=3.0, price=90,
+                             available_until=date(2025, 1, 1), available=False)
+
+    def _import(self, content, suffix, *args):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_hotels', f.name, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_csv_upsert(self):
+        """Test CSV rows are inserted or update existing hotels, and bad rows are reported"""
+        self.client.get('/hotel_list/')  # Prime the response cache
+        with self.captureOnCommitCallbacks(execute=True):
+            stdout, stderr = self._import(
+                "id,name,rating,price,available_until,available\n"
+                "1,New Name,4.5,120,2025-06-01,true\n"
+                "2,Second,3.5,80,2025-06-01,\n"
+                "3,Bad,55,80,06/01/2025,maybe\n"
+                "4,Third,4.0,99,2025-06-01,false\n",
+                '.csv', '--batch-size', '2',
+            )
+
+        self.assertIn('Imported 3 hotels from 4 rows', stdout)
+        self.assertIn('line 4:', stderr)
+        self.assertIn('available_until', stderr)
+        self.assertEqual(
+            list(Hotel.objects.order_by('id').values_list('id', 'name', 'price', 'available')),
+            [(1, 'New Name', 120, True), (2, 'Second', 80, None), (4, 'Third', 99, False)],
+        )
+        # bulk_create() sends no signals; the import must invalidate the cache itself.
+        self.assertEqual(len(self.client.get('/hotel_list/').json()), 3)
+
+    def test_jsonl_errors_and_duplicates(self):
+        """Test invalid JSON lines are skipped and the last of duplicate ids wins"""
+        stdout, stderr = self._import(
+            '{"id": 5, "name": "First", "rating": 4, "price": 1, "available_until": "2025-06-01"}\n'
+            'not json\n'
+            '\n'
+            '{"id": 5, "name": "Second", "rating": "4.5", "price": 2, "available_until": "2025-06-01"}\n',
+            '.jsonl',
+        )
+
+        self.assertIn('1 failed, 1 duplicate ids', stdout)
+        self.assertIn('line 2: {"non_field_errors": ["Invalid data. Expected a dictionary, but got str."]}', stderr)
+        self.assertEqual(Hotel.objects.get(id=5).name, 'Second')
+
+    def test_catalogue_is_refreshed_once(self):
+        """Test an import skips the per-batch catalogue updates and refreshes the buckets at the end"""
+        rows = "".join(f"{i},Hotel {i},4.0,{i * 10},2025-06-01,true\n" for i in range(2, 8))
+        with patch('hotelapi.importers.refresh_catalogue', wraps=refresh_catalogue) as refresh, \
+                patch('hotelapi.services.update_catalogue') as update:
+            self._import("id,name,rating,price,available_until,available\n" + rows, '.csv', '--batch-size', '2')
+
+        self.assertEqual(refresh.call_count, 1)
+        update.assert_not_called()
+        self.assertEqual(self.client.get(reverse('stats')).json()['catalogue']['hotels'], 7)
+
+    def test_dry_run_writes_nothing(self):
+        """Test --dry-run only validates"""
+        stdout, _ = self._import('id,name,rating,price,available_until\n7,Seven,4.0,1,2025-06-01\n', '.csv', '--dry-run')
+
+        self.assertIn('Validated 1 hotels', stdout)
+        self.assertFalse(Hotel.objects.filter(id=7).exists())
+
+    def test_validator_matches_hotel_serializer(self):
+        """Test the row validator accepts and rejects the same rows as HotelSerializer"""
+        validator = HotelRowValidator()
+        base = {"id": 50, "name": "Valid", "rating": "4.5", "price": 100,
+                "available_until": "2025-06-01", "available": True}
+        variants = [
+            {}, {"name": ""}, {"name": "x" * 101}, {"name": "  padded  "}, {"rating": "4.55"},
+            {"rating": "100"}, {"rating": 5}, {"price": "12"}, {"price": "1.5"}, {"price": None},
+            {"available_until": "2025-13-01"}, {"available_until": "01/06/2025"}, {"available": "yes"},
+            {"available": "maybe"}, {"available": None}, {"id": "abc"}, {"id": "51"},
+        ]
+        for changes in variants:
+            row = {**base, **changes}
+            data, errors = validator.validate(row)
+            serializer = HotelSerializer(data=row)
+            with self.subTest(row=changes):
+                self.assertEqual(not errors, serializer.is_valid())
+                if errors:
+                    self.assertEqual(errors, serializer.errors)
+                else:
+                    self.assertEqual(data, dict(serializer.validated_data))
+
+        row = {key: value for key, value in base.items() if key != 'available'}
+        serializer = HotelSerializer(data=row)
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(validator.validate(row), (dict(serializer.validated_data), {}))
+
+
+class HotelFilteringTestCase(TestCase):
+    FILTERS = [
+        ('min_price', '150'), ('max_price', '150'), ('min_rating', '4.0'), ('name_prefix', 'Grand'),
+        ('available', 'true'), ('available', 'false'), ('available', 'null'),
+        ('min_available_until', (date.today() + timedelta(days=20)).isoformat()),
+        ('max_available_until', (date.today() + timedelta(days=20)).isoformat()),
+    ]
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        rng = random.Random(7)
+        Hotel.objects.bulk_create([
+            Hotel(id=i, name=f"{rng.choice(['Grand', 'Grandview', 'Park', 'grand'])} {i}",
+                  rating=Decimal(rng.randint(10, 50)) / 10, price=rng.choice([100, 150, 200]),
+                  available_until=date.today() + timedelta(days=rng.randint(0, 40)),
+                  available=rng.choice([True, False, None]))
+            for i in range(1, 41)
+        ])
+        self.hotels = list(Hotel.objects.order_by('id'))
+
+    def _matches(self, param, value):
+        return {
+            'min_price': lambda h: h.price >= int(value),
+            'max_price': lambda h: h.price <= int(value),
+            'min_rating': lambda h: h.rating >= Decimal(value),
+            'name_prefix': lambda h: h.name.startswith(value),
+            'available': lambda h: h.available == {'true': True, 'false': False, 'null': None}[value],
+            'min_available_until': lambda h: h.available_until.isoformat() >= value,
+            'max_available_until': lambda h: h.available_until.isoformat() <= value,
+        }[param]
+
+    def test_filters(self):
+        """Test each filter returns exactly the matching hotels on both list endpoints"""
+        for param, value in self.FILTERS:
+            expected = {hotel.id for hotel in self.hotels if self._matches(param, value)(hotel)}
+            for url in ('/hotel_list/', '/generics_hotel_list/'):
+                with self.subTest(url=url, param=param, value=value):
+                    response = self.client.get(url, {param: value})
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                    self.assertEqual({hotel['id'] for hotel in response.json()}, expected)
+
+    def test_combined_filters_and_default_sort(self):
+        """Test filters combine, and filtered lists are sorted by the first filter's column"""
+        response = self.client.get('/hotel_list/', {'min_price': 150, 'available': 'true'})
+
+        expected = sorted(
+            (hotel for hotel in self.hotels if hotel.price >= 150 and hotel.available),
+            key=lambda hotel: (hotel.price, hotel.id),
+        )
+        self.assertEqual([hotel['id'] for hotel in response.json()], [hotel.id for hotel in expected])
+
+    def test_sort_with_pagination(self):
+        """Test descending sorts page through every hotel in order"""
+        for url in ('/hotel_list/', '/generics_hotel_list/'):
+            hotel_ids = []
+            params = {'sort': '-price', 'limit': 7}
+            while True:
+                body = self.client.get(url, params).json()
+                hotel_ids += [hotel['id'] for hotel in body['results']]
+                if body['next'] is None:
+                    break
+                params['cursor'] = body['next']
+
+            expected = sorted(self.hotels, key=lambda hotel: (hotel.price, hotel.id), reverse=True)
+            self.assertEqual(hotel_ids, [hotel.id for hotel in expected])
+
+    def test_invalid_parameters(self):
+        """Test unindexed sort keys and malformed filters are rejected"""
+        response = self.client.get('/hotel_list/', {'sort': 'address'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('sort', response.json())
+
+        response = self.client.get('/generics_hotel_list/', {'min_price': 'cheap', 'available': 'maybe'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.json()), {'min_price', 'available'})
+
+        cursor = self.client.get('/hotel_list/', {'limit': 1}).json()['next']
+        response = self.client.get('/hotel_list/', {'limit': 1, 'cursor': cursor, 'sort': 'rating'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN output is SQLite specific')
+    def test_filters_and_sorts_use_indexes(self):
+        """Test EXPLAIN shows an index search for every filter and no sort step for every sort key"""
+        factory = RequestFactory()
+
+        def plan(params):
+            queryset, _ = filter_hotels(factory.get('/hotel_list/', params), Hotel.objects.all())
+            return queryset.explain()
+
+        for param, value in self.FILTERS + [('name_prefix', 'Grand 1'), ('min_rating', '4.9')]:
+            with self.subTest(param=param, value=value):
+                query_plan = plan({param: value})
+                self.assertRegex(query_plan, r'SEARCH hotelapi_hotel USING (COVERING )?INDEX')
+                self.assertNotIn('TEMP B-TREE', query_plan)
+
+        for sort in HOTEL_SORT_KEYS:
+            with self.subTest(sort=sort):
+                query_plan = plan({'sort': sort})
+                self.assertNotIn('TEMP B-TREE', query_plan)
+                if sort.lstrip('-') != 'id':
+                    self.assertIn('USING INDEX', query_plan)
+
+
+class ReservationLookupTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        Hotel.objects.bulk_create([
+            Hotel(id=i, name=f"Hotel {i}", rating=4.0, price=100,
+                  available_until=date.today() + timedelta(days=60), available=True)
+            for i in range(1, 4)
+        ])
+        rng = random.Random(3)
+        guests = [Guest.objects.create(guest_name=name, gender="Female") for name in ['Ann Lee', 'Bo Chen', 'Cy Diaz']]
+        for i in range(30):
+            checkin = date.today() + timedelta(days=rng.randint(0, 20))
+            reservation = Reservation.objects.create(
+                hotel_id=rng.randint(1, 3), hotel_name="", checkin=checkin,
+                checkout=checkin + timedelta(days=rng.randint(1, 5)),
+            )
+            reservation.guests.add(*rng.sample(guests, rng.randint(1, 3)))
+        self.reservations = list(Reservation.objects.prefetch_related('guests').order_by('id'))
+
+    def test_reservation_detail(self):
+        """Test a reservation is fetched by confirmation number with a constant number of queries"""
+        reservation = self.reservations[0]
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/reservations/{reservation.confirmation_number}')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['confirmation_number'], str(reservation.confirmation_number))
+        self.assertEqual(response.json()['hotel_name'], f"Hotel {reservation.hotel_id}")
+        self.assertEqual(len(response.json()['guests']), reservation.guests.count())
+
+        # Without dashes or in upper case still finds it.
+        for form in (reservation.confirmation_number.hex, str(reservation.confirmation_number).upper()):
+            response = self.client.get(f'/reservations/{form}')
+            self.assertEqual(response.json()['confirmation_number'], str(reservation.confirmation_number))
+
+        for unknown in ('unknown', uuid.uuid4()):
+            response = self.client.get(f'/reservations/{unknown}')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+            self.assertEqual(response.json(), {'error': 'Reservation not found'})
+
+    def test_confirmation_number_is_stored_compactly(self):
+        """Test confirmation numbers are stored as 16 bytes and read back as UUIDs"""
+        reservation = Reservation.objects.get(pk=self.reservations[0].pk)
+        self.assertIsInstance(reservation.confirmation_number, uuid.UUID)
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT confirmation_number FROM hotelapi_reservation WHERE id = %s', [reservation.pk])
+                self.assertEqual(cursor.fetchone()[0], reservation.confirmation_number.bytes)
+
+        reservation.confirmation_number = str(uuid.UUID(int=1))
+        reservation.save()
+        self.assertEqual(Reservation.objects.get(confirmation_number=uuid.UUID(int=1).hex).pk, reservation.pk)
+
+    def test_filters(self):
+        """Test each lookup returns exactly the matching reservations, with guests in two queries"""
+        day = date.today() + timedelta(days=10)
+        cases = [
+            ({'hotel_id': 2}, lambda r: r.hotel_id == 2),
+            ({'min_checkin': day}, lambda r: r.checkin >= day),
+            ({'max_checkin': day}, lambda r: r.checkin <= day),
+            ({'min_checkout': day}, lambda r: r.checkout >= day),
+            ({'max_checkout': day}, lambda r: r.checkout <= day),
+            ({'guest_name': 'Bo Chen'}, lambda r: any(g.guest_name == 'Bo Chen' for g in r.guests.all())),
+            ({'hotel_id': 1, 'min_checkin': day, 'guest_name': 'Ann Lee'},
+             lambda r: r.hotel_id == 1 and r.checkin >= day
+             and any(g.guest_name == 'Ann Lee' for g in r.guests.all())),
+        ]
+        for params, matches in cases:
+            with self.subTest(params=params):
+                with self.assertNumQueries(2):
+                    response = self.client.get('/reservations/', params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                found = [reservation['confirmation_number'] for reservation in response.json()]
+                self.assertEqual(len(found), len(set(found)))
+                self.assertEqual(set(found), {str(r.confirmation_number) for r in self.reservations if matches(r)})
+
+    def test_filtered_pagination(self):
+        """Test a filtered list pages through its matches in stay order"""
+        confirmation_numbers = []
+        params = {'min_checkin': date.today(), 'limit': 4}
+        while True:
+            body = self.client.get('/reservations/', params).json()
+            confirmation_numbers += [reservation['confirmation_number'] for reservation in body['results']]
+            if body['next'] is None:
+                break
+            params['cursor'] = body['next']
+
+        expected = sorted(self.reservations, key=lambda r: (r.checkin, r.checkout, r.id))
+        self.assertEqual(confirmation_numbers, [str(r.confirmation_number) for r in expected])
+
+    def test_invalid_parameters(self):
+        """Test malformed lookups are rejected"""
+        response = self.client.get('/reservations/', {'hotel_id': 'one', 'min_checkin': 'soon'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.json()), {'hotel_id', 'min_checkin'})
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN output is SQLite specific')
+    def test_lookups_use_indexes(self):
+        """Test EXPLAIN shows an index search and no sort step for every lookup"""
+        factory = RequestFactory()
+        day = date.today().isoformat()
+        for params in ({'hotel_id': 1}, {'hotel_id': 1, 'max_checkin': day}, {'min_checkin': day},
+                       {'max_checkout': day}, {'guest_name': 'Ann Lee'}):
+            with self.subTest(params=params):
+                queryset, _ = filter_reservations(factory.get('/reservations/', params), Reservation.objects.all())
+                query_plan = queryset.explain()
+                self.assertIn('SEARCH', query_plan)
+                self.assertNotIn('SCAN', query_plan)
+                self.assertNotIn('TEMP B-TREE', query_plan)
+
+        query_plan = Reservation.objects.filter(confirmation_number=uuid.uuid4()).explain()
+        self.assertIn('USING INDEX sqlite_autoindex_hotelapi_reservation', query_plan)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'full-text search needs SQLite FTS5')
+class SearchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        availability_index.reset()
+        self.addCleanup(availability_index.reset)
+        until = date.today() + timedelta(days=30)
+        for id, name in [(1, "Grand Harbour"), (2, "Café Royal"), (3, "Grandview Park Inn"), (4, "Harbour Lights")]:
+            Hotel.objects.create(id=id, name=name, rating=4.0, price=100, available_until=until, available=True)
+        for guests in (["Ann Smith", "Bob Smith"], ["Anna Gamage"], ["Zoë Tremblay"]):
+            reservation = Reservation.objects.create(hotel_id=1, hotel_name="Grand Harbour",
+                                                     checkin=date(2025, 5, 1), checkout=date(2025, 5, 3))
+            reservation.guests.set([Guest.objects.create(guest_name=name, gender="Female") for name in guests])
+
+    def _search(self, **params):
+        response = self.client.get('/search/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_prefix_case_and_accent_insensitive(self):
+        """Test every word matches as a prefix, ignoring case and accents"""
+        self.assertEqual([hotel['id'] for hotel in self._search(q="gran", type="hotels")['hotels']], [1, 3])
+        self.assertEqual([hotel['name'] for hotel in self._search(q="cafe", type="hotels")['hotels']], ["Café Royal"])
+        self.assertEqual([hotel['id'] for hotel in self._search(q="harb gra", type="hotels")['hotels']], [1])
+
+    def test_reservations_by_guest_name(self):
+        """Test reservations are found by any of their guests' names, once each"""
+        result = self._search(q="an")
+        self.assertEqual(len(result['reservations']), 2)
+        self.assertEqual({len(reservation['guests']) for reservation in result['reservations']}, {1, 2})
+        self.assertEqual(self._search(q="zoe")['reservations'][0]['guests'][0]['guest_name'], "Zoë Tremblay")
+        self.assertEqual(len(self._search(q="smith")['reservations']), 1)
+
+    def test_ranking(self):
+        """Test better matches come first, and broad searches fall back to newest first"""
+        Hotel.objects.create(id=5, name="Harbour", rating=4.0, price=100,
+                             available_until=date.today(), available=True)
+        cache.clear()
+        self.assertEqual(self._search(q="harbour", type="hotels")['hotels'][0]['id'], 5)
+
+        with patch('hotelapi.search.SEARCH_RANK_MAX_MATCHES', 1):
+            cache.clear()
+            self.assertEqual([hotel['id'] for hotel in self._search(q="harbour", type="hotels")['hotels']], [5, 4, 1])
+
+    def test_index_follows_writes(self):
+        """Test updates, deletes, bulk inserts and upserts reach the index through the triggers"""
+        Hotel.objects.filter(id=4).update(name="Seaside Lights")
+        Hotel.objects.filter(id=3).delete()
+        Hotel.objects.bulk_create([Hotel(id=6, name="Grand Central", rating=4.0, price=1,
+                                         available_until=date.today(), available=True)])
+        with transaction.atomic():
+            upsert_hotels([Hotel(id=2, name="Grand Café", rating=4.0, price=1,
+                                 available_until=date.today(), available=True)])
+        cache.clear()
+
+        self.assertEqual([hotel['id'] for hotel in self._search(q="seaside")['hotels']], [4])
+        self.assertEqual(self._search(q="harbour lights")['hotels'], [])
+        self.assertEqual(sorted(hotel['id'] for hotel in self._search(q="grand")['hotels']), [1, 2, 6])
+
+    def test_matches_without_rows_are_skipped(self):
+        """Test ids the index returns for rows deleted or archived since are left out"""
+        reservation = Reservation.objects.first()
+        with patch('hotelapi.views.search_hotel_ids', return_value=[3, 99, 1]), \
+                patch('hotelapi.views.search_reservation_ids', return_value=[999, reservation.pk]):
+            result = self._search(q="grand")
+
+        self.assertEqual([hotel['id'] for hotel in result['hotels']], [3, 1])
+        self.assertEqual([r['confirmation_number'] for r in result['reservations']],
+                         [str(reservation.confirmation_number)])
+
+    def test_invalid_queries(self):
+        """Test missing queries are rejected and FTS5 syntax in queries is taken literally"""
+        self.assertEqual(self.client.get('/search/').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/search/', {'q': '*'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/search/', {'q': 'x', 'type': 'guests'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._search(q='grand" OR NEAR(harbour')['hotels'], [])
+
+    def test_rebuild_command(self):
+        """Test the rebuild command restores an index that went out of sync"""
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO hotelapi_hotel_fts(hotelapi_hotel_fts) VALUES ('delete-all')")
+        self.assertEqual(self._search(q="grand")['hotels'], [])
+
+        stdout = io.StringIO()
+        call_command('rebuild_search_index', stdout=stdout)
+        cache.clear()
+
+        self.assertIn('hotelapi_hotel_fts', stdout.getvalue())
+        self.assertEqual(len(self._search(q="grand")['hotels']), 2)
+
+
+class GroupCommitTestCase(TransactionTestCase):
+    # The writer thread commits on its own connection, which a TestCase's
+    # open transaction would lock out.
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        availability_index.reset()
+        self.addCleanup(availability_index.reset)
+        self.addCleanup(group_commit.reset_writer)
+        self.client = APIClient()
+        Hotel.objects.create(id=1, name="Hotel 1", rating=4.0, price=100,
+                             available_until=date.today() + timedelta(days=30), available=True)
+
+    def _item(self, hotel_id=1, guest_name="Ann"):
+        return {
+            'hotel_id': hotel_id, 'hotel_name': "Hotel 1",
+            'checkin': date.today() + timedelta(days=1), 'checkout': date.today() + timedelta(days=2),
+            'guests_list': [{'guest_name': guest_name, 'gender': "Female"}],
+        }
+
+    def _post(self):
+        return self.client.post('/reservation/', data=json.dumps({
+            "hotel_id": 1,
+            "checkin": (date.today() + timedelta(days=1)).isoformat(),
+            "checkout": (date.today() + timedelta(days=2)).isoformat(),
+            "guests_list": [{"guest_name": "Ann", "gender": "Female"}],
+        }), content_type='application/json')
+
+    def test_writer_commits_queued_reservations_together(self):
+        """Test reservations queued within the delay are committed in one transaction"""
+        writer = group_commit.GroupCommitWriter(max_items=3, max_delay=5)
+        self.addCleanup(writer.close)
+
+        submitted = [writer.submit(self._item(guest_name=f"Guest {i}")) for i in range(3)]
+        saved = [future.result(timeout=10) for _, future in submitted]
+
+        self.assertEqual([r.confirmation_number for r in saved], [number for number, _ in submitted])
+        self.assertEqual(writer.stats(), {'transactions': 1, 'reservations': 3, 'queued': 0})
+        self.assertEqual(
+            set(Reservation.objects.values_list('confirmation_number', flat=True)),
+            {uuid.UUID(number) for number, _ in submitted},
+        )
+        self.assertEqual(Guest.objects.count(), 3)
+
+    def test_failed_reservation_does_not_roll_back_the_batch(self):
+        """Test a reservation that can't be saved fails alone and the rest of its batch commits"""
+        writer = group_commit.GroupCommitWriter(max_items=3, max_delay=5)
+        self.addCleanup(writer.close)
+
+        with self.assertLogs('hotelapi.group_commit', 'ERROR'):
+            submitted = [writer.submit(self._item(hotel_id=hotel_id)) for hotel_id in (1, 99, 1)]
+            good, bad, other = [future for _, future in submitted]
+            with self.assertRaises(Exception):
+                bad.result(timeout=10)
+        good.result(timeout=10)
+        other.result(timeout=10)
+
+        self.assertEqual(Reservation.objects.count(), 2)
+        self.assertFalse(Reservation.objects.filter(confirmation_number=submitted[1][0]).exists())
+
+    def test_group_mode_confirms_after_commit(self):
+        """Test group mode answers 201 once the reservation is readable"""
+        with self.settings(RESERVATION_COMMIT_MODE='group', GROUP_COMMIT_MAX_DELAY_MS=1):
+            response = self._post()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        confirmation_number = response.json()['confirmation_number']
+        detail = self.client.get(f'/reservations/{confirmation_number}')
+        self.assertEqual(detail.status_code, status.HTTP_200_OK)
+        self.assertEqual(detail.json()['guests'], [{'guest_name': "Ann", 'gender': "Female"}])
+
+    def test_group_async_mode_acknowledges_before_commit(self):
+        """Test group-async mode answers 202 and the reservation is committed by the writer"""
+        with self.settings(RESERVATION_COMMIT_MODE='group-async', GROUP_COMMIT_MAX_DELAY_MS=1):
+            response = self._post()
+            invalid = self.client.post('/reservation/', data=json.dumps({"hotel_id": 99}),
+                                       content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        group_commit.reset_writer()
+        self.assertTrue(
+            Reservation.objects.filter(confirmation_number=response.json()['confirmation_number']).exists()
+        )
+
+    def test_unknown_commit_mode_is_rejected(self):
+        """Test a misspelled RESERVATION_COMMIT_MODE fails loudly instead of group committing"""
+        with self.settings(RESERVATION_COMMIT_MODE='gruop'):
+            with self.assertRaisesMessage(ImproperlyConfigured, "not 'gruop'"):
+                group_commit.get_commit_mode()
+            with self.assertRaises(ImproperlyConfigured):
+                self._post()
+
+        self.assertFalse(Reservation.objects.exists())
@@ -2,93 +2,168 @@ from django.shortcuts import render
 from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Hotel, Guest, Reservation
+from .models import ArchivedReservation, Hotel, Reservation
 from .serializers import HotelSerializer, GuestSerializer, ReservationInputSerializer, ReservationResponseSerializer
-from django.http import JsonResponse
+from .serializers import HotelReadSerializer, SearchQuerySerializer, StatsQuerySerializer, parse_fields
+from .pagination import HotelPagination, ReservationPagination
+from . import group_commit
+from .filters import filter_hotels, filter_reservations
+from .inventory import InventoryExhausted
+from .streaming import streaming_response
+from .archive import parse_include_archived
+from .availability import available_hotel_rows, response_max_age
+from .cache import HOTELS, RESERVATIONS, cache_stats, cached_response
+from .dates import format_hint, parse_date
+from .fastjson import FastJSONParser, JsonResponse
+from .negotiation import negotiated_response
+from .metrics import registry
+from .rollups import catalogue_stats, occupancy_stats
+from .search import search_hotel_ids, search_reservation_ids, search_terms
+from .services import RESERVATION_BULK_MAX_ITEMS, HotelLookup, create_reservation, create_reservations_in_batches
+from django.http import HttpResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.parsers import JSONParser
 import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from django.db.models import Q
-from datetime import datetime
 
 # Create your views here.
+@cached_response(HOTELS)
 @api_view(['GET', 'POST'])
 @permission_classes([AllowAny])  # In production, consider using IsAuthenticated
 def Hotels_list(request):
     if request.method == 'GET':
-        hotels = Hotel.objects.all()
-        serializer = HotelSerializer(hotels, many=True)
-        return JsonResponse(serializer.data, safe=False)
+        hotels, ordering = filter_hotels(request, Hotel.objects.all())
+        # Only the columns of ?fields= are selected.
+        read_serializer = HotelReadSerializer.from_request(request)
+
+        stream = streaming_response(request, read_serializer.get_rows(hotels), read_serializer.to_representation)
+        if stream is not None:
+            return stream
+
+        paginator = HotelPagination(ordering=ordering)
+        rows = read_serializer.get_rows(hotels, named=True, extra=paginator.key_fields)
+        page = paginator.paginate_queryset(rows, request)
+        if page is not None:
+            data = read_serializer.to_representation_many(page)
+            return negotiated_response(request, paginator.get_paginated_data(data))
+
+        data = read_serializer.to_representation_many(read_serializer.get_rows(hotels))
+        return negotiated_response(request, data, safe=False)
     
     elif request.method == 'POST':
-        data = JSONParser().parse(request)
+        data = FastJSONParser().parse(request)
         serializer = HotelSerializer(data=data)
         if serializer.is_valid():
             serializer.save()
             return JsonResponse(serializer.data, status=status.HTTP_201_CREATED)
         return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@cached_response(HOTELS)
 @api_view(['GET'])
 @permission_classes([AllowAny])  # In production, consider using IsAuthenticated
 def Hotels_detail(request, id):
+    read_serializer = HotelReadSerializer.from_request(request)
     try:
-        hotel = Hotel.objects.get(id=id)
+        hotel = read_serializer.get_rows(Hotel.objects.all()).get(id=id)
     except Hotel.DoesNotExist:
         return JsonResponse({'error': 'Hotel not found'}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
-        serializer = HotelSerializer(hotel)
-        return JsonResponse(serializer.data)
+        return JsonResponse(read_serializer.to_representation(hotel))
 
 class get_generics_list(generics.ListCreateAPIView):
-    queryset = Hotel.objects.all()
+    queryset = Hotel.objects.order_by('id')
     serializer_class = HotelSerializer
+    pagination_class = HotelPagination
     permission_classes = [AllowAny]  # In production, consider using IsAuthenticated
+    # Used for GET instead of serializer_class; set to None to read through
+    # the regular ModelSerializer.
+    read_serializer_class = HotelReadSerializer
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return cached_response(HOTELS)(super().as_view(**initkwargs))
+
+    def filter_queryset(self, queryset):
+        queryset, ordering = filter_hotels(self.request, queryset)
+        # Page in the order the client asked for.
+        self._paginator = self.pagination_class(ordering=ordering)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = getattr(self, 'response_fields', None)
+        if fields is not None:
+            child = getattr(serializer, 'child', serializer)
+            for name in set(child.fields) - set(fields):
+                child.fields.pop(name)
+        return serializer
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.read_serializer_class is None:
+            self.response_fields = parse_fields(request, self.serializer_class.Meta.fields)
+            queryset = queryset.only(*self.response_fields, *self.paginator.key_fields)
+            stream = streaming_response(request, queryset, lambda hotel: self.get_serializer(hotel).data)
+            if stream is not None:
+                return stream
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                return self.get_paginated_response(self.get_serializer(page, many=True).data)
+            return Response(self.get_serializer(queryset, many=True).data)
+
+        read_serializer = self.read_serializer_class.from_request(request)
+        stream = streaming_response(request, read_serializer.get_rows(queryset), read_serializer.to_representation)
+        if stream is not None:
+            return stream
+
+        page = self.paginate_queryset(read_serializer.get_rows(queryset, named=True, extra=self.paginator.key_fields))
+        if page is not None:
+            return self.get_paginated_response(read_serializer.to_representation_many(page))
+        return Response(read_serializer.to_representation_many(read_serializer.get_rows(queryset)))
+
+def _sold_out_response():
+    return JsonResponse(
+        {'error': 'No rooms left at this hotel for the requested dates'},
+        status=status.HTTP_409_CONFLICT
+    )
+
+def _group_commit_reservation(item, commit_mode):
+    confirmation_number, saved = group_commit.get_writer().submit(item)
+    if commit_mode == 'group-async':
+        # Accepted, not yet committed.
+        return JsonResponse({'confirmation_number': confirmation_number}, status=status.HTTP_202_ACCEPTED)
+    try:
+        saved.result(timeout=group_commit.COMMIT_WAIT_TIMEOUT)
+    except InventoryExhausted:
+        return _sold_out_response()
+    except FutureTimeoutError:
+        return JsonResponse(
+            {'error': 'Reservation not confirmed in time; it may still be saved',
+             'confirmation_number': confirmation_number},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    return JsonResponse({'confirmation_number': confirmation_number}, status=status.HTTP_201_CREATED)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])  # In production, consider using IsAuthenticated
 def reservationConfirmation(request):
     if request.method == 'POST':
-        data = JSONParser().parse(request)
-        
-        # Convert date formats if they use slashes
-        if 'checkin' in data and isinstance(data['checkin'], str) and '/' in data['checkin']:
-            try:
-                date_obj = datetime.strptime(data['checkin'], '%m/%d/%Y')
-                data['checkin'] = date_obj.strftime('%Y-%m-%d')
-            except ValueError:
-                return JsonResponse(
-                    {'error': 'Invalid checkin date format. Use MM/DD/YYYY'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-                
-        if 'checkout' in data and isinstance(data['checkout'], str) and '/' in data['checkout']:
-            try:
-                date_obj = datetime.strptime(data['checkout'], '%m/%d/%Y')
-                data['checkout'] = date_obj.strftime('%Y-%m-%d')
-            except ValueError:
-                return JsonResponse(
-                    {'error': 'Invalid checkout date format. Use MM/DD/YYYY'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        data = FastJSONParser().parse(request)
         
+        # Dates can be YYYY-MM-DD or MM/DD/YYYY (see dates.py)
         input_serializer = ReservationInputSerializer(data=data)
         if input_serializer.is_valid():
-            # Create a new reservation
-            reservation = Reservation.objects.create(
-                hotel_name=input_serializer.validated_data['hotel_name'],
-                checkin=input_serializer.validated_data['checkin'],
-                checkout=input_serializer.validated_data['checkout'],
-            )
-            
-            # Create and add guests to the reservation
-            for guest_data in input_serializer.validated_data['guests_list']:
-                guest = Guest.objects.create(
-                    guest_name=guest_data['guest_name'],
-                    gender=guest_data['gender']
-                )
-                reservation.guests.add(guest)
+            commit_mode = group_commit.get_commit_mode()
+            if commit_mode != 'direct':
+                return _group_commit_reservation(input_serializer.validated_data, commit_mode)
+
+            # Create the reservation and its guests in one transaction
+            try:
+                reservation = create_reservation(input_serializer.validated_data)
+            except InventoryExhausted:
+                return _sold_out_response()
             
             # Return the confirmation number
             response_serializer = ReservationResponseSerializer(reservation)
@@ -98,90 +173,308 @@ def reservationConfirmation(request):
         
     return JsonResponse({'error': 'Only POST method is allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
+@api_view(['POST'])
+@permission_classes([AllowAny])  # In production, consider using IsAuthenticated
+def bulkReservationConfirmation(request):
+    """
+    Create many reservations in one call. Valid items are committed in
+    batches; the response has one entry per item, in order, with either its
+    confirmation number or its errors.
+    """
+    data = FastJSONParser().parse(request)
+    if not isinstance(data, list):
+        return JsonResponse(
+            {'error': 'Expected a list of reservations'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(data) > RESERVATION_BULK_MAX_ITEMS:
+        return JsonResponse(
+            {'error': f'At most {RESERVATION_BULK_MAX_ITEMS} reservations can be submitted at once'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    hotel_lookup = HotelLookup.for_items(data)
+    results = [None] * len(data)
+    valid_indexes = []
+    valid_items = []
+    for index, item in enumerate(data):
+        if not isinstance(item, dict):
+            results[index] = {'errors': {'non_field_errors': ['Expected a reservation object']}}
+            continue
+        input_serializer = ReservationInputSerializer(data=item, context={'hotel_lookup': hotel_lookup})
+        if input_serializer.is_valid():
+            valid_indexes.append(index)
+            valid_items.append(input_serializer.validated_data)
+        else:
+            results[index] = {'errors': input_serializer.errors}
+
+    for index, created in zip(valid_indexes, create_reservations_in_batches(valid_items)):
+        if isinstance(created, Exception):
+            results[index] = {'errors': {'error': f'Could not save reservation: {created}'}}
+        else:
+            results[index] = {'confirmation_number': str(created.confirmation_number)}
+
+    all_created = all('confirmation_number' in result for result in results)
+    return JsonResponse(
+        {'results': results},
+        status=status.HTTP_201_CREATED if all_created else status.HTTP_207_MULTI_STATUS
+    )
+
+def _parse_query_date(value, field):
+    """
+    Parse a MM/DD/YYYY or YYYY-MM-DD query parameter.
+    Returns (date, None) or (None, error message).
+    """
+    try:
+        return parse_date(value), None
+    except ValueError:
+        return None, f'Invalid {field} date format. Use {format_hint(value)}'
+
+def parse_stay(request):
+    """
+    Read the checkin/checkout query parameters of an availability search.
+    Returns ((checkin, checkout), None) or (None, error message).
+    """
+    checkin = request.GET.get('checkin', None)
+    checkout = request.GET.get('checkout', None)
+
+    if not checkin or not checkout:
+        return None, 'Both checkin and checkout dates are required'
+
+    checkin_date, error = _parse_query_date(checkin, 'checkin')
+    if error:
+        return None, error
+    checkout_date, error = _parse_query_date(checkout, 'checkout')
+    if error:
+        return None, error
+
+    if checkin_date >= checkout_date:
+        return None, 'checkout must be after checkin'
+    return (checkin_date, checkout_date), None
+
+@cached_response(HOTELS, RESERVATIONS, max_age=response_max_age)
 @api_view(['GET'])
 @permission_classes([AllowAny])  # In production, consider using IsAuthenticated
 def available_hotels(request):
     if request.method == 'GET':
-        checkin = request.GET.get('checkin', None)
-        checkout = request.GET.get('checkout', None)
-        
-        if not checkin or not checkout:
-            return JsonResponse(
-                {'error': 'Both checkin and checkout dates are required'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        try:
-            # Convert checkout date format if it contains slashes
-            if '/' in checkout:
-                try:
-                    checkout_date = datetime.strptime(checkout, '%m/%d/%Y').date()
-                except ValueError:
-                    return JsonResponse(
-                        {'error': 'Invalid checkout date format. Use MM/DD/YYYY'}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            else:
-                # Assume YYYY-MM-DD format
-                try:
-                    checkout_date = datetime.strptime(checkout, '%Y-%m-%d').date()
-                except ValueError:
-                    return JsonResponse(
-                        {'error': 'Invalid checkout date format. Use YYYY-MM-DD'}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            
-            # Find hotels available until checkout date
-            available_hotels = Hotel.objects.filter(
-                available_until__gte=checkout_date,
-                available=True
-            )
-            
-            serializer = HotelSerializer(available_hotels, many=True)
-            return JsonResponse(serializer.data, safe=False)
-            
-        except Exception as e:
-            return JsonResponse(
-                {'error': f'Error processing dates: {str(e)}'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        stay, error = parse_stay(request)
+        if error:
+            return JsonResponse({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        checkin_date, checkout_date = stay
+
+        # Hotels open through checkout with no reservation overlapping the stay
+        read_serializer = HotelReadSerializer.from_request(request)
+        rows = available_hotel_rows(read_serializer, checkin_date, checkout_date)
+        return JsonResponse(read_serializer.to_representation_many(rows), safe=False)
     
     return JsonResponse(
         {'error': 'Only GET method is allowed'}, 
         status=status.HTTP_405_METHOD_NOT_ALLOWED
     )
 
+@api_view(['GET'])
+@permission_classes([AllowAny])  # In production, consider using IsAuthenticated
+def reservation_detail(request, confirmation_number):
+    """
+    Get one reservation by its confirmation number
+    """
+    fields = parse_fields(request, RESERVATION_FIELDS)
+    include_archived = parse_include_archived(request)
+    confirmation_number = parse_confirmation_number(confirmation_number)
+    try:
+        if confirmation_number is None:
+            raise Reservation.DoesNotExist
+        reservation = get_reservation(confirmation_number, fields, include_archived)
+    except Reservation.DoesNotExist:
+        return JsonResponse({'error': 'Reservation not found'}, status=status.HTTP_404_NOT_FOUND)
+    return JsonResponse(reservation_to_dict(reservation, fields))
+
+def parse_confirmation_number(value):
+    """
+    Read a confirmation number in any form uuid.UUID accepts, such as with
+    or without dashes. Returns None if it can't be one.
+    """
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        return None
+
+RESERVATION_FIELDS = ('confirmation_number', 'hotel_id', 'hotel_name', 'checkin', 'checkout', 'guests')
+# Columns (for .only()) behind each field of reservation_to_dict().
+RESERVATION_COLUMNS = {
+    'confirmation_number': ('confirmation_number',),
+    'hotel_id': ('hotel',),
+    'hotel_name': ('hotel', 'hotel_name', 'hotel__name'),
+    'checkin': ('checkin',),
+    'checkout': ('checkout',),
+    'guests': (),
+}
+
+def reservation_queryset(fields=RESERVATION_FIELDS, extra=(), queryset=None):
+    """
+    Reservations (by default all of them, by id) loading only the columns
+    reservation_to_dict() needs for ``fields``, plus the ``extra`` ones.
+    The hotel is joined for hotel_name and guests are prefetched only when
+    they are asked for.
+    """
+    if queryset is None:
+        queryset = Reservation.objects.order_by('id')
+    if 'hotel_name' in fields:
+        queryset = queryset.select_related('hotel')
+    if 'guests' in fields:
+        queryset = queryset.prefetch_related('guests')
+    columns = [column for name in fields for column in RESERVATION_COLUMNS[name]]
+    return queryset.only(*columns, *extra)
+
+def reservation_querysets(request, fields):
+    """
+    The filtered querysets /reservations/ reads: the live reservations, then
+    the archived ones if ?include_archived=true. Returns them with the
+    paginator for their ordering.
+    """
+    models = [Reservation, ArchivedReservation] if parse_include_archived(request) else [Reservation]
+    querysets = []
+    for model in models:
+        queryset, ordering = filter_reservations(request, model.objects.order_by('id'))
+        querysets.append(queryset)
+    paginator = ReservationPagination(ordering=ordering)
+    return [reservation_queryset(fields, paginator.key_fields, queryset) for queryset in querysets], paginator
+
+def get_reservation(confirmation_number, fields=RESERVATION_FIELDS, include_archived=False):
+    """
+    The reservation with this confirmation number, looked for in the archive
+    too if ``include_archived``. Raises Reservation.DoesNotExist.
+    """
+    try:
+        return reservation_queryset(fields).get(confirmation_number=confirmation_number)
+    except Reservation.DoesNotExist:
+        if not include_archived:
+            raise
+    try:
+        archived = reservation_queryset(fields, queryset=ArchivedReservation.objects.all())
+        return archived.get(confirmation_number=confirmation_number)
+    except ArchivedReservation.DoesNotExist:
+        raise Reservation.DoesNotExist
+
+def _guests_to_list(reservation):
+    return [{'guest_name': guest.guest_name, 'gender': guest.gender} for guest in reservation.guests.all()]
+
+RESERVATION_GETTERS = {
+    'confirmation_number': lambda reservation: str(reservation.confirmation_number),
+    'hotel_id': lambda reservation: reservation.hotel_id,
+    # Follow the hotel so renames show up; unlinked legacy reservations
+    # only have the name they were booked with.
+    'hotel_name': lambda reservation: reservation.hotel.name if reservation.hotel_id else reservation.hotel_name,
+    # Strings rather than dates keep the encoder on its fast path.
+    'checkin': lambda reservation: reservation.checkin.isoformat(),
+    'checkout': lambda reservation: reservation.checkout.isoformat(),
+    'guests': _guests_to_list,
+}
+
+def reservation_to_dict(reservation, fields=RESERVATION_FIELDS):
+    return {name: RESERVATION_GETTERS[name](reservation) for name in fields}
+
+def reservation_serializer(fields):
+    if fields == RESERVATION_FIELDS:
+        return reservation_to_dict
+    return lambda reservation: reservation_to_dict(reservation, fields)
+
 @api_view(['GET'])
 @permission_classes([AllowAny])  # In production, consider using IsAuthenticated
 def reservation_list(request):
     """
-    Get a list of all reservations
+    Get a list of all reservations, optionally filtered by hotel, stay dates
+    or guest (see filters.py), with only the ?fields= asked for, and
+    archived ones too with ?include_archived=true
     """
     if request.method == 'GET':
-        reservations = Reservation.objects.all().prefetch_related('guests')
-        
+        fields = parse_fields(request, RESERVATION_FIELDS)
+        to_dict = reservation_serializer(fields)
+        querysets, paginator = reservation_querysets(request, fields)
+
+        stream = streaming_response(request, querysets, to_dict)
+        if stream is not None:
+            return stream
+
+        page = paginator.paginate_querysets(querysets, request)
+        if page is not None:
+            result = [to_dict(reservation) for reservation in page]
+            return negotiated_response(request, paginator.get_paginated_data(result))
+
         # Create a custom response with more details than just confirmation numbers
-        result = []
-        for reservation in reservations:
-            guests = [
-                {
-                    'guest_name': guest.guest_name,
-                    'gender': guest.gender
-                } 
-                for guest in reservation.guests.all()
-            ]
-            
-            result.append({
-                'confirmation_number': reservation.confirmation_number,
-                'hotel_name': reservation.hotel_name,
-                'checkin': reservation.checkin,
-                'checkout': reservation.checkout,
-                'guests': guests
-            })
-            
-        return JsonResponse(result, safe=False)
+        result = [to_dict(reservation) for queryset in querysets for reservation in queryset]
+        return negotiated_response(request, result, safe=False)
     
     return JsonResponse(
         {'error': 'Only GET method is allowed'}, 
         status=status.HTTP_405_METHOD_NOT_ALLOWED
     )
+
+@cached_response(HOTELS, RESERVATIONS)
+@api_view(['GET'])
+@permission_classes([AllowAny])  # In production, consider using IsAuthenticated
+def search(request):
+    """
+    Full-text search: ?q= matches hotels by name and reservations by guest
+    name, every word as a prefix, best matches first. ?type=hotels or
+    ?type=reservations limits the search to one of them.
+    """
+    serializer = SearchQuerySerializer(data=request.GET.dict())
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    params = serializer.validated_data
+    terms = search_terms(params['q'])
+    if not terms:
+        return JsonResponse({'q': ['Enter at least one word to search for.']}, status=status.HTTP_400_BAD_REQUEST)
+
+    result = {}
+    if params['type'] in ('all', 'hotels'):
+        hotel_ids = search_hotel_ids(terms, params['limit'])
+        read_serializer = HotelReadSerializer()
+        rows = {row.id: row for row in read_serializer.get_rows(Hotel.objects.filter(id__in=hotel_ids), named=True)}
+        # Ids without a row were deleted or archived since the index was
+        # searched, or the index is stale; skip them.
+        result['hotels'] = read_serializer.to_representation_many(
+            rows[hotel_id] for hotel_id in hotel_ids if hotel_id in rows)
+    if params['type'] in ('all', 'reservations'):
+        reservation_ids = search_reservation_ids(terms, params['limit'])
+        reservations = reservation_queryset().in_bulk(reservation_ids)
+        result['reservations'] = [reservation_to_dict(reservations[pk]) for pk in reservation_ids if pk in reservations]
+    return JsonResponse(result)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])  # In production, consider using IsAuthenticated
+def stats(request):
+    """
+    Occupancy per night and catalogue aggregates, read from the rollup
+    tables only (see rollups.py). ?start= and ?end= pick the nights, by
+    default the coming 30; ?hotel_id= limits occupancy to one hotel.
+    """
+    serializer = StatsQuerySerializer(data=request.GET.dict())
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    params = serializer.validated_data
+    return JsonResponse({
+        'start': params['start'].isoformat(),
+        'end': params['end'].isoformat(),
+        'hotel_id': params.get('hotel_id'),
+        'occupancy': occupancy_stats(params['start'], params['end'], params.get('hotel_id')),
+        'catalogue': catalogue_stats(),
+    })
+
+@api_view(['GET'])
+@permission_classes([AllowAny])  # In production, consider using IsAuthenticated
+def cache_statistics(request):
+    """
+    Response cache hit/miss counters per cached view
+    """
+    return JsonResponse(cache_stats())
+
+@api_view(['GET'])
+@permission_classes([AllowAny])  # In production, consider using IsAuthenticated
+def metrics(request):
+    """
+    Request timing, query and response size histograms in the Prometheus
+    text format
+    """
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -11,7 +11,10 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
+import tempfile
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -35,6 +38,19 @@ ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', '').split(',')
 
 # Application definition
 
+# 'full' (default) or 'api'. The API-only profile leaves out what a JSON API
+# doesn't use: sessions, messages, CSRF, templates, static files and the
+# browsable API, with their apps and middleware, so workers start faster
+# and every request passes through fewer middleware.
+SETTINGS_PROFILE = os.environ.get('SETTINGS_PROFILE', 'full')
+if SETTINGS_PROFILE not in ('full', 'api'):
+    raise ImproperlyConfigured(f"SETTINGS_PROFILE must be 'full' or 'api', not {SETTINGS_PROFILE!r}.")
+API_ONLY = SETTINGS_PROFILE == 'api'
+
+# Serve the Django admin at admin/ (default: on in the full profile, off in
+# the API-only one, where turning it on brings back the apps it needs)
+ADMIN_ENABLED = os.environ.get('ADMIN_ENABLED', str(not API_ONLY)).lower() == 'true'
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -47,6 +63,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack.
+    'hotelapi.metrics.MetricsMiddleware',
+    # Next, so metrics see the size actually sent.
+    'hotelapi.compression.CompressionMiddleware',
+    # Before anything else runs, so shed requests cost next to nothing.
+    'hotelapi.admission.AdmissionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,9 +78,23 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+if API_ONLY and not ADMIN_ENABLED:
+    INSTALLED_APPS = ['rest_framework', 'hotelapi']
+    # SecurityMiddleware for HTTPS redirects and HSTS, CommonMiddleware for
+    # APPEND_SLASH.
+    MIDDLEWARE = [
+        'hotelapi.metrics.MetricsMiddleware',
+        'hotelapi.compression.CompressionMiddleware',
+        'hotelapi.admission.AdmissionMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'django.middleware.common.CommonMiddleware',
+    ]
+elif not ADMIN_ENABLED:
+    INSTALLED_APPS.remove('django.contrib.admin')
+
 ROOT_URLCONF = 'testproj.urls'
 
-TEMPLATES = [
+TEMPLATES = [] if API_ONLY and not ADMIN_ENABLED else [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
@@ -75,6 +111,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'testproj.wsgi.application'
 
+# Serve the read endpoints with native async views. asgi.py turns this on;
+# leave it off under WSGI, where async views would run through a sync adapter.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False').lower() == 'true'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -83,9 +123,85 @@ DATABASES = {
     'default': {
         'ENGINE': os.environ.get('DATABASE_ENGINE', 'django.db.backends.sqlite3'),
         'NAME': BASE_DIR / os.environ.get('DATABASE_NAME', 'db.sqlite3'),
+        # Keep connections open between requests instead of reconnecting
+        # (and re-running the PRAGMAs below) every time.
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Stored in the database file, so it is set once, by migration 0018
+    # (or ``manage.py migrate hotelapi 0017`` and back to change it). WAL
+    # lets readers work while a write is in progress.
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    # Run on every new connection. synchronous=NORMAL is durable across
+    # application crashes in WAL mode and only fsyncs at checkpoints.
+    SQLITE_PRAGMAS = {
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        # Negative values are in KiB.
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024)),
+        'temp_store': 'MEMORY',
+    }
+    DATABASES['default']['OPTIONS'] = {
+        'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        # Seconds a connection waits for the write lock before failing with
+        # "database is locked".
+        'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+        # Take the write lock when a transaction starts rather than on its
+        # first write, so concurrent writers queue on the busy timeout
+        # instead of failing when they try to upgrade a read lock.
+        'transaction_mode': 'IMMEDIATE',
+    }
+
+    if os.environ.get('DATABASE_READ_REPLICA', 'True').lower() == 'true':
+        # A second, read-only connection to the same file. The router sends
+        # reads outside transactions here and everything else to 'default'.
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'NAME': f"{DATABASES['default']['NAME'].as_uri()}?mode=ro",
+            'OPTIONS': {
+                'init_command': DATABASES['default']['OPTIONS']['init_command'],
+                'timeout': DATABASES['default']['OPTIONS']['timeout'],
+            },
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_ROUTERS = ['hotelapi.routers.PrimaryReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# 'default' holds the cached responses, per process unless CACHE_BACKEND
+# says otherwise. 'versions' holds the response cache versions and must be
+# shared by every worker process (see hotelapi/cache.py): local memory, the
+# default for a single process, would let the other workers serve stale
+# responses. With WEB_CONCURRENCY (the worker count, which gunicorn also
+# reads) above 1 they default to a file based cache in the temp directory.
+
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    },
+    'versions': {
+        'BACKEND': os.environ.get('CACHE_VERSIONS_BACKEND', (
+            'django.core.cache.backends.locmem.LocMemCache' if WEB_CONCURRENCY == 1
+            else 'django.core.cache.backends.filebased.FileBasedCache'
+        )),
+        'LOCATION': os.environ.get('CACHE_VERSIONS_LOCATION', (
+            'versions' if WEB_CONCURRENCY == 1
+            else os.path.join(tempfile.gettempdir(), 'hotelapi-cache-versions')
+        )),
+        # Versions are never expired: an evicted one restarts from the clock.
+        'TIMEOUT': None,
+    },
+}
+
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 3600))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -135,3 +251,78 @@ CSRF_COOKIE_SECURE = os.environ.get('CSRF_COOKIE_SECURE', 'False').lower() == 't
 SECURE_HSTS_SECONDS = int(os.environ.get('SECURE_HSTS_SECONDS', 0))
 SECURE_HSTS_INCLUDE_SUBDOMAINS = os.environ.get('SECURE_HSTS_INCLUDE_SUBDOMAINS', 'False').lower() == 'true'
 SECURE_HSTS_PRELOAD = os.environ.get('SECURE_HSTS_PRELOAD', 'False').lower() == 'true'
+
+# Availability engine for /available_hotels/: 'index' (in-process interval
+# index) or 'database' (overlap query on every request)
+AVAILABILITY_BACKEND = os.environ.get('AVAILABILITY_BACKEND', 'index')
+AVAILABILITY_INDEX_TTL = int(os.environ.get('AVAILABILITY_INDEX_TTL', 60))
+
+# How POST /reservation/ commits: 'direct' (one transaction per request),
+# 'group' or 'group-async' (batched by a writer thread; see
+# hotelapi/group_commit.py)
+RESERVATION_COMMIT_MODE = os.environ.get('RESERVATION_COMMIT_MODE', 'direct')
+GROUP_COMMIT_MAX_ITEMS = int(os.environ.get('GROUP_COMMIT_MAX_ITEMS', 100))
+GROUP_COMMIT_MAX_DELAY_MS = float(os.environ.get('GROUP_COMMIT_MAX_DELAY_MS', 5))
+
+# Rooms per hotel per night, for nights booked for the first time (see
+# hotelapi/inventory.py)
+INVENTORY_DEFAULT_CAPACITY = int(os.environ.get('INVENTORY_DEFAULT_CAPACITY', 10))
+
+# Width of the price bands of the /stats/ price histogram (see
+# hotelapi/rollups.py)
+STATS_PRICE_BAND = int(os.environ.get('STATS_PRICE_BAND', 50))
+
+# Send per-request timings back to clients in a Server-Timing header
+SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'True').lower() == 'true'
+
+# JSON library for request bodies and responses: 'auto' (orjson when
+# installed, else the standard library), 'orjson' or 'stdlib' (see
+# hotelapi/fastjson.py)
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto')
+
+# Admission control of the expensive read endpoints (see
+# hotelapi/admission.py): per endpoint, at most ADMISSION_CONCURRENCY
+# requests in flight and ADMISSION_RATE requests per second, in bursts of up
+# to ADMISSION_BURST. ADMISSION_STORE is 'memory' (per process) or 'file'
+# (shared by the workers of one host through ADMISSION_STORE_PATH).
+ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', 'True').lower() == 'true'
+ADMISSION_STORE = os.environ.get('ADMISSION_STORE', 'memory')
+ADMISSION_STORE_PATH = os.environ.get('ADMISSION_STORE_PATH', BASE_DIR / 'admission.shm')
+ADMISSION_LIMITS = {
+    name: {
+        'concurrency': int(os.environ.get('ADMISSION_CONCURRENCY', 8)),
+        'rate': float(os.environ.get('ADMISSION_RATE', 200)),
+        'burst': float(os.environ.get('ADMISSION_BURST', 400)),
+    }
+    for name in ('hotelList', 'genericsList', 'availableHotels', 'reservationList', 'search')
+}
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'hotelapi.fastjson.FastJSONRenderer',
+        # application/msgpack, when msgpack is installed (see below)
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'hotelapi.fastjson.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+if API_ONLY:
+    # No browsable API, sessions or users: every endpoint is AllowAny.
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].remove('rest_framework.renderers.BrowsableAPIRenderer')
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'] = []
+    REST_FRAMEWORK['UNAUTHENTICATED_USER'] = None
+
+if importlib.util.find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(1, 'hotelapi.negotiation.MessagePackRenderer')
+
+# gzip/brotli compression of JSON and MessagePack responses (see
+# hotelapi/compression.py). Bodies under COMPRESSION_MIN_SIZE bytes are
+# sent uncompressed.
+RESPONSE_COMPRESSION = os.environ.get('RESPONSE_COMPRESSION', 'True').lower() == 'true'
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
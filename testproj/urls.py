@@ -14,16 +14,35 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
 from hotelapi import views
 
+if settings.ASYNC_VIEWS:
+    # Native async read endpoints, used under ASGI (see asgi.py)
+    from hotelapi import async_views as read_views
+    generics_list_view = read_views.get_generics_list
+else:
+    read_views = views
+    generics_list_view = views.get_generics_list.as_view()
+
 urlpatterns = [
-    path('admin/', admin.site.urls),
-    path("hotel_list/", views.Hotels_list, name="hotelList"),
-    path("hotel_list/<str:id>", views.Hotels_detail, name="hotelDetail"),
-    path("generics_hotel_list/", views.get_generics_list.as_view(), name="genericsList"),
+    path("hotel_list/", read_views.Hotels_list, name="hotelList"),
+    path("hotel_list/<str:id>", read_views.Hotels_detail, name="hotelDetail"),
+    path("generics_hotel_list/", generics_list_view, name="genericsList"),
     path("reservation/", views.reservationConfirmation, name="reservationConfirmation"),
-    path("available_hotels/", views.available_hotels, name="availableHotels"),
-    path("reservations/", views.reservation_list, name="reservationList"),
+    path("reservations/bulk/", views.bulkReservationConfirmation, name="bulkReservationConfirmation"),
+    path("available_hotels/", read_views.available_hotels, name="availableHotels"),
+    path("reservations/", read_views.reservation_list, name="reservationList"),
+    path("reservations/<str:confirmation_number>", read_views.reservation_detail, name="reservationDetail"),
+    path("search/", views.search, name="search"),
+    path("stats/", views.stats, name="stats"),
+    path("cache_stats/", views.cache_statistics, name="cacheStats"),
+    path("metrics", views.metrics, name="metrics"),
 ]
+
+if settings.ADMIN_ENABLED:
+    # Imported only here: the admin pulls in auth, forms and templates.
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))